@@ -0,0 +1,313 @@
+"""
+Moteur BM25F en NumPy, alternative en mémoire à l'index Whoosh pour semantic_search.
+
+Mêmes analyseurs que le schéma Whoosh (corpus_artifacts.build_whoosh_schema) :
+  - label   : StandardAnalyzer (minuscules, mots vides anglais, pas de racinisation),
+  - content : StemmingAnalyzer avec le Snowball français, sur content + label + source + section.
+
+Même formule que whoosh.scoring.BM25F (somme des BM25 de chaque champ) :
+  idf = log(N / (df + 1)) + 1
+  score = idf × tf × (K1 + 1) / (tf + K1 × (1 − B + B × fl / avgfl))
+avec la longueur de champ fl arrondie comme Whoosh la stocke (un octet par document,
+length_to_byte / byte_to_length) pour retrouver les mêmes scores.
+
+Pour chaque champ, la matrice termes × documents est stockée en CSR (indptr, indices
+de documents, tf). Les poids BM25 de chaque entrée ne dépendent que du corpus : ils sont
+calculés une fois au chargement, et une requête n'est plus qu'un produit matrice creuse ×
+vecteur (somme des lignes de ses termes, np.bincount) suivi d'un np.argpartition.
+
+La question est découpée en mots (espaces) ; les formes analysées de chaque mot sont
+mises en cache. La syntaxe de requête Whoosh (AND, NOT, guillemets, jokers, ^) n'est pas
+interprétée : les questions des usagers sont du texte libre.
+
+Les comptes bruts (tf, longueurs) sont écrits à côté de corpus_metadata.json
+(<nom>.bm25.npz), marqués par le hash du corpus.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+  from whoosh.util.numeric import byte_to_length, length_to_byte
+except ImportError:
+  byte_to_length = None
+  length_to_byte = None
+
+try:
+  from .corpus_artifacts import WHOOSH_AVAILABLE, build_whoosh_schema
+except ImportError:
+  from corpus_artifacts import WHOOSH_AVAILABLE, build_whoosh_schema
+
+BM25_FORMAT_VERSION = 1
+BM25_FIELDS = ("label", "content")
+# Paramètres de semantic_search (scoring.BM25F(B=0.75, K1=1.6))
+DEFAULT_K1 = 1.6
+DEFAULT_B = 0.75
+# Nombre de mots de question dont les formes analysées sont gardées en cache
+TOKEN_CACHE_SIZE = 4096
+
+
+def bm25_index_path(metadata_path: Path) -> Path:
+  metadata_path = Path(metadata_path)
+  return metadata_path.with_name(metadata_path.stem + ".bm25.npz")
+
+
+def field_texts(meta: Dict[str, Any]) -> Dict[str, str]:
+  """Texte de chaque champ, tel que build_whoosh_index l'indexe."""
+  return {
+    "label": meta.get("label") or meta.get("source") or "",
+    "content": " ".join(str(meta.get(field, "")) for field in ("content", "label", "source", "section")),
+  }
+
+
+def _stored_length(length: int) -> int:
+  """Longueur de champ telle que Whoosh la relit (arrondie sur un octet)."""
+  if length_to_byte is None or not length:
+    return length
+  return byte_to_length(length_to_byte(length))
+
+
+def build_bm25_columns(metadata: Sequence[Dict[str, Any]], corpus_hash: str) -> Dict[str, Any]:
+  """Analyse le corpus : vocabulaire, matrice CSR des tf et longueurs, par champ."""
+  if not WHOOSH_AVAILABLE:
+    raise RuntimeError("Whoosh indisponible : pip install whoosh (analyseurs du moteur BM25)")
+  schema = build_whoosh_schema()
+  columns: Dict[str, Any] = {"format_version": BM25_FORMAT_VERSION, "corpus_hash": corpus_hash, "n_docs": len(metadata)}
+  for field in BM25_FIELDS:
+    analyzer = schema[field].analyzer
+    vocabulary: Dict[str, int] = {}
+    rows: List[List[Tuple[int, int]]] = []
+    lengths = np.zeros(len(metadata), dtype=np.int64)
+    for doc, meta in enumerate(metadata):
+      counts: Dict[str, int] = {}
+      for token in analyzer(field_texts(meta)[field]):
+        counts[token.text] = counts.get(token.text, 0) + 1
+      lengths[doc] = sum(counts.values())
+      for text, tf in counts.items():
+        term = vocabulary.get(text)
+        if term is None:
+          term = vocabulary[text] = len(rows)
+          rows.append([])
+        rows[term].append((doc, tf))
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(row) for row in rows])
+    columns[field] = {
+      "vocabulary": list(vocabulary),
+      "indptr": indptr,
+      "indices": np.fromiter((doc for row in rows for doc, _ in row), dtype=np.int32, count=int(indptr[-1])),
+      "tf": np.fromiter((tf for row in rows for _, tf in row), dtype=np.int32, count=int(indptr[-1])),
+      "lengths": lengths,
+    }
+  return columns
+
+
+def save_bm25_columns(path: Path, columns: Dict[str, Any]) -> None:
+  """Écriture atomique (fichier temporaire voisin puis renommage)."""
+  path = Path(path)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  arrays: Dict[str, np.ndarray] = {}
+  header = {key: columns[key] for key in ("format_version", "corpus_hash", "n_docs")}
+  arrays["header"] = np.array(json.dumps(header))
+  for field in BM25_FIELDS:
+    data = columns[field]
+    arrays[f"{field}_vocabulary"] = np.array(data["vocabulary"], dtype=str)
+    for key in ("indptr", "indices", "tf", "lengths"):
+      arrays[f"{field}_{key}"] = data[key]
+  fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+  try:
+    with os.fdopen(fd, "wb") as f:
+      np.savez(f, **arrays)
+    os.chmod(tmp_name, 0o644)
+    os.replace(tmp_name, path)
+  except BaseException:
+    try:
+      os.unlink(tmp_name)
+    except OSError:
+      pass
+    raise
+
+
+def load_bm25_columns(path: Path, corpus_hash: str) -> Optional[Dict[str, Any]]:
+  """Colonnes précalculées, ou None si absentes / périmées."""
+  path = Path(path)
+  if not path.exists():
+    return None
+  with np.load(path, allow_pickle=False) as data:
+    header = json.loads(str(data["header"]))
+    if header.get("format_version") != BM25_FORMAT_VERSION or header.get("corpus_hash") != corpus_hash:
+      return None
+    columns: Dict[str, Any] = dict(header)
+    for field in BM25_FIELDS:
+      columns[field] = {
+        "vocabulary": data[f"{field}_vocabulary"].tolist(),
+        **{key: data[f"{field}_{key}"] for key in ("indptr", "indices", "tf", "lengths")},
+      }
+  return columns
+
+
+class _FieldMatrix:
+  """Matrice CSR termes × documents d'un champ, valeurs = poids BM25 précalculés."""
+
+  def __init__(self, data: Dict[str, Any], n_docs: int, k1: float, b: float):
+    self.vocabulary = {text: term for term, text in enumerate(data["vocabulary"])}
+    self.indptr = np.asarray(data["indptr"], dtype=np.int64)
+    self.indices = np.asarray(data["indices"], dtype=np.int64)
+    tf = np.asarray(data["tf"], dtype=np.float64)
+    raw_lengths = np.asarray(data["lengths"], dtype=np.int64)
+    # Comme Whoosh : moyenne sur les longueurs exactes, longueur du document arrondie
+    avgfl = (raw_lengths.sum() / n_docs if n_docs else 0.0) or 1.0
+    lengths = np.array([_stored_length(int(length)) for length in raw_lengths], dtype=np.float64)
+    df = np.diff(self.indptr)
+    idf = np.log(n_docs / (df + 1.0)) + 1.0 if n_docs else np.zeros(df.size)
+    row_idf = np.repeat(idf, df)
+    fl = lengths[self.indices]
+    self.weights = row_idf * (tf * (k1 + 1)) / (tf + k1 * ((1 - b) + b * fl / avgfl))
+
+  def row(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+    start, end = self.indptr[term], self.indptr[term + 1]
+    return self.indices[start:end], self.weights[start:end]
+
+
+class BM25Index:
+  """Index BM25F en mémoire : search(question, limit) → (indices, scores) décroissants."""
+
+  def __init__(
+    self,
+    columns: Dict[str, Any],
+    k1: float = DEFAULT_K1,
+    b: float = DEFAULT_B,
+    field_weights: Optional[Dict[str, float]] = None,
+  ):
+    if not WHOOSH_AVAILABLE:
+      raise RuntimeError("Whoosh indisponible : pip install whoosh (analyseurs du moteur BM25)")
+    self.n_docs = int(columns["n_docs"])
+    self.corpus_hash = columns.get("corpus_hash")
+    self.k1 = k1
+    self.b = b
+    self.field_weights = {field: 1.0 for field in BM25_FIELDS}
+    self.field_weights.update(field_weights or {})
+    self._fields = {field: _FieldMatrix(columns[field], self.n_docs, k1, b) for field in BM25_FIELDS}
+    schema = build_whoosh_schema()
+    self._analyzers = {field: schema[field].analyzer for field in BM25_FIELDS}
+    # Partagé par les threads de retrieval_executor : accès sous verrou
+    self._token_cache: "OrderedDict[str, Dict[str, Tuple[str, ...]]]" = OrderedDict()
+    self._token_lock = threading.Lock()
+
+  def __len__(self) -> int:
+    return self.n_docs
+
+  def _word_tokens(self, word: str) -> Dict[str, Tuple[str, ...]]:
+    """
+    Formes analysées (requête) d'un mot pour chaque champ, avec cache LRU. L'analyse se
+    fait hors du verrou : deux threads peuvent calculer le même mot, avec le même résultat.
+    """
+    with self._token_lock:
+      cached = self._token_cache.get(word)
+      if cached is not None:
+        self._token_cache.move_to_end(word)
+        return cached
+    tokens = {
+      field: tuple(token.text for token in analyzer(word, mode="query"))
+      for field, analyzer in self._analyzers.items()
+    }
+    with self._token_lock:
+      self._token_cache[word] = tokens
+      self._token_cache.move_to_end(word)
+      while len(self._token_cache) > TOKEN_CACHE_SIZE:
+        self._token_cache.popitem(last=False)
+    return tokens
+
+  def query_terms(self, question: Optional[str]) -> Dict[str, List[int]]:
+    """
+    Identifiants (distincts, comme l'Or de Whoosh) des termes connus de la question, par champ.
+
+    Écart connu avec le QueryParser de Whoosh : "?" y est un joker. Isolé ("cantine ?"),
+    il ne trouve aucun terme (les analyseurs écartent les mots d'une lettre) et le score
+    est identique ; collé à un mot ("cantine?"), Whoosh cherche "cantine" suivi d'un
+    caractère, alors qu'ici l'analyseur retire la ponctuation et cherche "cantine".
+    """
+    terms: Dict[str, List[int]] = {field: [] for field in BM25_FIELDS}
+    seen = {field: set() for field in BM25_FIELDS}
+    for word in (question or "").split():
+      for field, tokens in self._word_tokens(word).items():
+        vocabulary = self._fields[field].vocabulary
+        for token in tokens:
+          term = vocabulary.get(token)
+          if term is not None and term not in seen[field]:
+            seen[field].add(term)
+            terms[field].append(term)
+    return terms
+
+  def score(self, question: Optional[str], terms: Optional[Dict[str, List[int]]] = None) -> np.ndarray:
+    """
+    Score BM25F de chaque document (0 pour les documents sans terme de la question).
+    terms : résultat de query_terms(question) déjà calculé (mémo du serveur).
+    """
+    scores = np.zeros(self.n_docs, dtype=np.float64)
+    if terms is None:
+      terms = self.query_terms(question)
+    for field, field_terms in terms.items():
+      if not field_terms:
+        continue
+      matrix = self._fields[field]
+      rows = [matrix.row(term) for term in field_terms]
+      docs = np.concatenate([docs for docs, _ in rows])
+      weights = np.concatenate([weights for _, weights in rows])
+      scores += self.field_weights[field] * np.bincount(docs, weights, self.n_docs)
+    return scores
+
+  def search(
+    self,
+    question: Optional[str],
+    limit: int = 10,
+    terms: Optional[Dict[str, List[int]]] = None,
+  ) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices des meilleurs documents et leurs scores (ex æquo : indice croissant)."""
+    scores = self.score(question, terms)
+    matched = np.flatnonzero(scores > 0)
+    if not matched.size or limit <= 0:
+      return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    if matched.size > limit:
+      # limit-ième meilleur score ; parmi les ex æquo à la frontière, les plus petits indices
+      kth = scores[matched[np.argpartition(-scores[matched], limit - 1)[limit - 1]]]
+      above = matched[scores[matched] > kth]
+      matched = np.concatenate([above, matched[scores[matched] == kth][: limit - above.size]])
+    order = np.lexsort((matched, -scores[matched]))
+    top = matched[order]
+    return top, scores[top]
+
+  def stats(self) -> Dict[str, Any]:
+    return {
+      "docs": self.n_docs,
+      "terms": {field: len(matrix.vocabulary) for field, matrix in self._fields.items()},
+      "nnz": {field: int(matrix.indices.size) for field, matrix in self._fields.items()},
+      "token_cache": len(self._token_cache),
+    }
+
+
+def open_or_build_bm25_index(
+  path: Path,
+  metadata: Sequence[Dict[str, Any]],
+  corpus_hash: str,
+  k1: float = DEFAULT_K1,
+  b: float = DEFAULT_B,
+) -> Tuple[BM25Index, bool]:
+  """Charge les comptes persistés ou les recalcule (et les écrit). Retourne (index, reconstruit)."""
+  columns = load_bm25_columns(path, corpus_hash)
+  rebuilt = columns is None
+  if rebuilt:
+    columns = build_bm25_columns(metadata, corpus_hash)
+    try:
+      save_bm25_columns(path, columns)
+    except OSError as exc:
+      print(f"⚠️ Impossible d'écrire l'index BM25: {exc}")
+  return BM25Index(columns, k1=k1, b=b), rebuilt
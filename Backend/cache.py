@@ -1,35 +1,84 @@
 """
 Cache mémoire pour questions fréquentes dans le système RAG.
-Utilise un dictionnaire Python simple avec TTL (Time To Live).
+Cache borné (LRU + TTL, plafonds en entrées et en octets), sûr entre threads.
+
+Backends interchangeables pour get_cache() :
+- "memory" : SimpleCache, propre à chaque processus,
+- "sqlite" : SQLiteCache, fichier SQLite (WAL) partagé par les workers et persistant,
+- "redis"  : RedisCache, serveur compatible Redis partagé entre machines.
+
+SemanticCache ajoute un second niveau : les questions reformulées
+("tarif cantine ?" / "quel est le tarif de la cantine") retrouvent la réponse
+d'une question proche via la similarité cosinus de leurs embeddings.
+
+QueryMemo mémorise les calculs faits sur le texte de la requête elle-même (embedding,
+requête BM25 analysée), en amont de ces caches de réponses.
 """
 
 from __future__ import annotations
 
 import hashlib
+import heapq
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
 import time
-from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
 
 
 class SimpleCache:
     """
-    Cache simple en mémoire avec TTL.
-    
+    Cache en mémoire borné : TTL + éviction LRU.
+
+    - bornes : max_entries (nombre d'entrées) et max_bytes (taille JSON estimée des valeurs),
+    - LRU : OrderedDict, l'entrée la moins récemment lue/écrite est évincée en O(1),
+    - expiration : paresseuse à la lecture + purge périodique via un tas (expires_at, clé),
+      sans parcours complet du cache,
+    - thread-safe : verrou autour de chaque opération (endpoint + pool de threads).
+
     Structure:
     {
         cache_key: {
             "value": ...,
-            "expires_at": timestamp
+            "expires_at": timestamp,
+            "size": octets estimés
         }
     }
     """
     
-    def __init__(self, default_ttl: int = 3600):
+    def __init__(
+        self,
+        default_ttl: int = 3600,
+        max_entries: Optional[int] = 1000,
+        max_bytes: Optional[int] = 50 * 1024 * 1024,
+        purge_interval: float = 60.0,
+    ):
         """
         Args:
             default_ttl: TTL par défaut en secondes (1h = 3600)
+            max_entries: Nombre maximal d'entrées (None = illimité)
+            max_bytes: Taille maximale estimée des valeurs en octets (None = illimitée)
+            purge_interval: Intervalle minimal entre deux purges des entrées expirées (secondes)
         """
-        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._lock = threading.RLock()
         self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
     
     def _make_key(self, question: str) -> str:
         """Crée une clé de cache à partir d'une question normalisée"""
@@ -37,6 +86,49 @@ class SimpleCache:
         normalized = question.lower().strip()
         # Hash pour clé unique
         return hashlib.md5(normalized.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        try:
+            return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        except (TypeError, ValueError):
+            return sys.getsizeof(value)
+
+    def _delete(self, key: str) -> None:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry["size"]
+
+    def _purge_expired(self, now: float) -> int:
+        """Retire les entrées expirées en tête du tas (entrées périmées du tas ignorées)."""
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._cache.get(key)
+            if entry is not None and entry["expires_at"] == expires_at:
+                self._delete(key)
+                removed += 1
+        # Le tas garde des doublons quand une clé est réécrite : compaction occasionnelle
+        if len(heap) > 2 * len(self._cache) + 64:
+            self._expiry_heap = [(entry["expires_at"], key) for key, entry in self._cache.items()]
+            heapq.heapify(self._expiry_heap)
+        self._expirations += removed
+        self._next_purge = now + self.purge_interval
+        return removed
+
+    def _maybe_purge(self, now: float) -> None:
+        if now >= self._next_purge:
+            self._purge_expired(now)
+
+    def _evict_over_capacity(self) -> None:
+        while self._cache and (
+            (self.max_entries is not None and len(self._cache) > self.max_entries)
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            key, entry = self._cache.popitem(last=False)
+            self._total_bytes -= entry["size"]
+            self._evictions += 1
     
     def get(self, question: str) -> Optional[Any]:
         """
@@ -49,19 +141,25 @@ class SimpleCache:
             Valeur en cache ou None si absente/expirée
         """
         key = self._make_key(question)
-        if key not in self._cache:
-            return None
-        
-        entry = self._cache[key]
-        expires_at = entry.get("expires_at", 0)
-        
-        # Vérifier expiration
-        if time.time() > expires_at:
-            # Expiré, supprimer
-            del self._cache[key]
-            return None
-        
-        return entry.get("value")
+        with self._lock:
+            now = time.time()
+            self._maybe_purge(now)
+            entry = self._cache.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            
+            # Vérifier expiration
+            if now > entry["expires_at"]:
+                # Expiré, supprimer
+                self._delete(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return entry["value"]
     
     def set(self, question: str, value: Any, ttl: Optional[int] = None) -> None:
         """
@@ -74,16 +172,27 @@ class SimpleCache:
         """
         key = self._make_key(question)
         ttl = ttl or self.default_ttl
-        expires_at = time.time() + ttl
-        
-        self._cache[key] = {
-            "value": value,
-            "expires_at": expires_at
-        }
+        size = self._estimate_size(value)
+        with self._lock:
+            now = time.time()
+            self._maybe_purge(now)
+            expires_at = now + ttl
+            self._delete(key)
+            self._cache[key] = {
+                "value": value,
+                "expires_at": expires_at,
+                "size": size,
+            }
+            self._total_bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            self._evict_over_capacity()
     
     def clear(self) -> None:
         """Vide tout le cache"""
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
+            self._expiry_heap.clear()
+            self._total_bytes = 0
     
     def clear_expired(self) -> int:
         """
@@ -92,54 +201,476 @@ class SimpleCache:
         Returns:
             Nombre d'entrées supprimées
         """
-        now = time.time()
-        expired_keys = [
-            key for key, entry in self._cache.items()
-            if entry.get("expires_at", 0) < now
-        ]
-        
-        for key in expired_keys:
-            del self._cache[key]
-        
-        return len(expired_keys)
+        with self._lock:
+            return self._purge_expired(time.time())
     
     def size(self) -> int:
         """Retourne le nombre d'entrées dans le cache"""
         return len(self._cache)
     
     def stats(self) -> Dict[str, Any]:
-        """Retourne des statistiques sur le cache"""
+        """Retourne des statistiques sur le cache (sans parcourir les entrées)"""
+        with self._lock:
+            self._purge_expired(time.time())
+            lookups = self._hits + self._misses
+            return {
+                "total_entries": len(self._cache),
+                "expired_entries": 0,
+                "active_entries": len(self._cache),
+                "total_bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "default_ttl": self.default_ttl
+            }
+
+
+class SQLiteCache:
+    """
+    Cache persistant partagé entre workers : SQLite en mode WAL sur disque local.
+
+    Même interface que SimpleCache. Les réponses survivent aux redéploiements
+    (si le fichier est sur un volume persistant) et un hit sur un worker profite
+    à tous les autres. Une connexion par thread (sqlite3 n'est pas partageable).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        default_ttl: int = 3600,
+        max_entries: Optional[int] = 10000,
+        purge_interval: float = 60.0,
+    ):
+        self.path = str(path)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_entries (expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries (accessed_at)")
+
+    _make_key = SimpleCache._make_key
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None : autocommit, chaque requête est sa propre transaction
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _maybe_purge(self, now: float) -> None:
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.purge_interval
+        self.clear_expired()
+        if self.max_entries is not None:
+            conn = self._conn()
+            overflow = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE key IN ("
+                    " SELECT key FROM cache_entries ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                with self._lock:
+                    self._evictions += overflow
+
+    def get(self, question: str) -> Optional[Any]:
+        key = self._make_key(question)
         now = time.time()
-        expired = sum(
-            1 for entry in self._cache.values()
-            if entry.get("expires_at", 0) < now
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < now:
+            if row is not None:
+                conn.execute("DELETE FROM cache_entries WHERE key = ? AND expires_at < ?", (key, now))
+            with self._lock:
+                self._misses += 1
+            return None
+        conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self._hits += 1
+        return json.loads(row[0])
+
+    def set(self, question: str, value: Any, ttl: Optional[int] = None) -> None:
+        key = self._make_key(question)
+        ttl = ttl or self.default_ttl
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False, default=str), now + ttl, now),
         )
-        
+        self._maybe_purge(now)
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM cache_entries")
+
+    def clear_expired(self) -> int:
+        cursor = self._conn().execute("DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        total, expired = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(expires_at < ?), 0) FROM cache_entries", (now,)
+        ).fetchone()
+        lookups = self._hits + self._misses
         return {
-            "total_entries": len(self._cache),
+            "backend": "sqlite",
+            "path": self.path,
+            "total_entries": total,
             "expired_entries": expired,
-            "active_entries": len(self._cache) - expired,
+            "active_entries": total - expired,
+            "max_entries": self.max_entries,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "evictions": self._evictions,
+            "default_ttl": self.default_ttl
+        }
+
+
+class RedisCache:
+    """
+    Cache partagé via un serveur parlant le protocole Redis (Redis, Valkey, KeyDB…).
+    Le TTL est délégué au serveur (SETEX) ; les clés sont préfixées pour cohabiter
+    avec d'autres usages de la même base.
+    """
+
+    def __init__(self, url: str, default_ttl: int = 3600, prefix: str = "amiens-rag:"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("Backend redis indisponible : pip install redis") from exc
+        self.url = url
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self._client.ping()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+
+    def _make_key(self, question: str) -> str:
+        return self.prefix + SimpleCache._make_key(self, question)
+
+    def _keys(self):
+        return self._client.scan_iter(match=self.prefix + "*", count=500)
+
+    def get(self, question: str) -> Optional[Any]:
+        raw = self._client.get(self._make_key(question))
+        with self._lock:
+            if raw is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        return json.loads(raw)
+
+    def set(self, question: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl or self.default_ttl
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        self._client.setex(self._make_key(question), int(ttl), payload)
+        with self._lock:
+            self._writes += 1
+
+    def clear(self) -> None:
+        keys = list(self._keys())
+        if keys:
+            self._client.delete(*keys)
+
+    def clear_expired(self) -> int:
+        # Expiration gérée par le serveur Redis
+        return 0
+
+    def size(self) -> int:
+        # Parcours complet (SCAN) : à réserver aux appels ponctuels, pas à /stats
+        return sum(1 for _ in self._keys())
+
+    def stats(self) -> Dict[str, Any]:
+        # Compteurs locaux uniquement : pas d'aller-retour Redis à chaque appel de /stats.
+        # Le nombre d'entrées (partagé entre instances, expiré par le serveur) n'est pas suivi.
+        with self._lock:
+            hits, misses, writes = self._hits, self._misses, self._writes
+        lookups = hits + misses
+        return {
+            "backend": "redis",
+            "total_entries": None,
+            "expired_entries": 0,
+            "active_entries": None,
+            "writes": writes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
             "default_ttl": self.default_ttl
         }
 
 
+class SemanticCache:
+    """
+    Cache sémantique : plus proche question en cache (cosinus sur embeddings normalisés).
+
+    Seules les questions en cache portant les mêmes nombres sont candidates.
+
+    - hit             : similarité >= threshold,
+    - number_mismatch : pas de candidate au seuil, mais une question proche (>= threshold)
+                        avec d'autres nombres ("catégorie 3" / "catégorie 4"),
+    - near_miss       : meilleure similarité dans [threshold - near_miss_margin, threshold[,
+                        utile pour régler le seuil,
+    - miss            : sinon.
+    """
+
+    _NUMBER_RE = re.compile(r"\d+")
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        near_miss_margin: float = 0.05,
+        default_ttl: int = 3600,
+        max_entries: int = 2000,
+    ):
+        self.threshold = threshold
+        self.near_miss_margin = near_miss_margin
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._expires_at = np.zeros(0, dtype=np.float64)
+        self._values: List[Any] = []
+        self._questions: List[str] = []
+        self._numbers: List[FrozenSet[str]] = []
+        self._hits = 0
+        self._misses = 0
+        self._near_misses = 0
+        self._number_mismatches = 0
+
+    def _question_numbers(self, question: str) -> FrozenSet[str]:
+        # "catégorie 3" et "catégorie 4" sont très proches en embedding mais n'ont pas la même réponse
+        return frozenset(self._NUMBER_RE.findall(question or ""))
+
+    def _remove(self, index: int) -> None:
+        # Échange avec la dernière entrée pour une suppression en O(dim)
+        last = len(self._values) - 1
+        if index != last:
+            self._vectors[index] = self._vectors[last]
+            self._expires_at[index] = self._expires_at[last]
+            self._values[index] = self._values[last]
+            self._questions[index] = self._questions[last]
+            self._numbers[index] = self._numbers[last]
+        self._values.pop()
+        self._questions.pop()
+        self._numbers.pop()
+
+    def _purge_expired(self, now: float) -> None:
+        count = len(self._values)
+        for index in sorted(np.flatnonzero(self._expires_at[:count] < now).tolist(), reverse=True):
+            self._remove(index)
+
+    def lookup(self, vector: np.ndarray, question: str) -> Optional[Tuple[Any, str, float]]:
+        """
+        Cherche la question en cache la plus proche.
+
+        Returns:
+            (valeur, question en cache, similarité) ou None
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            count = len(self._values)
+            if count == 0:
+                self._misses += 1
+                return None
+            now = time.time()
+            similarities = self._vectors[:count] @ query
+            similarities[self._expires_at[:count] < now] = -1.0
+            numbers = self._question_numbers(question)
+            same_numbers = np.fromiter(
+                (entry_numbers == numbers for entry_numbers in self._numbers), dtype=bool, count=count
+            )
+            best_any_score = float(similarities.max())
+            # Filtre avant l'argmax : une question plus proche mais aux nombres différents
+            # ne masque pas une candidate valide
+            similarities[~same_numbers] = -1.0
+            best = int(np.argmax(similarities))
+            best_score = float(similarities[best])
+            if best_score >= self.threshold:
+                self._hits += 1
+                return self._values[best], self._questions[best], best_score
+            if best_any_score >= self.threshold:
+                self._number_mismatches += 1
+            elif best_score >= self.threshold - self.near_miss_margin:
+                self._near_misses += 1
+            else:
+                self._misses += 1
+            return None
+
+    def add(self, vector: np.ndarray, question: str, value: Any, ttl: Optional[int] = None) -> None:
+        entry = np.asarray(vector, dtype=np.float32)
+        expires_at = time.time() + (ttl or self.default_ttl)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, entry.shape[0]), dtype=np.float32)
+                self._expires_at = np.zeros(self.max_entries, dtype=np.float64)
+            if len(self._values) >= self.max_entries:
+                self._purge_expired(time.time())
+            if len(self._values) >= self.max_entries:
+                # Toujours plein : on sacrifie l'entrée qui expire le plus tôt
+                self._remove(int(np.argmin(self._expires_at[: len(self._values)])))
+            index = len(self._values)
+            self._vectors[index] = entry
+            self._expires_at[index] = expires_at
+            self._values.append(value)
+            self._questions.append(question)
+            self._numbers.append(self._question_numbers(question))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self._questions.clear()
+            self._numbers.clear()
+
+    def size(self) -> int:
+        return len(self._values)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses + self._near_misses + self._number_mismatches
+        return {
+            "total_entries": len(self._values),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self._hits,
+            "misses": self._misses,
+            "near_misses": self._near_misses,
+            "number_mismatches": self._number_mismatches,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class QueryMemo:
+    """
+    Mémo LRU borné, sans TTL, pour les résultats déterministes d'une requête
+    (embedding de la question, requête BM25 analysée).
+
+    La valeur est calculée hors du verrou : deux threads qui manquent la même clé en
+    même temps la calculent chacun une fois, le résultat est identique.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            self._misses += 1
+        value = compute()
+        if self.max_entries <= 0:
+            return value
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+CACHE_BACKENDS = ("memory", "sqlite", "redis")
+
 # Instance globale du cache (singleton)
-_global_cache: Optional[SimpleCache] = None
+_global_cache: Optional[Any] = None
+_global_semantic_cache: Optional[SemanticCache] = None
 
 
-def get_cache(ttl: int = 3600) -> SimpleCache:
+def get_cache(
+    ttl: int = 3600,
+    max_entries: Optional[int] = 1000,
+    max_bytes: Optional[int] = 50 * 1024 * 1024,
+    backend: str = "memory",
+    sqlite_path: Optional[str] = None,
+    redis_url: Optional[str] = None,
+) -> Any:
     """
     Récupère l'instance globale du cache (singleton).
     
     Args:
         ttl: TTL par défaut si cache n'existe pas encore
+        max_entries: Nombre maximal d'entrées si cache n'existe pas encore
+        max_bytes: Taille maximale estimée (backend memory uniquement)
+        backend: "memory", "sqlite" ou "redis"
+        sqlite_path: Fichier SQLite (backend sqlite)
+        redis_url: URL du serveur (backend redis), ex. redis://localhost:6379/0
         
     Returns:
-        Instance SimpleCache
+        Instance SimpleCache, SQLiteCache ou RedisCache
     """
     global _global_cache
     if _global_cache is None:
-        _global_cache = SimpleCache(default_ttl=ttl)
+        try:
+            if backend == "sqlite":
+                if not sqlite_path:
+                    raise ValueError("sqlite_path requis pour le backend sqlite")
+                _global_cache = SQLiteCache(sqlite_path, default_ttl=ttl, max_entries=max_entries)
+            elif backend == "redis":
+                if not redis_url:
+                    raise ValueError("redis_url requis pour le backend redis")
+                _global_cache = RedisCache(redis_url, default_ttl=ttl)
+            elif backend != "memory":
+                raise ValueError(f"Backend de cache inconnu: {backend} (attendu: {', '.join(CACHE_BACKENDS)})")
+        except Exception as exc:
+            print(f"⚠️ Cache {backend} indisponible ({exc}) : repli sur le cache mémoire.")
+        if _global_cache is None:
+            _global_cache = SimpleCache(default_ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
     return _global_cache
 
 
@@ -157,3 +688,21 @@ def cache_stats() -> Dict[str, Any]:
         return {"total_entries": 0, "active_entries": 0}
     return _global_cache.stats()
 
+
+def get_semantic_cache(
+    threshold: float = 0.92,
+    ttl: int = 3600,
+    max_entries: int = 2000,
+) -> SemanticCache:
+    """Récupère l'instance globale du cache sémantique (singleton)."""
+    global _global_semantic_cache
+    if _global_semantic_cache is None:
+        _global_semantic_cache = SemanticCache(threshold=threshold, default_ttl=ttl, max_entries=max_entries)
+    return _global_semantic_cache
+
+
+def semantic_cache_stats() -> Dict[str, Any]:
+    """Retourne les statistiques du cache sémantique global"""
+    if _global_semantic_cache is None:
+        return {"total_entries": 0, "hits": 0, "misses": 0, "near_misses": 0, "number_mismatches": 0}
+    return _global_semantic_cache.stats()
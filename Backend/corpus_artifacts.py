@@ -0,0 +1,370 @@
+"""
+Artefacts du corpus RAG partagés entre le pipeline (ML/embed_corpus.py) et le serveur.
+
+Magasin d'embeddings versionné :
+- matrice .npy (float32, float16 ou int8 quantifié) ouverte en mmap (zéro copie,
+  pages partagées entre workers uvicorn via le cache de l'OS),
+- en-tête JSON à côté (<nom>.header.json) : version, dtype, modèle, dimension, hash du corpus,
+- pour int8 : échelles par ligne dans <nom>.scales.npy.
+
+Index BM25 Whoosh persistant :
+- construit une fois à côté de corpus_metadata.json (<nom>_whoosh/),
+- marqué par le hash du corpus (corpus_hash.txt) et reconstruit seulement si ce hash change,
+- ouvert en lecture seule au démarrage par chaque worker.
+
+Colonnes normalisées (<nom>.normalized.json) :
+- texte normalisé (normalize_text) et ensemble de mots de chaque segment,
+- marquées par le hash du corpus et la version de la normalisation.
+
+Identifiants de segments : hash court du contenu de chaque segment, stables d'une
+reconstruction du corpus à l'autre tant que le segment ne change pas (API /search).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+try:
+  from .text_normalize import NORMALIZE_VERSION, normalize_many, token_set
+except ImportError:
+  from text_normalize import NORMALIZE_VERSION, normalize_many, token_set
+
+try:
+  from whoosh.analysis import StemmingAnalyzer
+  from whoosh.fields import ID, TEXT, Schema
+  from whoosh.index import create_in, open_dir
+  from whoosh.lang.snowball.french import FrenchStemmer
+except ImportError:
+  StemmingAnalyzer = None
+  Schema = None
+  create_in = None
+  open_dir = None
+  FrenchStemmer = None
+
+WHOOSH_AVAILABLE = bool(Schema and StemmingAnalyzer and FrenchStemmer)
+WHOOSH_HASH_FILE = "corpus_hash.txt"
+
+STORE_FORMAT_VERSION = 1
+NORMALIZED_FORMAT_VERSION = 1
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+# Taille des blocs convertis en float32 lors du produit scalaire (float16/int8)
+DOT_CHUNK_ROWS = 4096
+
+
+SEGMENT_FIELDS = ("label", "source", "url", "section", "content")
+# Longueur (hexadécimale) des identifiants de segments
+SEGMENT_ID_LENGTH = 12
+
+
+def _segment_record(entry: Dict[str, Any]) -> bytes:
+  record = {field: entry.get(field) for field in SEGMENT_FIELDS}
+  return json.dumps(record, ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+
+def compute_corpus_hash(metadata: Iterable[Dict[str, Any]]) -> str:
+  """Hash stable du contenu du corpus (sert à invalider les artefacts dérivés)."""
+  digest = hashlib.sha256()
+  for entry in metadata:
+    digest.update(_segment_record(entry))
+    digest.update(b"\n")
+  return digest.hexdigest()
+
+
+def segment_id(entry: Dict[str, Any]) -> str:
+  """Identifiant stable d'un segment (hash de ses champs) ; deux copies identiques partagent le même."""
+  return hashlib.sha256(_segment_record(entry)).hexdigest()[:SEGMENT_ID_LENGTH]
+
+
+def store_header_path(embeddings_path: Path) -> Path:
+  embeddings_path = Path(embeddings_path)
+  return embeddings_path.with_name(embeddings_path.stem + ".header.json")
+
+
+def store_scales_path(embeddings_path: Path) -> Path:
+  embeddings_path = Path(embeddings_path)
+  return embeddings_path.with_name(embeddings_path.stem + ".scales.npy")
+
+
+def quantize_int8(embeddings: np.ndarray) -> tuple:
+  """Quantification symétrique par ligne : row ≈ q * scale."""
+  matrix = np.asarray(embeddings, dtype=np.float32)
+  max_abs = np.abs(matrix).max(axis=1)
+  scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+  quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+  return quantized, scales
+
+
+def save_embedding_store(
+  path: Path,
+  embeddings: np.ndarray,
+  model_name: str,
+  corpus_hash: str,
+  dtype: str = "float16",
+) -> Dict[str, Any]:
+  """Écrit la matrice + son en-tête. Retourne l'en-tête écrit."""
+  if dtype not in SUPPORTED_DTYPES:
+    raise ValueError(f"dtype non supporté: {dtype} (attendu: {', '.join(SUPPORTED_DTYPES)})")
+  path = Path(path)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  matrix = np.asarray(embeddings, dtype=np.float32)
+  if matrix.ndim != 2:
+    raise ValueError(f"Matrice d'embeddings 2D attendue, reçu shape={matrix.shape}")
+
+  scales_file: Optional[str] = None
+  scales_path = store_scales_path(path)
+  if dtype == "int8":
+    stored, scales = quantize_int8(matrix)
+    np.save(scales_path, scales)
+    scales_file = scales_path.name
+  else:
+    stored = matrix.astype(dtype)
+    if scales_path.exists():
+      scales_path.unlink()
+  np.save(path, np.ascontiguousarray(stored))
+
+  header = {
+    "format_version": STORE_FORMAT_VERSION,
+    "dtype": dtype,
+    "model": model_name,
+    "dim": int(matrix.shape[1]),
+    "count": int(matrix.shape[0]),
+    "normalized": True,
+    "corpus_hash": corpus_hash,
+    "scales_file": scales_file,
+  }
+  with store_header_path(path).open("w", encoding="utf-8") as f:
+    json.dump(header, f, ensure_ascii=False, indent=2)
+  return header
+
+
+class EmbeddingStore:
+  """
+  Matrice d'embeddings (éventuellement mmap / quantifiée) exposant le produit scalaire.
+  Les blocs float16/int8 sont convertis en float32 par morceaux : la mémoire résidente
+  reste celle du fichier mappé + un bloc temporaire.
+  """
+
+  def __init__(
+    self,
+    matrix: np.ndarray,
+    scales: Optional[np.ndarray] = None,
+    header: Optional[Dict[str, Any]] = None,
+  ):
+    self.matrix = matrix
+    self.scales = scales
+    self.header = header or {}
+
+  @property
+  def dtype(self) -> str:
+    return str(self.matrix.dtype)
+
+  @property
+  def model_name(self) -> Optional[str]:
+    return self.header.get("model")
+
+  @property
+  def corpus_hash(self) -> Optional[str]:
+    return self.header.get("corpus_hash")
+
+  @property
+  def shape(self) -> tuple:
+    return self.matrix.shape
+
+  @property
+  def dim(self) -> int:
+    return int(self.matrix.shape[1])
+
+  def __len__(self) -> int:
+    return int(self.matrix.shape[0])
+
+  def _block(self, start: int, end: int) -> np.ndarray:
+    block = np.asarray(self.matrix[start:end], dtype=np.float32)
+    if self.scales is not None:
+      block = block * self.scales[start:end, None]
+    return block
+
+  def dot(self, query_vec: np.ndarray) -> np.ndarray:
+    """Scores cosinus (vecteurs normalisés) de toutes les lignes pour un vecteur requête."""
+    query = np.asarray(query_vec, dtype=np.float32)
+    if self.matrix.dtype == np.float32 and self.scales is None:
+      return np.asarray(self.matrix @ query, dtype=np.float32)
+    count = len(self)
+    scores = np.empty(count, dtype=np.float32)
+    for start in range(0, count, DOT_CHUNK_ROWS):
+      end = min(start + DOT_CHUNK_ROWS, count)
+      scores[start:end] = self._block(start, end) @ query
+    return scores
+
+  def rows(self, indices: Sequence[int]) -> np.ndarray:
+    """Lignes déquantifiées (float32) pour un sous-ensemble d'indices."""
+    idx = np.asarray(indices, dtype=np.int64)
+    block = np.asarray(self.matrix[idx], dtype=np.float32)
+    if self.scales is not None:
+      block = block * self.scales[idx, None]
+    return block
+
+
+def load_embedding_store(path: Path, mmap: bool = True) -> EmbeddingStore:
+  """
+  Ouvre un magasin d'embeddings. Sans en-tête, le fichier est traité comme un .npy
+  historique (float32) mais reste ouvert en mmap.
+  """
+  path = Path(path)
+  mmap_mode = "r" if mmap else None
+  header_path = store_header_path(path)
+  header: Optional[Dict[str, Any]] = None
+  if header_path.exists():
+    with header_path.open(encoding="utf-8") as f:
+      header = json.load(f)
+    version = header.get("format_version")
+    if version != STORE_FORMAT_VERSION:
+      raise ValueError(f"Version de magasin d'embeddings non supportée: {version}")
+
+  matrix = np.load(path, mmap_mode=mmap_mode)
+  scales = None
+  if header:
+    if str(matrix.dtype) != header.get("dtype"):
+      raise ValueError(f"dtype incohérent: fichier {matrix.dtype}, en-tête {header.get('dtype')}")
+    if matrix.shape != (header.get("count"), header.get("dim")):
+      raise ValueError(f"Shape incohérente: fichier {matrix.shape}, en-tête {header.get('count')}x{header.get('dim')}")
+    if header.get("scales_file"):
+      scales = np.load(path.with_name(header["scales_file"]), mmap_mode=mmap_mode)
+  return EmbeddingStore(matrix, scales=scales, header=header)
+
+
+def describe_store(store: EmbeddingStore) -> str:
+  megabytes = store.matrix.nbytes / (1024 * 1024)
+  return f"{len(store)}x{store.dim} {store.dtype} ({megabytes:.1f} Mo)"
+
+
+def normalized_columns_path(metadata_path: Path) -> Path:
+  metadata_path = Path(metadata_path)
+  return metadata_path.with_name(metadata_path.stem + ".normalized.json")
+
+
+def build_normalized_columns(metadata: Sequence[Dict[str, Any]], corpus_hash: str) -> Dict[str, Any]:
+  """Texte normalisé et mots distincts du champ content de chaque segment."""
+  content = normalize_many(meta.get("content") for meta in metadata)
+  return {
+    "format_version": NORMALIZED_FORMAT_VERSION,
+    "normalize_version": NORMALIZE_VERSION,
+    "corpus_hash": corpus_hash,
+    "content": content,
+    "tokens": [token_set(text) for text in content],
+  }
+
+
+def save_normalized_columns(path: Path, columns: Dict[str, Any]) -> None:
+  path = Path(path)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  tmp_path = path.with_name(path.name + ".tmp")
+  with tmp_path.open("w", encoding="utf-8") as f:
+    json.dump(columns, f, ensure_ascii=False)
+  os.replace(tmp_path, path)
+
+
+def load_normalized_columns(path: Path, corpus_hash: str) -> Optional[Dict[str, Any]]:
+  """Colonnes précalculées, ou None si absentes / périmées (autre corpus ou normalisation)."""
+  path = Path(path)
+  if not path.exists():
+    return None
+  with path.open(encoding="utf-8") as f:
+    columns = json.load(f)
+  if (
+    columns.get("format_version") != NORMALIZED_FORMAT_VERSION
+    or columns.get("normalize_version") != NORMALIZE_VERSION
+    or columns.get("corpus_hash") != corpus_hash
+  ):
+    return None
+  return columns
+
+
+def whoosh_index_dir(metadata_path: Path) -> Path:
+  """Dossier de l'index BM25 associé à un fichier de métadonnées."""
+  metadata_path = Path(metadata_path)
+  return metadata_path.with_name(metadata_path.stem + "_whoosh")
+
+
+def build_whoosh_schema():
+  # Utilisation du stemmer français (Snowball) au lieu du Porter anglais
+  return Schema(
+    id=ID(stored=True, unique=True),
+    label=TEXT(stored=True),
+    content=TEXT(analyzer=StemmingAnalyzer(minsize=2, stemfn=FrenchStemmer().stem), stored=False),
+  )
+
+
+def read_whoosh_hash(index_dir: Path) -> Optional[str]:
+  marker = Path(index_dir) / WHOOSH_HASH_FILE
+  if not marker.exists():
+    return None
+  return marker.read_text(encoding="utf-8").strip() or None
+
+
+def build_whoosh_index(index_dir: Path, metadata: Sequence[Dict[str, Any]], corpus_hash: str) -> Path:
+  """
+  Construit l'index dans un dossier temporaire voisin puis le met en place par renommage,
+  pour qu'un worker ne voie jamais un index à moitié écrit.
+  """
+  if not WHOOSH_AVAILABLE:
+    raise RuntimeError("Whoosh indisponible : pip install whoosh")
+  index_dir = Path(index_dir)
+  index_dir.parent.mkdir(parents=True, exist_ok=True)
+  build_dir = Path(tempfile.mkdtemp(prefix=f".{index_dir.name}_build_", dir=index_dir.parent))
+  try:
+    ix = create_in(build_dir, build_whoosh_schema())
+    writer = ix.writer()
+    for idx, meta in enumerate(metadata):
+      label = meta.get("label") or meta.get("source") or ""
+      content = " ".join(
+        str(meta.get(field, "")) for field in ("content", "label", "source", "section")
+      )
+      writer.add_document(id=str(idx), label=label, content=content)
+    writer.commit()
+    ix.close()
+    (build_dir / WHOOSH_HASH_FILE).write_text(corpus_hash, encoding="utf-8")
+
+    if index_dir.exists():
+      stale_dir = Path(tempfile.mkdtemp(prefix=f".{index_dir.name}_stale_", dir=index_dir.parent))
+      try:
+        os.replace(index_dir, stale_dir / "index")
+      except OSError:
+        pass
+      shutil.rmtree(stale_dir, ignore_errors=True)
+    try:
+      os.replace(build_dir, index_dir)
+    except OSError:
+      # Un autre worker a installé son index entre-temps : on garde le sien
+      if read_whoosh_hash(index_dir) != corpus_hash:
+        raise
+  finally:
+    shutil.rmtree(build_dir, ignore_errors=True)
+  return index_dir
+
+
+def open_or_build_whoosh_index(
+  index_dir: Path,
+  metadata: Sequence[Dict[str, Any]],
+  corpus_hash: Optional[str] = None,
+):
+  """
+  Ouvre l'index persistant en lecture seule ; le (re)construit si absent ou si le
+  hash du corpus a changé. Retourne (index, reconstruit: bool).
+  """
+  if not WHOOSH_AVAILABLE:
+    raise RuntimeError("Whoosh indisponible : pip install whoosh")
+  index_dir = Path(index_dir)
+  corpus_hash = corpus_hash or compute_corpus_hash(metadata)
+  rebuilt = False
+  if read_whoosh_hash(index_dir) != corpus_hash:
+    build_whoosh_index(index_dir, metadata, corpus_hash)
+    rebuilt = True
+  return open_dir(str(index_dir), readonly=True), rebuilt
@@ -0,0 +1,116 @@
+"""
+Automate d'Aho–Corasick pour les recherches de mots-clés du serveur RAG.
+
+Toutes les listes de termes (lexique usager/admin, intentions, monnaie, indices de
+requête) sont compilées une fois dans un seul automate ; un passage linéaire sur le
+texte renvoie toutes les classes de correspondances. Sémantique identique aux
+anciens tests `terme in texte` : simple recherche de sous-chaîne, sans notion de mot.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+# Classes de correspondances produites par build_keyword_matcher()
+LEXICON_USAGER = "lexicon_usager"
+LEXICON_ADMIN = "lexicon_admin"
+INTENTION = "intention"
+CURRENCY = "currency"
+QUERY_HINT = "query_hint"
+
+Payload = Tuple[str, Hashable]
+
+
+class KeywordAutomaton:
+  """Trie + liens d'échec ; chaque motif porte une ou plusieurs étiquettes (classe, clé)."""
+
+  def __init__(self):
+    self._goto: List[Dict[str, int]] = [{}]
+    self._fail: List[int] = [0]
+    self._out: List[List[Payload]] = [[]]
+    self._built = False
+    self.pattern_count = 0
+
+  def add(self, pattern: str, payload: Payload) -> None:
+    if not pattern:
+      return
+    state = 0
+    for char in pattern:
+      nxt = self._goto[state].get(char)
+      if nxt is None:
+        nxt = len(self._goto)
+        self._goto.append({})
+        self._fail.append(0)
+        self._out.append([])
+        self._goto[state][char] = nxt
+      state = nxt
+    self._out[state].append(payload)
+    self.pattern_count += 1
+    self._built = False
+
+  def build(self) -> "KeywordAutomaton":
+    queue = deque(self._goto[0].values())
+    for state in queue:
+      self._fail[state] = 0
+    while queue:
+      state = queue.popleft()
+      for char, nxt in self._goto[state].items():
+        queue.append(nxt)
+        fallback = self._fail[state]
+        while fallback and char not in self._goto[fallback]:
+          fallback = self._fail[fallback]
+        self._fail[nxt] = self._goto[fallback].get(char, 0)
+        # Les sorties du suffixe le plus long sont héritées : un seul parcours suffit
+        self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+    self._built = True
+    return self
+
+  def iter_matches(self, text: str) -> Iterator[Tuple[int, Payload]]:
+    """(position de fin, étiquette) pour chaque occurrence de motif dans le texte."""
+    if not self._built:
+      self.build()
+    goto = self._goto
+    fail = self._fail
+    out = self._out
+    state = 0
+    for position, char in enumerate(text):
+      while state and char not in goto[state]:
+        state = fail[state]
+      state = goto[state].get(char, 0)
+      for payload in out[state]:
+        yield position, payload
+
+  def scan(self, text: str) -> Dict[str, Set[Hashable]]:
+    """Clés trouvées, regroupées par classe."""
+    found: Dict[str, Set[Hashable]] = {}
+    if not text:
+      return found
+    for _, (kind, key) in self.iter_matches(text):
+      found.setdefault(kind, set()).add(key)
+    return found
+
+
+def build_keyword_matcher(
+  lexicon_entries: Iterable[Dict[str, Any]],
+  intention_keywords: Dict[str, Dict[str, Any]],
+  currency_keywords: Iterable[str],
+  query_hints: Iterable[str],
+) -> KeywordAutomaton:
+  """
+  Compile toutes les listes du serveur. Les entrées du lexique sont identifiées par
+  leur position dans `lexicon_entries`, les intentions par leur libellé.
+  """
+  automaton = KeywordAutomaton()
+  for index, entry in enumerate(lexicon_entries):
+    automaton.add(entry.get("_normalized_usager") or "", (LEXICON_USAGER, index))
+    for term in entry.get("_normalized_admin", []):
+      automaton.add(term, (LEXICON_ADMIN, index))
+  for label, data in intention_keywords.items():
+    for keyword in data.get("keywords", ()):
+      automaton.add(keyword, (INTENTION, label))
+  for keyword in currency_keywords:
+    automaton.add(keyword, (CURRENCY, keyword))
+  for hint in query_hints:
+    automaton.add(hint, (QUERY_HINT, hint))
+  return automaton.build()
@@ -0,0 +1,95 @@
+"""
+Routage du modèle Claude par requête.
+
+- route "fast"  : recherches simples (contact, adresse, horaires, tarif) dont la réponse est
+  déjà dans les données structurées ou dans un segment très bien classé → modèle rapide.
+- route "large" : synthèse (compréhension, organisation, anticipation sur plusieurs
+  segments, conversation en cours) → grand modèle.
+
+Les signaux viennent de prepare_assistant_prompt (intention, lexique, données
+structurées injectées, scores des segments) : aucun calcul supplémentaire.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Sequence, Tuple
+
+ROUTE_FAST = "fast"
+ROUTE_LARGE = "large"
+
+# Intentions de synthèse : toujours le grand modèle dès que plusieurs segments sont en jeu
+SYNTHESIS_INTENTS = ("compréhension", "organisation", "anticipation")
+# Intentions de recherche simple
+LOOKUP_INTENTS = ("action",)
+# Au-delà de ce nombre de tours d'historique, la réponse dépend du contexte : grand modèle
+MAX_FAST_HISTORY_TURNS = 2
+# Nombre d'échantillons de latence conservés par route (percentiles)
+LATENCY_WINDOW = 500
+
+
+def choose_route(
+  intent_label: Optional[str],
+  intent_weight: Optional[float],
+  lexicon_match_count: int,
+  structured_injected: bool,
+  segment_scores: Sequence[float],
+  history_turns: int = 0,
+  fast_min_score: float = 10.0,
+) -> Tuple[str, str]:
+  """Retourne (route, raison)."""
+  scores = sorted((score for score in segment_scores if score is not None), reverse=True)
+  top_score = scores[0] if scores else 0.0
+  if history_turns > MAX_FAST_HISTORY_TURNS:
+    return ROUTE_LARGE, "conversation en cours"
+  if intent_label in SYNTHESIS_INTENTS and len(scores) >= 2:
+    return ROUTE_LARGE, f"synthèse ({intent_label}, {len(scores)} segments)"
+  if structured_injected:
+    # La réponse est dans les données structurées : il s'agit surtout de la mettre en forme
+    return ROUTE_FAST, f"données structurées ({intent_label or 'inconnue'})"
+  if intent_label in LOOKUP_INTENTS and top_score >= fast_min_score and lexicon_match_count <= 1:
+    return ROUTE_FAST, f"recherche simple ({intent_label}), segment dominant {top_score:.1f}"
+  return ROUTE_LARGE, f"défaut ({intent_label or 'inconnue'})"
+
+
+class RouteStats:
+  """Compteurs et latences (moyenne, p50, p95) des appels Claude par route."""
+
+  def __init__(self, window: int = LATENCY_WINDOW):
+    self._lock = threading.Lock()
+    self._window = window
+    self._counts: Dict[str, int] = {}
+    self._errors: Dict[str, int] = {}
+    self._total_seconds: Dict[str, float] = {}
+    self._samples: Dict[str, Deque[float]] = {}
+
+  def record(self, route: str, seconds: float, error: bool = False) -> None:
+    with self._lock:
+      self._counts[route] = self._counts.get(route, 0) + 1
+      if error:
+        self._errors[route] = self._errors.get(route, 0) + 1
+      self._total_seconds[route] = self._total_seconds.get(route, 0.0) + seconds
+      self._samples.setdefault(route, deque(maxlen=self._window)).append(seconds)
+
+  @staticmethod
+  def _percentile(samples: Sequence[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      total = sum(self._counts.values())
+      report: Dict[str, Any] = {}
+      for route, count in self._counts.items():
+        samples = list(self._samples.get(route, ()))
+        report[route] = {
+          "count": count,
+          "share": round(count / total, 4) if total else 0.0,
+          "errors": self._errors.get(route, 0),
+          "avg_ms": round(self._total_seconds[route] * 1000 / count, 1),
+          "p50_ms": round(self._percentile(samples, 0.5) * 1000, 1) if samples else 0.0,
+          "p95_ms": round(self._percentile(samples, 0.95) * 1000, 1) if samples else 0.0,
+        }
+      return report
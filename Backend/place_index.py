@@ -0,0 +1,144 @@
+"""
+Index des lieux nommés (lieux importants, écoles, RPE, gazetteer) construit au chargement
+des données.
+
+- Dictionnaires nom normalisé → fiches (et secteur → RPE) pour les recherches directes.
+- Un automate d'Aho–Corasick sur tous les noms : la détection dans une question coûte
+  O(longueur de la question), quel que soit le nombre de lieux indexés.
+
+Les noms sont comparés sur le texte normalisé (normalize_text) et sur des mots entiers :
+chaque motif est entouré d'espaces et le texte aussi, l'automate ne peut donc pas
+reconnaître « salle » dans « salles ».
+
+Le gazetteer (ML/data/gazetteer.json, tools/build_gazetteer.py) fournit ses propres clés
+normalisées par entrée ; seules les entrées avec une adresse sont indexées.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+try:
+  from .keyword_matcher import KeywordAutomaton
+  from .text_normalize import normalize_text
+except ImportError:
+  from keyword_matcher import KeywordAutomaton
+  from text_normalize import normalize_text
+
+# Classes de noms indexés
+PLACE_LIEU = "lieu"
+PLACE_ECOLE = "ecole"
+PLACE_RPE = "rpe"
+PLACE_SECTEUR = "secteur"
+PLACE_GAZETTEER = "gazetteer"
+
+# Mots retirés des noms d'écoles pour obtenir la partie distinctive ("jules verne")
+SCHOOL_GENERIC_WORDS = {
+  "ecole", "primaire", "elementaire", "maternelle", "publique", "privee", "prive",
+  "college", "lycee", "general", "technologique", "professionnel", "et", "d", "l",
+  "application", "groupe", "sans", "nom",
+}
+# Partie distinctive minimale d'un nom d'école (évite "a", "b", "la vallee"…)
+MIN_SCHOOL_KEY_CHARS = 6
+
+
+def _padded(text: str) -> str:
+  return f" {text} "
+
+
+def school_key(name: Optional[str]) -> str:
+  """Partie distinctive normalisée d'un nom d'école ("École primaire Réaumur" → "reaumur")."""
+  return " ".join(word for word in normalize_text(name).split() if word not in SCHOOL_GENERIC_WORDS)
+
+
+class PlaceIndex:
+  """Fiches indexées par nom normalisé + automate de détection des noms."""
+
+  def __init__(
+    self,
+    rpe_data: Optional[Dict[str, Any]] = None,
+    lieux_data: Optional[Dict[str, Any]] = None,
+    ecoles_data: Optional[Dict[str, Any]] = None,
+    gazetteer: Optional[Dict[str, Any]] = None,
+  ):
+    self._records: Dict[str, Dict[str, List[Dict[str, Any]]]] = {
+      PLACE_LIEU: {},
+      PLACE_ECOLE: {},
+      PLACE_RPE: {},
+      PLACE_SECTEUR: {},
+      PLACE_GAZETTEER: {},
+    }
+    for lieu in (lieux_data or {}).get("lieux", []):
+      self._add(PLACE_LIEU, normalize_text(lieu.get("nom")), lieu)
+    for school in (ecoles_data or {}).get("ecoles", []):
+      key = school_key(school.get("nom"))
+      if len(key) >= MIN_SCHOOL_KEY_CHARS:
+        self._add(PLACE_ECOLE, key, school)
+    for rpe in (rpe_data or {}).get("rpe_list", []):
+      name = normalize_text(rpe.get("nom"))
+      self._add(PLACE_RPE, name[4:] if name.startswith("rpe ") else name, rpe)
+      for sector in rpe.get("secteurs", []):
+        self._add(PLACE_SECTEUR, normalize_text(sector), rpe)
+    for entry in (gazetteer or {}).get("lieux", []):
+      if entry.get("adresse"):
+        for key in entry.get("cles", []):
+          self._add(PLACE_GAZETTEER, key, entry)
+
+    self._automaton = KeywordAutomaton()
+    for kind, records in self._records.items():
+      for key in records:
+        self._automaton.add(_padded(key), (kind, key))
+    self._automaton.build()
+
+  def _add(self, kind: str, key: str, record: Dict[str, Any]) -> None:
+    if key:
+      self._records[kind].setdefault(key, []).append(record)
+
+  def __len__(self) -> int:
+    return sum(len(records) for records in self._records.values())
+
+  def lookup(self, kind: str, key: str) -> List[Dict[str, Any]]:
+    """Fiches d'une classe pour une clé déjà normalisée."""
+    return self._records.get(kind, {}).get(key, [])
+
+  def unique_address(self, kind: str, key: str) -> Optional[str]:
+    """Adresse commune à toutes les fiches de la clé ; None si absente ou ambiguë (homonymes)."""
+    addresses = {record.get("adresse") for record in self.lookup(kind, key)}
+    if len(addresses) != 1:
+      return None
+    return addresses.pop()
+
+  def find_keys(self, normalized_text: str) -> Dict[str, List[str]]:
+    """
+    Noms présents (mots entiers) dans un texte déjà normalisé, par classe, dans l'ordre
+    de leur première occurrence.
+    """
+    found: Dict[str, List[str]] = {}
+    if not normalized_text:
+      return found
+    seen: Set[tuple] = set()
+    for _, payload in self._automaton.iter_matches(_padded(normalized_text)):
+      if payload not in seen:
+        seen.add(payload)
+        kind, key = payload
+        found.setdefault(kind, []).append(key)
+    return found
+
+
+def texts_mentioning(names: Sequence[str], texts: Sequence[Optional[str]]) -> Dict[str, List[int]]:
+  """
+  Pour chaque nom, indices (croissants) des textes qui le contiennent (sous-chaîne, casse
+  ignorée). Un seul automate pour tous les noms : chaque texte est parcouru une fois au
+  lieu d'une fois par nom.
+  """
+  automaton = KeywordAutomaton()
+  for name in names:
+    automaton.add(name.lower(), ("name", name))
+  automaton.build()
+  found: Dict[str, List[int]] = {}
+  for index, text in enumerate(texts):
+    for _, (_, name) in automaton.iter_matches((text or "").lower()):
+      indices = found.setdefault(name, [])
+      if not indices or indices[-1] != index:
+        indices.append(index)
+  return found
@@ -0,0 +1,119 @@
+"""
+Budget de jetons pour l'assemblage du prompt (build_prompt).
+
+Le prompt utilisateur est découpé en sections : en-tête (question, intention) et
+consigne, toujours conservés ; données structurées, historique et segments RAG, qui se
+partagent le reste du budget. Une section qui demande moins que sa part cède le surplus
+aux autres ; au-delà, l'historique perd ses tours les plus anciens et les segments sont
+raccourcis puis écartés, du plus faible score au plus fort.
+
+Les jetons sont estimés (caractères / CHARS_PER_TOKEN) : pas de tokenizer côté serveur,
+l'estimation sert à borner la taille, pas à facturer.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Texte français : ~3,5 caractères par jeton (estimation volontairement prudente)
+CHARS_PER_TOKEN = 3.5
+
+DEFAULT_SHARES = {
+  "structured": 0.2,
+  "history": 0.25,
+  "segments": 0.55,
+}
+
+
+def estimate_tokens(text: str) -> int:
+  if not text:
+    return 0
+  return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+  """Coupe le texte (sur un espace si possible) pour tenir dans max_tokens."""
+  if estimate_tokens(text) <= max_tokens:
+    return text
+  max_chars = max(int(max_tokens * CHARS_PER_TOKEN) - 1, 0)
+  cut = text[:max_chars]
+  space = cut.rfind(" ")
+  if space > max_chars // 2:
+    cut = cut[:space]
+  return cut.rstrip() + "…" if cut else ""
+
+
+def allocate_budget(
+  available: int,
+  needs: Dict[str, int],
+  shares: Optional[Dict[str, float]] = None,
+) -> Dict[str, int]:
+  """
+  Répartition "water-filling" : chaque section reçoit au plus ce qu'elle demande ;
+  le surplus des sections servies est redistribué aux autres selon leurs parts.
+  """
+  shares = shares or DEFAULT_SHARES
+  caps: Dict[str, int] = {}
+  remaining = max(available, 0)
+  pending = dict(needs)
+  while pending:
+    total_share = sum(shares.get(name, 0.0) for name in pending) or float(len(pending))
+    quota = {
+      name: remaining * (shares.get(name, 0.0) or 1.0) / total_share
+      for name in pending
+    }
+    satisfied = [name for name, need in pending.items() if need <= quota[name]]
+    if not satisfied:
+      for name in pending:
+        caps[name] = int(quota[name])
+      break
+    for name in satisfied:
+      caps[name] = pending.pop(name)
+      remaining -= caps[name]
+  return caps
+
+
+def fit_history(turns: Sequence[str], cap: int, keep_last: bool = True) -> Tuple[List[str], int]:
+  """
+  Tours d'historique déjà rendus, du plus ancien au plus récent. Garde les plus récents
+  qui tiennent dans cap (le dernier, p. ex. le mémo RAG, est raccourci plutôt qu'écarté
+  si keep_last). Retourne (tours conservés dans l'ordre, nombre de tours écartés).
+  """
+  kept: List[str] = []
+  used = 0
+  for position, turn in enumerate(reversed(turns)):
+    cost = estimate_tokens(turn)
+    if used + cost > cap:
+      if position == 0 and keep_last and cap - used > 0:
+        turn = truncate_to_tokens(turn, cap - used)
+        cost = estimate_tokens(turn)
+      else:
+        break
+    kept.append(turn)
+    used += cost
+  kept.reverse()
+  return kept, len(turns) - len(kept)
+
+
+def fit_ranked(
+  variants: Sequence[Sequence[str]],
+  scores: Sequence[float],
+  cap: int,
+) -> List[Optional[int]]:
+  """
+  variants[i] : rendus possibles de l'élément i, du plus complet au plus court.
+  Par score décroissant, chaque élément prend la variante la plus complète qui tient
+  dans le budget restant, ou None (écarté). Retourne l'indice de variante par élément.
+  """
+  chosen: List[Optional[int]] = [None] * len(variants)
+  remaining = cap
+  order = sorted(range(len(variants)), key=lambda i: scores[i], reverse=True)
+  for i in order:
+    for level, rendered in enumerate(variants[i]):
+      cost = estimate_tokens(rendered)
+      if cost <= remaining:
+        chosen[i] = level
+        remaining -= cost
+        break
+  return chosen
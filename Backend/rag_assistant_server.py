@@ -1,22 +1,23 @@
+import asyncio
 import json
 import os
 import re
-import unicodedata
-import string
-import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.gzip import GZipMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, PrivateAttr
 from starlette.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import uvicorn
 
 try:
-  from anthropic import Anthropic
+  from anthropic import AsyncAnthropic
 except ImportError as exc:
   raise SystemExit("Install anthropic package: pip install anthropic fastapi uvicorn") from exc
 
@@ -33,12 +34,63 @@ except ImportError:
 # Modèle Claude : support Haiku (plus rapide) ou Sonnet (meilleure qualité)
 CLAUDE_MODEL = os.environ.get("CLAUDE_MODEL", "claude-3-7-sonnet-20250219")
 # Options: "claude-3-7-sonnet-20250219" (qualité) ou "claude-3-5-haiku-20241022" (rapidité)
+# Routage par requête : recherches simples → CLAUDE_FAST_MODEL, synthèses → CLAUDE_MODEL.
+# Désactivé par défaut tant que l'évaluation A/B (tests/eval_rag.py, avec et sans routage)
+# n'a pas été faite ; MODEL_ROUTING=1 pour l'activer (répartition visible dans /stats).
+MODEL_ROUTING_ENABLED = os.environ.get("MODEL_ROUTING", "0") != "0"
+CLAUDE_FAST_MODEL = os.environ.get("CLAUDE_FAST_MODEL", "claude-3-5-haiku-20241022")
+# Score du meilleur segment à partir duquel une recherche simple sans données structurées passe en route rapide
+ROUTER_FAST_MIN_SCORE = float(os.environ.get("ROUTER_FAST_MIN_SCORE", 10.0))
+
+# Prompt caching Anthropic : consignes + données de référence (RPE, tarifs) envoyées en
+# blocs système marqués cache_control ; seule la partie propre à la question varie
+PROMPT_CACHE_ENABLED = os.environ.get("PROMPT_CACHE", "1") != "0"
+
+# Gazetteer des lieux géocodés hors ligne (tools/build_gazetteer.py), chargé en lecture seule
+GAZETTEER_PATH = Path(os.environ.get("GAZETTEER_PATH", Path(__file__).resolve().parent.parent / "ML" / "data" / "gazetteer.json"))
+
+# Réponses déterministes (contacts RPE, adresses de lieux / d'écoles) servies sans appel Claude
+STRUCTURED_ANSWERS_ENABLED = os.environ.get("STRUCTURED_ANSWERS", "1") != "0"
+
+# Plafond (estimé) du message utilisateur envoyé à Claude ; 0 = pas de limite
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 4000))
+# Titres de sections ajoutés autour des blocs budgétés
+PROMPT_SECTION_OVERHEAD_TOKENS = 30
+# Termes de prix : sans eux, "cantine" / "mercredi" injectent les tarifs sans que la
+# question porte dessus ("Comment inscrire mon enfant à la cantine ?")
+TARIF_PRICE_TERMS = ("tarif", "prix", "coût", "cout", "€", "combien", "payer")
+# Représentation des segments dans le prompt :
+# - "legacy"  : mémo RAG (160 car.) + liste (200 car.) + détails (extrait 400 + contenu 800),
+# - "compact" : un seul bloc par segment (contenu 800 car.), sans mémo ni liste.
+# Surchargeable par requête (AssistantRequest.segment_format) pour les comparaisons A/B.
+SEGMENT_FORMATS = ("legacy", "compact")
+SEGMENT_FORMAT = os.environ.get("SEGMENT_FORMAT", "legacy")
 
 # Version du cache : incrémenter pour invalider toutes les réponses en cache
 # v2: suppression numéros de segments
 # v3: amélioration labels alignment (plus de "Correspondance partielle")
 CACHE_VERSION = "v3"
 
+# Plafonds du cache de réponses (LRU) : nombre d'entrées et taille estimée en octets
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 1000))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
+# Backend du cache de réponses : "memory" (par worker), "sqlite" (fichier WAL partagé
+# par les workers de la machine) ou "redis" (serveur compatible Redis partagé)
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory").lower()
+CACHE_SQLITE_PATH = os.environ.get(
+  "CACHE_SQLITE_PATH",
+  str(Path(__file__).resolve().parent / ".cache" / "answers.sqlite3"),
+)
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# Cache sémantique : réutilise la réponse d'une question reformulée (cosinus >= seuil)
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE", "1") != "0"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.92))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 2000))
+# Mémos des calculs sur le texte de la requête (embedding, requête BM25 analysée) ; 0 = désactivés
+QUERY_MEMO_MAX_ENTRIES = int(os.environ.get("QUERY_MEMO_MAX_ENTRIES", 1024))
+
 ASSISTANT_SYSTEM_PROMPT = """
 Tu es l'assistant officiel "Amiens".
 Analyse chaque question en tenant compte :
@@ -112,9 +164,29 @@ anthropic_key = os.environ.get("ANTHROPIC_API_KEY")
 if not anthropic_key:
   raise SystemExit("ANTHROPIC_API_KEY non défini. Ajoute la clé dans .env")
 
-client = Anthropic(api_key=anthropic_key)
+# Client asynchrone : l'endpoint attend la réponse Claude sans bloquer un thread
+async_client = AsyncAnthropic(api_key=anthropic_key)
+
+# Pool borné pour la partie CPU (lexique, BM25, embeddings, construction du prompt)
+RETRIEVAL_WORKERS = int(os.environ.get("RETRIEVAL_WORKERS", 4))
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="rag-retrieval")
+# L'endpoint étant asynchrone, un worker peut garder de nombreux appels Claude en vol
+LIMIT_CONCURRENCY = int(os.environ.get("LIMIT_CONCURRENCY", 200))
 
 EMBED_MODEL_NAME = os.environ.get("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Index vectoriel : "exact" (force brute) ou "ivf" (approximatif, construit par ML/embed_corpus.py --ivf-lists)
+VECTOR_INDEX_KIND = os.environ.get("VECTOR_INDEX", "exact")
+VECTOR_NPROBE = int(os.environ.get("VECTOR_NPROBE", 8))
+# Fusion BM25 + vecteurs + lexique (score_fusion.py) : "legacy" (somme brute, échelle des
+# seuils actuels), "rrf", "minmax" ou "zscore"
+SEARCH_FUSION = os.environ.get("SEARCH_FUSION", "legacy").lower()
+# Moteur BM25 : "numpy" (bm25_index.py, en mémoire) ou "whoosh" ; paramètres communs aux deux
+BM25_ENGINE = os.environ.get("BM25_ENGINE", "numpy").lower()
+BM25_K1 = 1.6
+BM25_B = 0.75
+# Endpoint /search (recherche seule, sans Claude) : nombre de résultats maximal et taille des extraits
+SEARCH_MAX_TOP_K = int(os.environ.get("SEARCH_MAX_TOP_K", 20))
+SEARCH_EXCERPT_CHARS = 240
 
 # Détection automatique corpus généralisé si existe
 ML_DATA_DIR = Path(__file__).resolve().parent.parent / "ML" / "data"
@@ -143,15 +215,42 @@ LEXICON_PATH = Path(
   )
 )
 corpus_embeddings = None
+embedding_store = None
+vector_index = None
 corpus_metadata = None
+# Colonnes précalculées (ML/embed_corpus.py) : texte normalisé et mots de chaque segment
+corpus_normalized: Optional[List[str]] = None
+corpus_tokens: Optional[List[List[str]]] = None
+normalized_by_content: Dict[str, str] = {}
+# Identifiant stable de chaque segment (corpus_artifacts.segment_id), même ordre que corpus_metadata
+corpus_segment_ids: Optional[List[str]] = None
+# Segments par identifiant + texte normalisé et indicateur tarifaire précalculés (load_normalized_corpus)
+segment_store: Optional["SegmentStore"] = None
+# Matrice documents × termes administratifs du lexique (rebuild_lexicon_boost)
+lexicon_boost: Optional["LexiconBoostMatrix"] = None
 embed_model = None
 lexicon_entries: List[Dict[str, Any]] = []
+# Automate unique (lexique, intentions, monnaie, indices) construit par load_lexicon()
+keyword_matcher = None
 whoosh_index = None
 whoosh_dir: Optional[Path] = None
+# Moteur BM25 NumPy (BM25_ENGINE=numpy) ; Whoosh n'est ouvert que s'il est absent
+bm25_index: Optional["BM25Index"] = None
 rpe_data: Optional[Dict[str, Any]] = None
 lieux_data: Optional[Dict[str, Any]] = None
 tarifs_data: Optional[Dict[str, Any]] = None
 ecoles_data: Optional[Dict[str, Any]] = None
+gazetteer_data: Optional[Dict[str, Any]] = None
+# Index des lieux / écoles / RPE et moteur de réponses déterministes, construits par load_structured_data
+place_index: Optional["PlaceIndex"] = None
+structured_engine: Optional["StructuredAnswerEngine"] = None
+# Bloc système statique (liste des RPE + tableaux tarifaires), mis en cache côté Anthropic
+static_reference_block = ""
+# Tableaux tarifaires envoyés : (type, nombre max de tableaux)
+TARIF_TABLE_LIMITS = (("cantine", 2), ("periscolaire", 2), ("mercredi", 1))
+# Cumul des jetons d'entrée facturés / lus depuis le cache de prompt
+MODEL_USAGE_FIELDS = ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "output_tokens")
+model_usage_totals: Dict[str, int] = {"calls": 0, **{field: 0 for field in MODEL_USAGE_FIELDS}}
 try:
   from sentence_transformers import SentenceTransformer
 except ImportError:
@@ -160,32 +259,153 @@ except ImportError:
 
 try:
   from whoosh import scoring
-  from whoosh.analysis import StemmingAnalyzer
-  from whoosh.fields import ID, TEXT, Schema
-  from whoosh.index import create_in, open_dir
   from whoosh.qparser import MultifieldParser, OrGroup
-  from whoosh.lang.snowball.french import FrenchStemmer
 except ImportError:
   scoring = None
-  StemmingAnalyzer = None
-  Schema = None
-  create_in = None
-  open_dir = None
   MultifieldParser = None
-  FrenchStemmer = None
+
+# Import artefacts du corpus (même répertoire)
+try:
+  from .corpus_artifacts import (
+    WHOOSH_AVAILABLE,
+    compute_corpus_hash,
+    describe_store,
+    load_embedding_store,
+    build_normalized_columns,
+    load_normalized_columns,
+    normalized_columns_path,
+    open_or_build_whoosh_index,
+    save_normalized_columns,
+    segment_id,
+    whoosh_index_dir,
+  )
+except ImportError:
+  from corpus_artifacts import (
+    WHOOSH_AVAILABLE,
+    compute_corpus_hash,
+    describe_store,
+    load_embedding_store,
+    build_normalized_columns,
+    load_normalized_columns,
+    normalized_columns_path,
+    open_or_build_whoosh_index,
+    save_normalized_columns,
+    segment_id,
+    whoosh_index_dir,
+  )
+
+# Normalisation partagée avec le pipeline hors ligne (même répertoire)
+try:
+  from .text_normalize import fold_case_space, normalize_text as _normalize
+except ImportError:
+  from text_normalize import fold_case_space, normalize_text as _normalize
+
+# Routage du modèle (même répertoire)
+try:
+  from .model_router import ROUTE_FAST, ROUTE_LARGE, RouteStats, choose_route
+except ImportError:
+  from model_router import ROUTE_FAST, ROUTE_LARGE, RouteStats, choose_route
+
+# Latence et nombre d'appels Claude par route, exportés sur /stats
+route_stats = RouteStats()
+
+# Budget de jetons du prompt (même répertoire)
+try:
+  from .prompt_budget import allocate_budget, estimate_tokens, fit_history, fit_ranked, truncate_to_tokens
+except ImportError:
+  from prompt_budget import allocate_budget, estimate_tokens, fit_history, fit_ranked, truncate_to_tokens
+
+# Import index vectoriels (même répertoire)
+try:
+  from .vector_index import load_vector_index
+except ImportError:
+  from vector_index import load_vector_index
+
+# Moteur BM25F NumPy (même répertoire)
+try:
+  from .bm25_index import BM25Index, bm25_index_path, open_or_build_bm25_index
+except ImportError:
+  from bm25_index import BM25Index, bm25_index_path, open_or_build_bm25_index
+
+# Fusion vectorisée des scores de recherche (même répertoire)
+try:
+  from .score_fusion import FUSION_LEGACY, FUSION_MODES, FUSION_WEIGHTS, LexiconBoostMatrix, RetrieverRun, fuse_scores
+except ImportError:
+  from score_fusion import FUSION_LEGACY, FUSION_MODES, FUSION_WEIGHTS, LexiconBoostMatrix, RetrieverRun, fuse_scores
+
+# Magasin des segments du corpus par identifiant (même répertoire)
+try:
+  from .segment_store import SegmentStore
+except ImportError:
+  from segment_store import SegmentStore
+
+# Extraction de answer_html pendant le streaming (même répertoire)
+try:
+  from .stream_extract import AnswerHtmlStreamExtractor
+except ImportError:
+  from stream_extract import AnswerHtmlStreamExtractor
+
+# Coalescence des questions identiques en vol (même répertoire)
+try:
+  from .single_flight import SingleFlight
+except ImportError:
+  from single_flight import SingleFlight
+
+# Requêtes identiques simultanées : une seule génération, réponse partagée
+answer_flights = SingleFlight()
+
+# Index des lieux nommés et réponses déterministes (même répertoire)
+try:
+  from .place_index import PLACE_ECOLE, PLACE_GAZETTEER, PLACE_LIEU, PlaceIndex, texts_mentioning
+  from .structured_answers import StructuredAnswerEngine
+except ImportError:
+  from place_index import PLACE_ECOLE, PLACE_GAZETTEER, PLACE_LIEU, PlaceIndex, texts_mentioning
+  from structured_answers import StructuredAnswerEngine
+
+# Noms de lieux potentiels absents des données (majuscules, noms propres)
+LIEU_PATTERNS = [
+  re.compile(r"\b(?:espace|centre|salle|théâtre|médiathèque|bibliothèque|gymnase|stade|piscine|école|mairie|hôtel de ville)\s+[A-Z][a-zéèêàâôùûç]+(?:\s+[A-Z][a-zéèêàâôùûç]+)*", re.IGNORECASE),
+  re.compile(r"\b[A-Z][a-zéèêàâôùûç]+\s+(?:de|du|des|d')\s+[A-Z][a-zéèêàâôùûç]+", re.IGNORECASE),
+]
+# Termes (normalisés) qui autorisent l'injection de l'adresse d'une école reconnue par son nom
+SCHOOL_QUESTION_TERMS = ("ecole", "college", "lycee", "maternelle")
+
+# Automate de mots-clés (même répertoire)
+try:
+  from .keyword_matcher import CURRENCY, INTENTION, LEXICON_ADMIN, LEXICON_USAGER, build_keyword_matcher
+except ImportError:
+  from keyword_matcher import CURRENCY, INTENTION, LEXICON_ADMIN, LEXICON_USAGER, build_keyword_matcher
 
 # Import cache (même répertoire)
 try:
-  from .cache import get_cache, cache_stats
+  from .cache import QueryMemo, get_cache, cache_stats, get_semantic_cache, semantic_cache_stats
 except ImportError:
   try:
-    from cache import get_cache, cache_stats
+    from cache import QueryMemo, get_cache, cache_stats, get_semantic_cache, semantic_cache_stats
   except ImportError:
     # Fallback si cache.py n'est pas disponible
     def get_cache(*args, **kwargs):
       return None
     def cache_stats():
       return {"total_entries": 0, "active_entries": 0}
+    def get_semantic_cache(*args, **kwargs):
+      return None
+    def semantic_cache_stats():
+      return {"total_entries": 0, "hits": 0, "misses": 0, "near_misses": 0, "number_mismatches": 0}
+    class QueryMemo:
+      def __init__(self, max_entries: int = 0):
+        self.max_entries = 0
+      def get_or_compute(self, key, compute):
+        return compute()
+      def clear(self):
+        pass
+      def stats(self):
+        return {"entries": 0, "hits": 0, "misses": 0, "hit_rate": 0.0}
+
+# Embeddings des questions, par texte à la casse et aux espaces près (relances, clics de suivi, évaluations)
+query_embedding_memo = QueryMemo(QUERY_MEMO_MAX_ENTRIES)
+# Requêtes BM25 analysées (termes du moteur NumPy ou requête Whoosh), par texte exact
+bm25_query_memo = QueryMemo(QUERY_MEMO_MAX_ENTRIES)
 
 
 class RagSegment(BaseModel):
@@ -195,6 +415,11 @@ class RagSegment(BaseModel):
   excerpt: Optional[str] = None
   content: Optional[str] = None
   custom_id: Optional[str] = None
+  # Identifiant stable d'un segment du corpus (/search) : envoyé seul (avec score), le
+  # contenu est repris du magasin de segments du serveur
+  id: Optional[str] = None
+  # Position dans le magasin si le segment y a été reconstruit par le serveur (colonnes précalculées)
+  _store_position: Optional[int] = PrivateAttr(default=None)
 
 
 class ConversationTurn(BaseModel):
@@ -210,6 +435,7 @@ class AssistantRequest(BaseModel):
   instructions: Optional[str] = None
   intent_label: Optional[str] = None
   intent_weight: Optional[float] = None
+  segment_format: Optional[str] = None
 
 
 class AlignmentPayload(BaseModel):
@@ -218,12 +444,41 @@ class AlignmentPayload(BaseModel):
   summary: str
 
 
+class ModelUsage(BaseModel):
+  input_tokens: int = 0
+  cache_creation_input_tokens: int = 0
+  cache_read_input_tokens: int = 0
+  output_tokens: int = 0
+
+
+class SearchRequest(BaseModel):
+  question: str
+  normalized_question: Optional[str] = None
+  top_k: int = 5
+  min_score: float = 0.25
+
+
+class SearchHit(BaseModel):
+  id: Optional[str] = None
+  label: Optional[str] = None
+  url: Optional[str] = None
+  score: float
+  excerpt: str = ""
+
+
+class SearchResponse(BaseModel):
+  results: List[SearchHit]
+  took_ms: float
+
+
 class AssistantResponse(BaseModel):
   answer_html: str
   answer_text: Optional[str] = None
   follow_up_question: Optional[str] = None
   alignment: AlignmentPayload
   sources: List[Dict[str, Any]] = []
+  # Jetons de l'appel Claude (absent pour une réponse servie depuis le cache)
+  usage: Optional[ModelUsage] = None
 
 
 CURRENCY_KEYWORDS = (
@@ -333,55 +588,9 @@ INTENTION_KEYWORDS = {
 }
 
 
-def _strip_accents(text: str) -> str:
-  normalized = unicodedata.normalize("NFKD", text)
-  return "".join(char for char in normalized if not unicodedata.combining(char))
-
-
-def _normalize(text: Optional[str]) -> str:
-  if not text:
-    return ""
-  stripped = _strip_accents(text.lower())
-  translation_table = str.maketrans(
-    {
-      "0": "o",
-      "1": "i",
-      "2": "z",
-      "3": "e",
-      "4": "a",
-      "5": "s",
-      "6": "g",
-      "7": "t",
-      "8": "b",
-      "9": "g",
-    }
-  )
-  replaced = stripped.translate(translation_table)
-  cleaned_chars = []
-  last_char = ""
-  repeat_count = 0
-  for char in replaced:
-    if char in string.ascii_lowercase or char.isdigit() or char.isspace():
-      if char == last_char:
-        repeat_count += 1
-        if repeat_count >= 3:
-          continue
-      else:
-        repeat_count = 1
-        last_char = char
-      cleaned_chars.append(char)
-    else:
-      cleaned_chars.append(" ")
-      last_char = ""
-      repeat_count = 0
-  cleaned = "".join(cleaned_chars)
-  cleaned = " ".join(cleaned.split())
-  return cleaned
-
-
 def load_structured_data():
-  """Charge les données structurées (RPE, lieux, tarifs, écoles)."""
-  global rpe_data, lieux_data, tarifs_data, ecoles_data
+  """Charge les données structurées (RPE, lieux, tarifs, écoles, gazetteer)."""
+  global rpe_data, lieux_data, tarifs_data, ecoles_data, gazetteer_data, place_index, structured_engine
   data_dir = Path(__file__).resolve().parent.parent / "ML" / "data"
   
   # Charger données RPE
@@ -438,12 +647,53 @@ def load_structured_data():
   else:
     ecoles_data = None
 
+  # Charger le gazetteer (adresses et coordonnées résolues hors ligne)
+  if GAZETTEER_PATH.exists():
+    try:
+      with open(GAZETTEER_PATH, "r", encoding="utf-8") as f:
+        gazetteer_data = json.load(f)
+      print(f"✅ Gazetteer chargé ({gazetteer_data.get('total', 0)} lieux)")
+    except Exception as e:
+      print(f"⚠️ Impossible de charger le gazetteer: {e}")
+      gazetteer_data = None
+  else:
+    gazetteer_data = None
+
+  build_static_reference_block()
+  place_index = PlaceIndex(rpe_data, lieux_data, ecoles_data, gazetteer_data)
+  print(f"✅ Index des lieux construit ({len(place_index)} fiches)")
+  if STRUCTURED_ANSWERS_ENABLED:
+    structured_engine = StructuredAnswerEngine(place_index)
+
+
+def build_static_reference_block() -> None:
+  """Données identiques d'une requête à l'autre, envoyées une fois pour toutes en bloc système."""
+  global static_reference_block
+  parts: List[str] = []
+  if rpe_data and rpe_data.get("rpe_list"):
+    parts.append("=== DONNÉES DE RÉFÉRENCE : LISTE DES RPE ===\n")
+    for rpe in rpe_data.get("rpe_list", []):
+      parts.append(f"- {rpe['nom']} : Secteurs {', '.join(rpe['secteurs'][:3])}... | Adresse: {rpe['adresse']} | Tél: {rpe['telephone']} | Email: {rpe['email']}\n")
+    parts.append("\n")
+  tarifs_by_type = (tarifs_data or {}).get("tarifs_by_type", {})
+  for kind, limit in TARIF_TABLE_LIMITS:
+    tables = tarifs_by_type.get(kind) or []
+    if not tables:
+      continue
+    parts.append(f"=== DONNÉES DE RÉFÉRENCE : TABLEAUX TARIFAIRES ({kind}) ===\n")
+    for table_html in tables[:limit]:
+      parts.append(table_html + "\n")
+    parts.append("\n")
+  static_reference_block = "".join(parts)
+
 
 def load_lexicon():
   global lexicon_entries
   if not LEXICON_PATH.exists():
     print(f"ℹ️ Lexique non trouvé ({LEXICON_PATH}); aucun boost lexical appliqué.")
     lexicon_entries = []
+    rebuild_keyword_matcher()
+    rebuild_lexicon_boost()
     return
   try:
     with LEXICON_PATH.open(encoding="utf-8") as f:
@@ -464,6 +714,7 @@ def load_lexicon():
           "poids": float(entry.get("poids", 0.0)),
           "_normalized_usager": normalized_usager,
           "_normalized_admin": [term for term in normalized_admin if term],
+          "_index": len(prepared),
         }
       )
     lexicon_entries = prepared
@@ -471,6 +722,9 @@ def load_lexicon():
   except Exception as exc:
     print(f"⚠️ Impossible de charger le lexique: {exc}")
     lexicon_entries = []
+  finally:
+    rebuild_keyword_matcher()
+    rebuild_lexicon_boost()
 
 
 RAW_QUERY_HINTS = {
@@ -521,6 +775,29 @@ RAW_QUERY_HINTS = {
 QUERY_HINTS = { _normalize(key): value for key, value in RAW_QUERY_HINTS.items() }
 
 
+def rebuild_keyword_matcher() -> None:
+  global keyword_matcher
+  keyword_matcher = build_keyword_matcher(lexicon_entries, INTENTION_KEYWORDS, CURRENCY_KEYWORDS, QUERY_HINTS)
+
+
+def rebuild_lexicon_boost() -> None:
+  """Précalcule, pour chaque terme administratif du lexique, les segments qui le contiennent."""
+  global lexicon_boost
+  if not corpus_normalized or not lexicon_entries:
+    lexicon_boost = None
+    return
+  terms = [term for entry in lexicon_entries for term in entry.get("_normalized_admin", [])]
+  lexicon_boost = LexiconBoostMatrix(corpus_normalized, terms)
+  print(f"✅ Matrice de bonus lexical prête ({lexicon_boost.stats()})")
+
+
+def scan_keywords(text: str) -> Dict[str, set]:
+  """Toutes les classes de mots-clés présentes dans un texte normalisé, en un passage."""
+  if keyword_matcher is None:
+    rebuild_keyword_matcher()
+  return keyword_matcher.scan(text)
+
+
 def match_lexicon_entries(
   question: Optional[str],
   normalized_question: Optional[str] = None
@@ -530,12 +807,8 @@ def match_lexicon_entries(
   text = _normalize(normalized_question) or _normalize(question)
   if not text:
     return []
-  matches: List[Dict[str, Any]] = []
-  for entry in lexicon_entries:
-    key = entry.get("_normalized_usager")
-    if key and key in text:
-      matches.append(entry)
-  return matches
+  matched = scan_keywords(text).get(LEXICON_USAGER, set())
+  return [lexicon_entries[index] for index in sorted(matched)]
 
 
 def expand_query_with_lexicon(question: str, matches: List[Dict[str, Any]]) -> str:
@@ -559,10 +832,12 @@ def expand_query_with_lexicon(question: str, matches: List[Dict[str, Any]]) -> s
 
 def question_mentions_currency(question: Optional[str], normalized_question: Optional[str] = None) -> bool:
   text = _normalize(normalized_question) or _normalize(question)
-  return any(keyword in text for keyword in CURRENCY_KEYWORDS)
+  return bool(scan_keywords(text).get(CURRENCY))
 
 
 def segment_contains_currency_data(segment: RagSegment) -> bool:
+  if segment._store_position is not None and segment_store is not None:
+    return segment_store.has_currency(segment._store_position)
   text_parts = [
     segment.content or "",
     segment.excerpt or "",
@@ -591,6 +866,29 @@ def apply_currency_bonus(question: Optional[str], normalized_question: Optional[
       segment.score = base_score + CURRENCY_BONUS
 
 
+def segment_normalized_text(segment: RagSegment) -> str:
+  """
+  Texte normalisé d'un segment (contenu, extrait, label, source). Pour un segment du
+  corpus, le contenu vient des colonnes précalculées et l'extrait, simple préfixe du
+  contenu, n'est pas renormalisé ; pour un segment reconstruit depuis le magasin, le
+  texte complet est lui-même précalculé.
+  """
+  if segment._store_position is not None and segment_store is not None:
+    return segment_store.normalized(segment._store_position)
+  content = segment.content or ""
+  excerpt = segment.excerpt or ""
+  normalized_content = normalized_by_content.get(content) if content else None
+  if normalized_content is None:
+    content_parts = [content, excerpt]
+  else:
+    content_parts = [] if content.startswith(excerpt) else [excerpt]
+  content_parts.extend([getattr(segment, "label", "") or "", getattr(segment, "source", "") or ""])
+  normalized_rest = _normalize(" ".join(part for part in content_parts if part))
+  if normalized_content is None:
+    return normalized_rest
+  return " ".join(part for part in (normalized_content, normalized_rest) if part)
+
+
 def apply_lexicon_bonus(
   segments: List[RagSegment],
   matches: List[Dict[str, Any]],
@@ -598,22 +896,14 @@ def apply_lexicon_bonus(
   if not segments or not matches:
     return
   for segment in segments:
-    content_parts = [
-      segment.content or "",
-      segment.excerpt or "",
-      getattr(segment, "label", "") or "",
-      getattr(segment, "source", "") or "",
-    ]
-    normalized_content = _normalize(" ".join(part for part in content_parts if part))
+    normalized_content = segment_normalized_text(segment)
     if not normalized_content:
       continue
+    admin_hits = scan_keywords(normalized_content).get(LEXICON_ADMIN, set())
     bonus = 0.0
     for entry in matches:
       weight = float(entry.get("poids", 0.0))
-      if weight <= 0:
-        continue
-      normalized_admin_terms = entry.get("_normalized_admin", [])
-      if any(term and term in normalized_content for term in normalized_admin_terms):
+      if weight > 0 and entry.get("_index") in admin_hits:
         bonus += weight
     if bonus:
       segment.score = (segment.score or 0.0) + bonus
@@ -656,10 +946,10 @@ def detect_user_intention(question: Optional[str], normalized_question: Optional
   best_label = "inconnue"
   best_weight = 0.0
 
+  matched_labels = scan_keywords(text).get(INTENTION, set())
   for label, data in INTENTION_KEYWORDS.items():
-    keywords = data.get("keywords", ())
     weight = float(data.get("weight", 0.0))
-    if any(keyword in text for keyword in keywords):
+    if label in matched_labels:
       if weight > best_weight:
         best_label = label
         best_weight = weight
@@ -667,14 +957,21 @@ def detect_user_intention(question: Optional[str], normalized_question: Optional
   return best_label, best_weight
 
 
-def build_prompt(payload: AssistantRequest) -> str:
+def build_prompt(payload: AssistantRequest, signals: Optional[Dict[str, Any]] = None) -> str:
+  """
+  Prompt utilisateur envoyé à Claude. `signals`, si fourni, reçoit "structured_answer" :
+  True si la réponse tient dans des données structurées effectivement retenues (lignes
+  RPE ou tarifs demandées, adresse résolue), signal du routeur de modèle.
+  """
   lines = []
+  structured_answer = False
   lines.append(f"Question utilisateur: {payload.question}\n")
   if payload.normalized_question:
     lines.append(f"Question normalisée: {payload.normalized_question}\n")
   if payload.intent_label:
     weight_display = f"{payload.intent_weight:.2f}" if payload.intent_weight is not None else "n/a"
     lines.append(f"Intention détectée: {payload.intent_label} (poids {weight_display})\n")
+  header_end = len(lines)
 
   # Injecter données structurées selon le contexte
   question_lower = (payload.question or "").lower()
@@ -687,9 +984,15 @@ def build_prompt(payload: AssistantRequest) -> str:
     entry.get("terme_usager") in ["inscription", "inscrire", "crèche", "relais"] 
     for entry in lexicon_matches
   ) or any(term in question_text for term in ["rpe", "relais petite enfance"])
+  # Lexique "inscription" seul : liste RPE en appui, pas la réponse elle-même
+  if rpe_data and any(term in question_text for term in ["rpe", "relais petite enfance"]):
+    structured_answer = True
   
   # Données RPE si question concerne les RPE/crèche/inscription
-  if rpe_data and rpe_relevant:
+  if rpe_data and rpe_relevant and PROMPT_CACHE_ENABLED:
+    lines.append("\n=== DONNÉES STRUCTURÉES : LISTE DES RPE ===\n")
+    lines.append("Tu DOIS inclure la liste complète des RPE (données de référence du message système) dans ta réponse si la question concerne les RPE.\n\n")
+  elif rpe_data and rpe_relevant:
     lines.append("\n=== DONNÉES STRUCTURÉES : LISTE DES RPE ===\n")
     lines.append("Tu DOIS inclure cette liste complète dans ta réponse si la question concerne les RPE :\n")
     for rpe in rpe_data.get("rpe_list", []):
@@ -699,17 +1002,25 @@ def build_prompt(payload: AssistantRequest) -> str:
   # Données tarifs si question tarifaire
   if tarifs_data and any(term in question_text for term in ["tarif", "prix", "coût", "€", "cantine", "restauration", "périscolaire", "mercredi", "alsh"]):
     lines.append("\n=== DONNÉES STRUCTURÉES : TABLEAUX TARIFAIRES ===\n")
-    lines.append("Tu DOIS inclure les tableaux tarifaires pertinents dans ta réponse :\n")
     tarifs_by_type = tarifs_data.get("tarifs_by_type", {})
+    relevant_kinds = []
     if "cantine" in tarifs_by_type and any(t in question_text for t in ["cantine", "restauration", "repas"]):
-      for table_html in tarifs_by_type["cantine"][:2]:  # Max 2 tableaux
-        lines.append(table_html + "\n")
+      relevant_kinds.append("cantine")
     if "periscolaire" in tarifs_by_type and "périscolaire" in question_text:
-      for table_html in tarifs_by_type["periscolaire"][:2]:
-        lines.append(table_html + "\n")
+      relevant_kinds.append("periscolaire")
     if "mercredi" in tarifs_by_type and "mercredi" in question_text:
-      for table_html in tarifs_by_type["mercredi"][:1]:
-        lines.append(table_html + "\n")
+      relevant_kinds.append("mercredi")
+    if relevant_kinds and any(term in question_text for term in TARIF_PRICE_TERMS):
+      structured_answer = True
+    if PROMPT_CACHE_ENABLED:
+      lines.append("Tu DOIS inclure les tableaux tarifaires pertinents (données de référence du message système) dans ta réponse")
+      lines.append(f" : {', '.join(relevant_kinds)}.\n" if relevant_kinds else ".\n")
+    else:
+      lines.append("Tu DOIS inclure les tableaux tarifaires pertinents dans ta réponse :\n")
+      for kind, limit in TARIF_TABLE_LIMITS:
+        if kind in relevant_kinds:
+          for table_html in tarifs_by_type[kind][:limit]:
+            lines.append(table_html + "\n")
     lines.append("\n")
   
   # Données lieux : détection améliorée avec système adresses dynamique
@@ -730,31 +1041,52 @@ def build_prompt(payload: AssistantRequest) -> str:
       "source": "detection_creche"
     })
   
-  # 1. Chercher dans lieux_data
-  if lieux_data:
-    for lieu in lieux_data.get("lieux", []):
-      lieu_nom_lower = lieu["nom"].lower()
-      if lieu_nom_lower in question_text:
+  # 1. Chercher dans l'index des lieux (un seul parcours de la question, quel que soit le nombre de fiches)
+  question_normalized = _normalize(question_text)
+  place_keys = place_index.find_keys(question_normalized) if place_index is not None else {}
+  for key in place_keys.get(PLACE_LIEU, []):
+    for lieu in place_index.lookup(PLACE_LIEU, key):
+      lieux_mentionnes.append({
+        "nom": lieu["nom"],
+        "adresse": lieu.get("adresse"),
+        "description": lieu.get("description", ""),
+        "source": "lieux_data"
+      })
+  school_question = any(f" {term} " in f" {question_normalized} " for term in SCHOOL_QUESTION_TERMS)
+  if school_question:
+    for key in place_keys.get(PLACE_ECOLE, []):
+      # Homonymes à des adresses différentes : laissés à la détection par motif ci-dessous
+      adresse = place_index.unique_address(PLACE_ECOLE, key)
+      if adresse:
         lieux_mentionnes.append({
-          "nom": lieu["nom"],
-          "adresse": lieu.get("adresse"),
-          "description": lieu.get("description", ""),
-          "source": "lieux_data"
+          "nom": place_index.lookup(PLACE_ECOLE, key)[0]["nom"],
+          "adresse": adresse,
+          "description": "",
+          "source": "ecoles_data"
         })
+  # Gazetteer : autres lieux géocodés hors ligne (RPE, lieux du corpus)
+  for key in place_keys.get(PLACE_GAZETTEER, []):
+    entries = place_index.lookup(PLACE_GAZETTEER, key)
+    adresse = place_index.unique_address(PLACE_GAZETTEER, key)
+    if not adresse or (entries[0].get("type") == "ecole" and not school_question):
+      continue
+    if not any(l["nom"].lower() == entries[0]["nom"].lower() for l in lieux_mentionnes):
+      lieux_mentionnes.append({
+        "nom": entries[0]["nom"],
+        "adresse": adresse,
+        "description": "",
+        "source": "gazetteer"
+      })
+  known_keys = [key for kind in (PLACE_LIEU, PLACE_ECOLE, PLACE_GAZETTEER) for key in place_keys.get(kind, [])]
   
   # 2. Chercher des patterns de noms de lieux (majuscules, noms propres)
-  # Patterns pour détecter des noms de lieux potentiels
-  lieu_patterns = [
-    r"\b(?:espace|centre|salle|théâtre|médiathèque|bibliothèque|gymnase|stade|piscine|école|mairie|hôtel de ville)\s+[A-Z][a-zéèêàâôùûç]+(?:\s+[A-Z][a-zéèêàâôùûç]+)*",
-    r"\b[A-Z][a-zéèêàâôùûç]+\s+(?:de|du|des|d')\s+[A-Z][a-zéèêàâôùûç]+",
-  ]
-  
-  for pattern in lieu_patterns:
-    matches = re.findall(pattern, payload.question or "", re.IGNORECASE)
-    for match in matches:
-      match_lower = match.lower()
-      # Éviter les doublons et les mots trop courts
-      if len(match) > 5 and not any(l["nom"].lower() == match_lower for l in lieux_mentionnes):
+  for pattern in LIEU_PATTERNS:
+    for match in pattern.findall(payload.question or ""):
+      match_padded = f" {_normalize(match)} "
+      # Éviter les doublons (lieu déjà reconnu par l'index) et les mots trop courts
+      if len(match) > 5 and not any(f" {key} " in match_padded for key in known_keys) and not any(
+        l["nom"].lower() == match.lower() for l in lieux_mentionnes
+      ):
         lieux_mentionnes.append({
           "nom": match,
           "adresse": None,
@@ -767,31 +1099,43 @@ def build_prompt(payload: AssistantRequest) -> str:
     lines.append("\n=== DONNÉES STRUCTURÉES : LIEUX ET ADRESSES ===\n")
     carte_geo_url = "https://geo.amiens-metropole.com/adws/app/523da8c6-5dbc-11ec-9790-3dc5639e7001/index.html"
     adresses_trouvees = False
+
+    # Segments RAG qui citent chaque lieu sans adresse : un seul parcours de chaque segment
+    segment_texts = [seg.content or seg.excerpt or "" for seg in (payload.rag_results or [])]
+    segment_mentions = texts_mentioning(
+      [lieu_info["nom"] for lieu_info in lieux_mentionnes if not lieu_info.get("adresse")],
+      segment_texts,
+    )
+    extracted_by_segment: Dict[int, Optional[str]] = {}
     
     for lieu_info in lieux_mentionnes:
       lieu_nom = lieu_info["nom"]
       adresse = lieu_info.get("adresse")
       
-      # Si pas d'adresse dans lieux_data, chercher dans segments RAG puis OSM
+      # Lieu détecté par motif mais présent dans le gazetteer
+      if not adresse and place_index is not None:
+        adresse = place_index.unique_address(PLACE_GAZETTEER, _normalize(lieu_nom))
+
+      # Si pas d'adresse dans les données, chercher dans segments RAG puis OSM
       if not adresse:
-        # Vérifier d'abord dans les segments RAG
+        # Vérifier d'abord dans les segments RAG (premier segment citant le lieu avec une adresse)
         adresse_trouvee = False
-        if payload.rag_results:
-          for seg in payload.rag_results:
-            content = (seg.content or seg.excerpt or "").lower()
-            if lieu_nom.lower() in content:
-              extracted = extract_address_from_text(seg.content or seg.excerpt or "")
-              if extracted:
-                adresse = extracted
-                adresse_trouvee = True
-                break
+        for index in segment_mentions.get(lieu_nom, []):
+          if index not in extracted_by_segment:
+            extracted_by_segment[index] = extract_address_from_text(segment_texts[index])
+          if extracted_by_segment[index]:
+            adresse = extracted_by_segment[index]
+            adresse_trouvee = True
+            break
         
-        # Si toujours pas trouvé, utiliser address_fetcher (cherche dans RAG puis OSM)
+        # Si toujours pas trouvé, utiliser address_fetcher (cache ; OSM en arrière-plan, sans attendre :
+        # cette réponse renvoie vers la carte, les suivantes auront l'adresse)
         if not adresse_trouvee:
           fetched_address = get_address_for_lieu(
             lieu_nom,
-            segments_rag=payload.rag_results,
-            city="Amiens"
+            segments_rag=None,
+            city="Amiens",
+            wait=False
           )
           if fetched_address:
             adresse = fetched_address
@@ -807,6 +1151,8 @@ def build_prompt(payload: AssistantRequest) -> str:
         lines.append(f"- {lieu_nom}{desc} (adresse à rechercher)\n")
     
     # Si aucune adresse trouvée pour une question "où", rediriger vers la carte
+    if adresses_trouvees:
+      structured_answer = True
     if not adresses_trouvees and question_geographique:
       if is_creche_question:
         lines.append(f"\n⚠️ IMPORTANT : Aucune adresse trouvée pour les crèches. Tu DOIS rediriger l'utilisateur vers la carte géographique d'Amiens Métropole.\n")
@@ -825,59 +1171,189 @@ def build_prompt(payload: AssistantRequest) -> str:
     lines.append("Pour des informations détaillées par école, oriente vers la carte interactive ou les mairies de secteur.\n")
     lines.append("\n")
 
-  if payload.conversation:
-    lines.append("Historique:\n")
-    for turn in payload.conversation[-6:]:
-      role = "Utilisateur" if turn.role == "user" else "Assistant"
-      lines.append(f"- {role}: {turn.content}\n")
+  if signals is not None:
+    signals["structured_answer"] = structured_answer
 
-  lines.append("\nSegments RAG disponibles :\n")
-  if not payload.rag_results:
-    lines.append("Aucun extrait disponible.\n")
+  header = "".join(lines[:header_end])
+  structured = "".join(lines[header_end:])
+  history_turns = [
+    f"- {'Utilisateur' if turn.role == 'user' else 'Assistant'}: {turn.content}\n"
+    for turn in (payload.conversation or [])[-6:]
+  ]
+  segments = payload.rag_results or []
+  compact = segment_format_for(payload) == "compact"
+  if compact:
+    segments = dedupe_segments(segments)
+  render_variants = render_compact_segment_variants if compact else render_segment_variants
+  segment_variants = [render_variants(seg) for seg in segments]
+  tail = "\nConsigne complémentaire:\n" + (payload.instructions or "")
+
+  # Budget : en-tête et consigne toujours conservés, le reste est réparti entre sections
+  needs = {
+    "structured": estimate_tokens(structured),
+    "history": sum(estimate_tokens(turn) for turn in history_turns),
+    "segments": sum(estimate_tokens("".join(variants[0])) for variants in segment_variants),
+  }
+  fixed = estimate_tokens(header) + estimate_tokens(tail) + PROMPT_SECTION_OVERHEAD_TOKENS
+  if PROMPT_TOKEN_BUDGET > 0:
+    caps = allocate_budget(PROMPT_TOKEN_BUDGET - fixed, needs)
   else:
-    segment_refs = compute_segment_refs(payload.rag_results)  # Gardé pour debug/logs
-    for ref, seg in segment_refs:
-      snippet = (seg.excerpt or seg.content or "").replace("\n", " ")
-      snippet = snippet[:200]
-      # Ne pas afficher le numéro dans le prompt visible par Claude
-      lines.append(
-        f"- {seg.label or getattr(seg, 'source', None) or 'Document'} — {snippet}"
-        + (f" (url: {seg.url})" if seg.url else "")
-      )
-    if any(seg.custom_id == "U" for seg in payload.rag_results):
-      lines.append(
+    caps = dict(needs)
+
+  structured = truncate_to_tokens(structured, caps["structured"])
+  history_turns, dropped_turns = fit_history(history_turns, caps["history"])
+  chosen = fit_ranked(
+    [["".join(variant) for variant in variants] for variants in segment_variants],
+    [seg.score or 0.0 for seg in segments],
+    caps["segments"],
+  )
+
+  parts = [header, structured]
+  if history_turns:
+    parts.append("Historique:\n")
+    parts.extend(history_turns)
+
+  kept = [(seg, segment_variants[i][level]) for i, (seg, level) in enumerate(zip(segments, chosen)) if level is not None]
+  parts.append("\nSegments RAG disponibles :\n")
+  if not kept:
+    parts.append("Aucun extrait disponible.\n")
+  else:
+    parts.extend(summary for _, (summary, _) in kept)
+    if any(seg.custom_id == "U" for seg, _ in kept):
+      parts.append(
         "\nNote: Un segment provient directement d'une contribution utilisateur. "
         "Tu peux t'appuyer sur ce segment fourni par l'utilisateur pour tes calculs ou vérifications.\n"
       )
-  lines.append("\nDétails RAG (tronqués) :\n")
-  for ref, seg in compute_segment_refs(payload.rag_results or []):
-    # Ne pas afficher le numéro dans le prompt visible par Claude
-    lines.append(f"- {seg.label or getattr(seg, 'source', None) or 'Document'}\n")
-    if seg.url:
-      lines.append(f"URL: {seg.url}\n")
-    if seg.score is not None:
-      lines.append(f"Score: {seg.score:.2f}\n")
-    excerpt = (seg.excerpt or "").strip()
-    if excerpt:
-      lines.append(f"Extrait court: {excerpt[:400]}\n")
-    content = (seg.content or "").strip()
-    if content:
-      lines.append(f"Contenu tronqué: {content[:800]}\n")
-    lines.append("---\n")
+  if not compact:
+    parts.append("\nDétails RAG (tronqués) :\n")
+  parts.extend(detail for _, (_, detail) in kept)
+  parts.append(tail)
+  prompt = "".join(parts)
+
+  trimmed_segments = sum(1 for level in chosen if level)
+  print(
+    f"[PROMPT BUDGET] {estimate_tokens(prompt)}/{PROMPT_TOKEN_BUDGET or '∞'} jetons | "
+    f"fixe {fixed} | données {estimate_tokens(structured)}/{needs['structured']} | "
+    f"historique {sum(estimate_tokens(turn) for turn in history_turns)}/{needs['history']} "
+    f"({dropped_turns} tour(s) écarté(s)) | segments {len(kept)}/{len(segments)} "
+    f"({trimmed_segments} raccourci(s))"
+  )
+  return prompt
+
 
-  lines.append("\nConsigne complémentaire:\n")
-  lines.append(payload.instructions or "")
-  return "".join(lines)
+def segment_format_for(payload: AssistantRequest) -> str:
+  requested = payload.segment_format or SEGMENT_FORMAT
+  return requested if requested in SEGMENT_FORMATS else "legacy"
+
+
+def dedupe_segments(segments: List[RagSegment]) -> List[RagSegment]:
+  """
+  Un seul segment par texte identique (le corpus contient des copies d'une même page :
+  #main, #footer, #menu…). Garde le meilleur score, à la position de la première copie.
+  """
+  best: Dict[str, int] = {}
+  kept: List[RagSegment] = []
+  for seg in segments:
+    key = " ".join((seg.content or seg.excerpt or "").split())
+    if not key:
+      kept.append(seg)
+      continue
+    position = best.get(key)
+    if position is None:
+      best[key] = len(kept)
+      kept.append(seg)
+    elif (seg.score or 0.0) > (kept[position].score or 0.0):
+      kept[position] = seg
+  return kept
+
+
+def render_compact_segment_variants(seg: RagSegment) -> List[Tuple[str, str]]:
+  """
+  Format "compact" : un bloc unique par segment (en-tête + texte), le texte étant le
+  contenu, ou l'extrait s'il n'y a pas de contenu. Variantes : 800, 400, 200 caractères,
+  en-tête seul.
+  """
+  label = seg.label or getattr(seg, "source", None) or "Document"
+  head = f"- {label}" + (f" (url: {seg.url})" if seg.url else "")
+  if seg.score is not None:
+    head += f" [score {seg.score:.2f}]"
+  text = " ".join((seg.content or seg.excerpt or "").split())
+  variants: List[Tuple[str, str]] = []
+  for limit in (800, 400, 200):
+    if text:
+      variants.append(("", f"{head}\n{text[:limit]}\n"))
+  variants.append(("", head + "\n"))
+  return variants
+
+
+def render_segment_variants(seg: RagSegment) -> List[Tuple[str, str]]:
+  """
+  Rendus (entrée de liste, bloc de détails) d'un segment, du plus complet au plus court :
+  contenu 800 caractères, contenu 400, extrait seul, entrée de liste seule.
+  """
+  # Ne pas afficher le numéro dans le prompt visible par Claude
+  label = seg.label or getattr(seg, "source", None) or "Document"
+  snippet = (seg.excerpt or seg.content or "").replace("\n", " ")[:200]
+  summary = f"- {label} — {snippet}" + (f" (url: {seg.url})" if seg.url else "") + "\n"
+
+  head = f"- {label}\n"
+  if seg.url:
+    head += f"URL: {seg.url}\n"
+  if seg.score is not None:
+    head += f"Score: {seg.score:.2f}\n"
+  excerpt = (seg.excerpt or "").strip()
+  if excerpt:
+    head += f"Extrait court: {excerpt[:400]}\n"
+  content = (seg.content or "").strip()
+
+  variants: List[Tuple[str, str]] = []
+  for limit in (800, 400):
+    if content:
+      variants.append((summary, head + f"Contenu tronqué: {content[:limit]}\n---\n"))
+  variants.append((summary, head + "---\n"))
+  variants.append((summary, ""))
+  return variants
 
 
 def load_embeddings():
-  global corpus_embeddings, corpus_metadata, embed_model, whoosh_index, whoosh_dir
+  global corpus_embeddings, embedding_store, vector_index, corpus_metadata, embed_model, whoosh_index, whoosh_dir, bm25_index
+  global corpus_normalized, corpus_tokens, normalized_by_content, corpus_segment_ids, segment_store
   try:
-    # Charger les embeddings pré-calculés (même sans sentence-transformers)
-    corpus_embeddings = np.load(EMBEDDINGS_PATH)
-    with METADATA_PATH.open(encoding="utf-8") as f:
+    # Embeddings et requêtes analysées par l'ancien modèle / index : invalides après rechargement
+    query_embedding_memo.clear()
+    bm25_query_memo.clear()
+    # Charger les embeddings pré-calculés en mmap (même sans sentence-transformers)
+    embedding_store = load_embedding_store(Path(EMBEDDINGS_PATH))
+    corpus_embeddings = embedding_store.matrix
+    with Path(METADATA_PATH).open(encoding="utf-8") as f:
       corpus_metadata = json.load(f)
-    print(f"✅ Embeddings chargés ({corpus_embeddings.shape[0]} segments).")
+    corpus_hash = compute_corpus_hash(corpus_metadata)
+    corpus_segment_ids = [segment_id(meta) for meta in corpus_metadata]
+    print(f"✅ Embeddings chargés ({describe_store(embedding_store)}).")
+    load_normalized_corpus(corpus_hash)
+    if embedding_store.header:
+      if embedding_store.model_name and embedding_store.model_name != EMBED_MODEL_NAME:
+        print(
+          f"⚠️ Embeddings générés avec {embedding_store.model_name} mais EMBED_MODEL={EMBED_MODEL_NAME} "
+          "(relancer ML/embed_corpus.py)."
+        )
+      if embedding_store.corpus_hash and embedding_store.corpus_hash != corpus_hash:
+        print("⚠️ Hash du corpus différent de celui des embeddings (relancer ML/embed_corpus.py).")
+    if len(embedding_store) != len(corpus_metadata):
+      print(f"⚠️ {len(embedding_store)} embeddings pour {len(corpus_metadata)} segments : recherche sémantique désactivée.")
+      embedding_store = None
+      corpus_embeddings = None
+    if embedding_store is not None:
+      vector_index = load_vector_index(
+        VECTOR_INDEX_KIND,
+        embedding_store,
+        Path(EMBEDDINGS_PATH),
+        nprobe=VECTOR_NPROBE,
+        corpus_hash=corpus_hash,
+      )
+      print(f"✅ Index vectoriel : {vector_index.describe()}")
+    else:
+      vector_index = None
     
     # Charger le modèle seulement si sentence-transformers est disponible
     if SentenceTransformer is not None:
@@ -885,130 +1361,276 @@ def load_embeddings():
       print("✅ Modèle sentence-transformers chargé (recherche sémantique activée).")
     else:
       embed_model = None
-      print("⚠️ sentence-transformers non disponible (recherche Whoosh uniquement).")
-
-    if Schema and StemmingAnalyzer and FrenchStemmer:
-      # Utilisation du stemmer français (Snowball) au lieu du Porter anglais
-      schema = Schema(
-        id=ID(stored=True, unique=True),
-        label=TEXT(stored=True),
-        content=TEXT(analyzer=StemmingAnalyzer(minsize=2, stemfn=FrenchStemmer().stem), stored=False),
-      )
-      whoosh_dir = Path(tempfile.mkdtemp(prefix="amiens_whoosh_"))
-      ix = create_in(whoosh_dir, schema)
-      writer = ix.writer()
-      for idx, meta in enumerate(corpus_metadata):
-        doc_id = str(idx)
-        label = meta.get("label") or meta.get("source") or ""
-        content = " ".join(
-          str(meta.get(field, "")) for field in ("content", "label", "source", "section")
-        )
-        writer.add_document(id=doc_id, label=label, content=content)
-      writer.commit()
-      whoosh_index = ix
-      print(f"✅ Index Whoosh construit ({len(corpus_metadata)} documents).")
+      print("⚠️ sentence-transformers non disponible (recherche BM25 uniquement).")
+
+    bm25_index = None
+    if BM25_ENGINE == "numpy" and WHOOSH_AVAILABLE:
+      try:
+        # Comptes BM25 persistés à côté des métadonnées, recalculés seulement si le corpus change
+        bm25_path = bm25_index_path(Path(METADATA_PATH))
+        bm25_index, rebuilt = open_or_build_bm25_index(bm25_path, corpus_metadata, corpus_hash, BM25_K1, BM25_B)
+        status = "construit" if rebuilt else "chargé"
+        print(f"✅ Index BM25 NumPy {status} ({len(bm25_index)} documents, {bm25_path}).")
+      except Exception as exc:
+        print(f"⚠️ Index BM25 NumPy indisponible ({exc}) : repli sur Whoosh.")
+        bm25_index = None
+
+    if bm25_index is not None:
+      whoosh_index = None
+    elif WHOOSH_AVAILABLE and MultifieldParser:
+      # Index BM25 persistant à côté des métadonnées, reconstruit seulement si le corpus change
+      whoosh_dir = whoosh_index_dir(Path(METADATA_PATH))
+      whoosh_index, rebuilt = open_or_build_whoosh_index(whoosh_dir, corpus_metadata, corpus_hash)
+      status = "construit" if rebuilt else "ouvert"
+      print(f"✅ Index Whoosh {status} ({whoosh_index.doc_count()} documents, {whoosh_dir}).")
     else:
       whoosh_index = None
       print("⚠️ Whoosh indisponible : installation requise pour BM25 local.")
   except Exception as exc:
     print(f"⚠️ Impossible de charger les embeddings: {exc}")
     corpus_embeddings = None
+    embedding_store = None
+    vector_index = None
     corpus_metadata = None
+    corpus_normalized = None
+    corpus_tokens = None
+    normalized_by_content = {}
+    corpus_segment_ids = None
+    segment_store = None
     embed_model = None
     whoosh_index = None
+    bm25_index = None
+
+
+def load_normalized_corpus(corpus_hash: str) -> None:
+  """Charge les colonnes normalisées ; les recalcule (et les écrit) si absentes ou périmées."""
+  global corpus_normalized, corpus_tokens, normalized_by_content
+  columns_path = normalized_columns_path(Path(METADATA_PATH))
+  columns = load_normalized_columns(columns_path, corpus_hash)
+  if columns is None:
+    print(f"🔄 Colonnes normalisées absentes ou périmées : recalcul ({columns_path}).")
+    columns = build_normalized_columns(corpus_metadata, corpus_hash)
+    try:
+      save_normalized_columns(columns_path, columns)
+    except OSError as exc:
+      print(f"⚠️ Impossible d'écrire les colonnes normalisées: {exc}")
+  corpus_normalized = columns["content"]
+  corpus_tokens = columns["tokens"]
+  normalized_by_content = {
+    meta.get("content"): text
+    for meta, text in zip(corpus_metadata, corpus_normalized)
+    if meta.get("content")
+  }
+  print(f"✅ Colonnes normalisées chargées ({len(corpus_normalized)} segments).")
+  build_segment_store()
+
+
+def stored_segment(position: int, score: Optional[float] = None, **overrides: Any) -> RagSegment:
+  """
+  Segment du corpus tel que le serveur le construit (extrait = 400 premiers caractères),
+  lié à sa position dans le magasin pour les colonnes précalculées.
+  """
+  meta = corpus_metadata[position]
+  content = meta.get("content")
+  segment = RagSegment(
+    label=meta.get("label") or meta.get("source"),
+    url=meta.get("url"),
+    score=score,
+    excerpt=(content or "")[:400],
+    content=content,
+    id=corpus_segment_ids[position] if corpus_segment_ids else None,
+    **overrides,
+  )
+  segment._store_position = position
+  return segment
+
+
+def build_segment_store() -> None:
+  """Précalcule, pour chaque segment du corpus, le texte normalisé et l'indicateur tarifaire."""
+  global segment_store
+  segment_store = None
+  normalized: List[str] = []
+  currency_flags: List[bool] = []
+  for position in range(len(corpus_metadata)):
+    segment = stored_segment(position)
+    normalized.append(segment_normalized_text(segment))
+    currency_flags.append(segment_contains_currency_data(segment))
+  segment_store = SegmentStore(corpus_metadata, corpus_segment_ids, normalized, currency_flags)
+  print(f"✅ Magasin de segments prêt ({segment_store.stats()})")
+
+
+def resolve_segment_refs(segments: List[RagSegment]) -> List[RagSegment]:
+  """
+  Segments du corpus envoyés par identifiant (sans contenu) : reconstruits depuis le
+  magasin. Un identifiant inconnu (corpus reconstruit entre-temps) est ignoré.
+  """
+  resolved: List[RagSegment] = []
+  for segment in segments:
+    if not segment.id or segment.content:
+      resolved.append(segment)
+      continue
+    position = segment_store.position(segment.id) if segment_store is not None else None
+    if position is None:
+      print(f"⚠️ Segment inconnu ignoré: {segment.id}")
+      continue
+    resolved.append(stored_segment(position, segment.score, custom_id=segment.custom_id))
+  return resolved
+
+
+def search_hit(position: int, score: float) -> Dict[str, Any]:
+  meta = corpus_metadata[position]
+  return {
+    "id": corpus_segment_ids[position] if corpus_segment_ids else None,
+    "label": meta.get("label"),
+    "url": meta.get("url"),
+    "section": meta.get("section"),
+    "source": meta.get("source"),
+    "content": meta.get("content"),
+    "score": score,
+  }
+
+
+def parsed_bm25_query(question: str) -> Any:
+  """
+  Requête BM25 analysée (termes du moteur NumPy ou requête Whoosh), mémorisée par texte
+  aux espaces près : l'analyse dépend des accents et de la casse, pas de normalize_text ici.
+  """
+  key = " ".join((question or "").split())
+  if bm25_index is not None:
+    return bm25_query_memo.get_or_compute(key, lambda: bm25_index.query_terms(key))
+  parser = MultifieldParser(["label", "content"], schema=whoosh_index.schema, group=OrGroup)
+  return bm25_query_memo.get_or_compute(key, lambda: parser.parse(key))
+
+
+def bm25_search(question: str, limit: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+  """Résultats BM25F (indices de segments, scores décroissants) ; None sans moteur BM25."""
+  if bm25_index is None and not whoosh_index:
+    return None
+  query = parsed_bm25_query(question)
+  if bm25_index is not None:
+    return bm25_index.search(question, limit, terms=query)
+  with whoosh_index.searcher(weighting=scoring.BM25F(B=BM25_B, K1=BM25_K1)) as searcher:
+    hits = searcher.search(query, limit=limit)
+    doc_ids = [int(hit["id"]) for hit in hits]
+    scores = [float(hit.score or 0.0) for hit in hits]
+  return np.array(doc_ids, dtype=np.int64), np.array(scores, dtype=np.float64)
 
 
 def semantic_search(
   question: str,
   matches: Optional[List[Dict[str, Any]]] = None,
   top_k: int = 5,
-  min_score: float = 0.2
+  min_score: float = 0.2,
+  fusion: Optional[str] = None,
 ) -> List[Tuple[float, Dict[str, Any]]]:
-  results: Dict[str, Dict[str, Any]] = {}
-  weights: Dict[str, float] = {}
+  mode = fusion or SEARCH_FUSION
+  if mode not in FUSION_MODES:
+    mode = FUSION_LEGACY
+  weights = FUSION_WEIGHTS[mode]
   lexicon_terms: List[str] = []
   if matches:
     for entry in matches:
       lexicon_terms.extend(entry.get("_normalized_admin", []))
   normalized_terms = [term for term in lexicon_terms if term]
+  runs: List[RetrieverRun] = []
 
-  if whoosh_index:
-    parser = MultifieldParser(["label", "content"], schema=whoosh_index.schema, group=OrGroup)
-    query = parser.parse(question)
-    with whoosh_index.searcher(weighting=scoring.BM25F(B=0.75, K1=1.6)) as searcher:
-      # Optimisation : réduire de top_k * 4 à top_k * 2 pour meilleure performance
-      hits = searcher.search(query, limit=top_k * 2)
-      for hit in hits:
-        doc_id = hit["id"]
-        score = float(hit.score or 0.0)
-        meta = corpus_metadata[int(doc_id)]
-        results[doc_id] = {
-          "label": meta.get("label"),
-          "url": meta.get("url"),
-          "section": meta.get("section"),
-          "source": meta.get("source"),
-          "content": meta.get("content"),
-        }
-        # Rééquilibrage du poids BM25 (avec stemmer français maintenant)
-        bm25_weight = score * 1.0
-        if normalized_terms:
-          normalized_content = _normalize(meta.get("content") or "")
-          term_hits = sum(1 for term in normalized_terms if term and term in normalized_content)
-          if term_hits:
-            bm25_weight += term_hits * 2.5
-        weights[doc_id] = weights.get(doc_id, 0.0) + bm25_weight
-
-  if corpus_embeddings is not None and embed_model is not None:
-    query_vec = embed_model.encode([question], normalize_embeddings=True)[0]
-    scores = corpus_embeddings @ query_vec
+  # Optimisation : réduire de top_k * 4 à top_k * 2 pour meilleure performance
+  bm25_hits = bm25_search(question, top_k * 2)
+  if bm25_hits is not None:
+    doc_ids, scores = bm25_hits
+    # Bonus lexical (termes administratifs) sur les résultats BM25, comme auparavant
+    runs.append(RetrieverRun(doc_ids, scores, weights["bm25"], lexicon_boost=True))
+
+  if vector_index is not None and embed_model is not None:
+    query_vec = encode_question(question)
     # Optimisation : réduire de top_k * 4 à top_k * 2 pour meilleure performance
-    best_idx = np.argsort(-scores)[: top_k * 2]
-    for idx in best_idx:
-      score = float(scores[idx])
-      if score < min_score:
-        continue
-      doc_id = str(idx)
-      meta = corpus_metadata[idx]
-      if doc_id not in results:
-        results[doc_id] = {
-          "label": meta.get("label"),
-          "url": meta.get("url"),
-          "section": meta.get("section"),
-          "source": meta.get("source"),
-          "content": meta.get("content"),
-        }
-      # Augmentation du poids sémantique (cosine similarity)
-      cosine_weight = score * 0.6
-      weights[doc_id] = weights.get(doc_id, 0.0) + cosine_weight
-
-  ranked = sorted(weights.items(), key=lambda item: item[1], reverse=True)[:top_k]
-  combined_results: List[Tuple[float, Dict[str, Any]]] = []
-  for doc_id, score in ranked:
-    meta = results.get(doc_id)
-    if not meta:
-      continue
-    combined_results.append((score, {**meta, "score": score}))
-  return combined_results
+    best_idx, best_scores = vector_index.search(query_vec, top_k * 2)
+    keep = np.asarray(best_scores) >= min_score
+    runs.append(RetrieverRun(np.asarray(best_idx)[keep], np.asarray(best_scores)[keep], weights["vector"]))
+
+  positions, fused = fuse_scores(
+    runs,
+    top_k,
+    mode,
+    lexicon=lexicon_boost,
+    lexicon_terms=normalized_terms,
+    normalized_docs=corpus_normalized,
+  )
+  return [(score, search_hit(position, score)) for position, score in zip(positions.tolist(), fused.tolist())]
 
 
-def call_model(prompt: str) -> Dict[str, Any]:
-  try:
-    response = client.messages.create(
-      model=CLAUDE_MODEL,
-      max_tokens=900,
-      temperature=0.2,
-      system=ASSISTANT_SYSTEM_PROMPT,
-      messages=[{"role": "user", "content": prompt}],
-      timeout=30.0,  # Timeout de 30 secondes pour l'API Claude (optimisé)
-    )
-  except Exception as e:
-    print(f"❌ Erreur API Claude: {e}")
-    raise HTTPException(status_code=502, detail=f"Erreur API Claude: {str(e)}")
+def search_corpus(
+  question: str,
+  normalized_question: Optional[str] = None,
+  top_k: int = 5,
+  min_score: float = 0.25,
+) -> List[Tuple[float, Dict[str, Any]]]:
+  """Recherche hybride seule (lexique + BM25 + vecteurs), même requête que le repli de prepare_assistant_prompt."""
+  lexicon_matches = match_lexicon_entries(question, normalized_question)
+  expanded_question = expand_query_with_lexicon(question or "", lexicon_matches)
+  return semantic_search(expanded_question or question, lexicon_matches, top_k=top_k, min_score=min_score)
+
+
+def build_system_blocks() -> Any:
+  """
+  Partie statique du prompt. Avec le prompt caching, les consignes et les données de
+  référence forment un préfixe identique à chaque appel : le point de cache
+  (cache_control) est posé sur le dernier bloc, Anthropic relit ce préfixe depuis son cache.
+  """
+  if not PROMPT_CACHE_ENABLED:
+    return ASSISTANT_SYSTEM_PROMPT
+  blocks = [{"type": "text", "text": ASSISTANT_SYSTEM_PROMPT}]
+  if static_reference_block:
+    blocks.append({"type": "text", "text": static_reference_block})
+  blocks[-1]["cache_control"] = {"type": "ephemeral"}
+  return blocks
+
+
+def model_for_route(route: Optional[str]) -> str:
+  return CLAUDE_FAST_MODEL if route == ROUTE_FAST else CLAUDE_MODEL
+
+
+def build_model_request(prompt: str, route: Optional[str] = None) -> Dict[str, Any]:
+  """Paramètres communs aux appels Claude (réponse complète ou streaming)."""
+  return {
+    "model": model_for_route(route),
+    "max_tokens": 900,
+    "temperature": 0.2,
+    "system": build_system_blocks(),
+    "messages": [{"role": "user", "content": prompt}],
+    "timeout": 30.0,  # Timeout de 30 secondes pour l'API Claude (optimisé)
+  }
+
+
+def record_model_usage(raw_usage: Any) -> Optional[Dict[str, int]]:
+  """Jetons d'un appel (entrée non cachée, écriture / lecture du cache, sortie) + cumul global."""
+  if raw_usage is None:
+    return None
+  usage = {field: int(getattr(raw_usage, field, 0) or 0) for field in MODEL_USAGE_FIELDS}
+  model_usage_totals["calls"] += 1
+  for field, value in usage.items():
+    model_usage_totals[field] += value
+  return usage
+
 
+def model_usage_stats() -> Dict[str, Any]:
+  totals = dict(model_usage_totals)
+  prompt_tokens = totals["input_tokens"] + totals["cache_creation_input_tokens"] + totals["cache_read_input_tokens"]
+  totals["cached_input_ratio"] = round(totals["cache_read_input_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0
+  return totals
+
+
+def parse_model_response(response: Any) -> Dict[str, Any]:
   if not response.content:
     raise HTTPException(status_code=502, detail="Réponse vide du modèle")
 
   text = "".join(part.text for part in response.content if hasattr(part, "text"))
+  result = parse_model_text(text)
+  result["usage"] = record_model_usage(getattr(response, "usage", None))
+  return result
+
+
+def parse_model_text(text: str) -> Dict[str, Any]:
   clean = text.strip()
   if clean.startswith("```"):
     lines = clean.splitlines()
@@ -1043,6 +1665,44 @@ def call_model(prompt: str) -> Dict[str, Any]:
     raise HTTPException(status_code=502, detail=f"JSON invalide: {exc}") from exc
 
 
+async def call_model_async(prompt: str, route: Optional[str] = None) -> Dict[str, Any]:
+  """Appel Claude non bloquant (AsyncAnthropic), avec statistiques par route."""
+  started = time.perf_counter()
+  try:
+    response = await async_client.messages.create(**build_model_request(prompt, route))
+  except Exception as e:
+    route_stats.record(route or ROUTE_LARGE, time.perf_counter() - started, error=True)
+    print(f"❌ Erreur API Claude: {e}")
+    raise HTTPException(status_code=502, detail=f"Erreur API Claude: {str(e)}")
+  route_stats.record(route or ROUTE_LARGE, time.perf_counter() - started)
+  return parse_model_response(response)
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+  return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_model_text(prompt: str, usage: Optional[Dict[str, Any]] = None, route: Optional[str] = None):
+  """
+  Itère sur les fragments de texte produits par Claude (AsyncAnthropic stream).
+  `usage`, si fourni, reçoit les jetons consommés une fois le flux terminé.
+  """
+  started = time.perf_counter()
+  try:
+    async with async_client.messages.stream(**build_model_request(prompt, route)) as stream:
+      async for text in stream.text_stream:
+        yield text
+      get_final_message = getattr(stream, "get_final_message", None)
+      if usage is not None and get_final_message is not None:
+        final_message = await get_final_message()
+        usage.update(record_model_usage(getattr(final_message, "usage", None)) or {})
+    route_stats.record(route or ROUTE_LARGE, time.perf_counter() - started)
+  except Exception as e:
+    route_stats.record(route or ROUTE_LARGE, time.perf_counter() - started, error=True)
+    print(f"❌ Erreur API Claude (stream): {e}")
+    raise HTTPException(status_code=502, detail=f"Erreur API Claude: {str(e)}")
+
+
 app = FastAPI(title="RAG Assistant Amiens V2", version="0.2.0")
 load_embeddings()
 load_lexicon()
@@ -1218,179 +1878,403 @@ def normalize_followup_question(question: Optional[str]) -> Optional[str]:
   return q if q else None
 
 
-@app.post("/rag-assistant", response_model=AssistantResponse)
-def rag_assistant_endpoint(payload: AssistantRequest):
-  try:
-    # Vérifier le cache avant de faire la recherche RAG
-    cache = get_cache(ttl=3600)  # TTL de 1h par défaut
-    # Inclure la version dans la clé pour invalider automatiquement les anciennes réponses
-    cache_key = f"{CACHE_VERSION}:{payload.question or payload.normalized_question or ''}"
-    
-    if cache and cache_key:
-      cached_result = cache.get(cache_key)
-      if cached_result is not None:
-        print(f"[CACHE HIT] Question: {cache_key[:50]}...")
-        return AssistantResponse(**cached_result)
-    
-    lexicon_matches = match_lexicon_entries(payload.question, payload.normalized_question)
-    expanded_question = expand_query_with_lexicon(payload.question or "", lexicon_matches)
-
-    incoming_segments = payload.rag_results or []
-    rag_results: List[RagSegment] = []
-    for item in incoming_segments:
-      if isinstance(item, RagSegment):
-        rag_results.append(item)
-      elif isinstance(item, dict):
-        rag_results.append(RagSegment(**item))
+def prepare_assistant_prompt(payload: AssistantRequest) -> Tuple[str, List[RagSegment], str]:
+  """
+  Partie CPU de la requête : lexique, recherche hybride, bonus, mémo, prompt et route
+  du modèle. Exécutée dans retrieval_executor pour ne pas bloquer la boucle asyncio.
+  """
+  lexicon_matches = match_lexicon_entries(payload.question, payload.normalized_question)
+  expanded_question = expand_query_with_lexicon(payload.question or "", lexicon_matches)
+
+  incoming_segments = payload.rag_results or []
+  rag_results: List[RagSegment] = []
+  for item in incoming_segments:
+    if isinstance(item, RagSegment):
+      rag_results.append(item)
+    elif isinstance(item, dict):
+      rag_results.append(RagSegment(**item))
+    else:
+      # fallback : tente conversion via dict
+      if hasattr(RagSegment, "model_validate"):
+        rag_results.append(RagSegment.model_validate(item))  # type: ignore[attr-defined]
       else:
-        # fallback : tente conversion via dict
-        if hasattr(RagSegment, "model_validate"):
-          rag_results.append(RagSegment.model_validate(item))  # type: ignore[attr-defined]
-        else:
-          rag_results.append(RagSegment.parse_obj(item))
-
-    if not rag_results:
-      fallback_query = expanded_question or payload.question
-      fallback_segments = semantic_search(fallback_query, lexicon_matches, top_k=5, min_score=0.25)
-      for score, meta in fallback_segments:
-        rag_results.append(
-          RagSegment(
-            label=meta.get("label") or meta.get("source"),
-            url=meta.get("url"),
-            score=score,
-            excerpt=(meta.get("content") or "")[:400],
-            content=meta.get("content"),
-          )
-        )
+        rag_results.append(RagSegment.parse_obj(item))
 
-    user_snippet = extract_user_snippet(payload.question)
-    if user_snippet and not any(seg.custom_id == "U" for seg in rag_results):
-      max_score = max((seg.score or 0.0) for seg in rag_results) if rag_results else 0.0
-      rag_results.insert(
-        0,
-        RagSegment(
-          label="Contribution utilisateur",
-          score=max_score + CURRENCY_BONUS,
-          excerpt=user_snippet[:400],
-          content=user_snippet,
-          custom_id="U",
+  rag_results = resolve_segment_refs(rag_results)
+
+  if not rag_results:
+    fallback_query = expanded_question or payload.question
+    fallback_segments = semantic_search(fallback_query, lexicon_matches, top_k=5, min_score=0.25)
+    for score, meta in fallback_segments:
+      position = segment_store.position(meta.get("id")) if segment_store is not None else None
+      if position is not None:
+        segment = stored_segment(position, score)
+      else:
+        segment = RagSegment(
+          label=meta.get("label") or meta.get("source"),
+          url=meta.get("url"),
+          score=score,
+          excerpt=(meta.get("content") or "")[:400],
+          content=meta.get("content"),
         )
+      rag_results.append(segment)
+
+  user_snippet = extract_user_snippet(payload.question)
+  if user_snippet and not any(seg.custom_id == "U" for seg in rag_results):
+    max_score = max((seg.score or 0.0) for seg in rag_results) if rag_results else 0.0
+    rag_results.insert(
+      0,
+      RagSegment(
+        label="Contribution utilisateur",
+        score=max_score + CURRENCY_BONUS,
+        excerpt=user_snippet[:400],
+        content=user_snippet,
+        custom_id="U",
       )
+    )
 
-    apply_currency_bonus(payload.question, payload.normalized_question, rag_results)
-    apply_lexicon_bonus(rag_results, lexicon_matches)
+  apply_currency_bonus(payload.question, payload.normalized_question, rag_results)
+  apply_lexicon_bonus(rag_results, lexicon_matches)
 
-    try:
-      debug_scores = sorted(
+  try:
+    debug_scores = sorted(
+      (
         (
-          (
-            float(seg.score) if seg.score is not None else 0.0,
-            seg.label or getattr(seg, "source", None) or seg.custom_id or "Segment",
-            seg.custom_id or "",
-          )
-          for seg in rag_results
-        ),
-        key=lambda entry: entry[0],
-        reverse=True,
-      )[:5]
-      if lexicon_matches:
-        matched_terms = [entry.get("terme_usager") for entry in lexicon_matches]
-        print(f"[RAG DEBUG] Question: {payload.question!r} (lexique: {matched_terms}) → {debug_scores}")
-      else:
-        print(f"[RAG DEBUG] Question: {payload.question!r} → {debug_scores}")
-    except Exception as exc:
-      print(f"[RAG DEBUG] Impossible d'afficher les scores: {exc}")
-
-    intent_label = payload.intent_label
-    intent_weight = payload.intent_weight
-    if intent_label is None or intent_weight is None:
-      intent_label, intent_weight = detect_user_intention(payload.question, payload.normalized_question)
-
-    conversation_raw = list(payload.conversation or [])
-    conversation: List[ConversationTurn] = []
-    for entry in conversation_raw:
-      if isinstance(entry, ConversationTurn):
-        conversation.append(entry)
-      elif isinstance(entry, dict):
-        role = entry.get("role", "assistant")
-        content = entry.get("content", "")
-        conversation.append(ConversationTurn(role=role, content=content))
-
-    summary_entries: List[str] = []
-    for ref, seg in compute_segment_refs(rag_results):
-      snippet = (seg.excerpt or seg.content or "").replace("\n", " ")
-      snippet = snippet[:160]
-      # Ne pas inclure les numéros dans le mémo visible par Claude
-      summary_entries.append(f"{seg.label or getattr(seg, 'source', None) or 'Document'} — {snippet}")
-    if summary_entries:
-      memo_text = " | ".join(summary_entries[:5])
+          float(seg.score) if seg.score is not None else 0.0,
+          seg.label or getattr(seg, "source", None) or seg.custom_id or "Segment",
+          seg.custom_id or "",
+        )
+        for seg in rag_results
+      ),
+      key=lambda entry: entry[0],
+      reverse=True,
+    )[:5]
+    if lexicon_matches:
+      matched_terms = [entry.get("terme_usager") for entry in lexicon_matches]
+      print(f"[RAG DEBUG] Question: {payload.question!r} (lexique: {matched_terms}) → {debug_scores}")
+    else:
+      print(f"[RAG DEBUG] Question: {payload.question!r} → {debug_scores}")
+  except Exception as exc:
+    print(f"[RAG DEBUG] Impossible d'afficher les scores: {exc}")
+
+  intent_label = payload.intent_label
+  intent_weight = payload.intent_weight
+  if intent_label is None or intent_weight is None:
+    intent_label, intent_weight = detect_user_intention(payload.question, payload.normalized_question)
+
+  conversation_raw = list(payload.conversation or [])
+  conversation: List[ConversationTurn] = []
+  for entry in conversation_raw:
+    if isinstance(entry, ConversationTurn):
+      conversation.append(entry)
+    elif isinstance(entry, dict):
+      role = entry.get("role", "assistant")
+      content = entry.get("content", "")
+      conversation.append(ConversationTurn(role=role, content=content))
+
+  summary_entries: List[str] = []
+  for ref, seg in compute_segment_refs(rag_results):
+    snippet = (seg.excerpt or seg.content or "").replace("\n", " ")
+    snippet = snippet[:160]
+    # Ne pas inclure les numéros dans le mémo visible par Claude
+    summary_entries.append(f"{seg.label or getattr(seg, 'source', None) or 'Document'} — {snippet}")
+  if summary_entries:
+    memo_text = " | ".join(summary_entries[:5])
+    # En format compact, les segments n'apparaissent qu'une fois (section Segments RAG)
+    if segment_format_for(payload) != "compact":
       conversation.append(ConversationTurn(role="assistant", content=f"Mémo RAG actuel : {memo_text}"))
-      # Log avec numéros pour debug (non visible par Claude)
-      debug_entries = [f"#{ref}: {seg.label}" for ref, seg in compute_segment_refs(rag_results)[:5]]
-      print(f"[DEBUG RAG] Segments utilisés: {', '.join(debug_entries)}")
+    # Log avec numéros pour debug (non visible par Claude)
+    debug_entries = [f"#{ref}: {seg.label}" for ref, seg in compute_segment_refs(rag_results)[:5]]
+    print(f"[DEBUG RAG] Segments utilisés: {', '.join(debug_entries)}")
+
+  enriched_payload = payload.model_copy()
+  enriched_payload.rag_results = rag_results
+  enriched_payload.conversation = conversation[-12:]
+  enriched_payload.intent_label = intent_label
+  enriched_payload.intent_weight = intent_weight
+
+  prompt_signals: Dict[str, Any] = {}
+  prompt = build_prompt(enriched_payload, prompt_signals)
+  route = ROUTE_LARGE
+  if MODEL_ROUTING_ENABLED:
+    route, reason = choose_route(
+      intent_label,
+      intent_weight,
+      len(lexicon_matches),
+      prompt_signals.get("structured_answer", False),
+      [seg.score for seg in rag_results],
+      history_turns=len(conversation_raw),
+      fast_min_score=ROUTER_FAST_MIN_SCORE,
+    )
+    print(f"[ROUTER] {route} → {model_for_route(route)} ({reason})")
+  return prompt, rag_results, route
 
-    enriched_payload = payload.model_copy()
-    enriched_payload.rag_results = rag_results
-    enriched_payload.conversation = conversation[-12:]
-    enriched_payload.intent_label = intent_label
-    enriched_payload.intent_weight = intent_weight
 
-    prompt = build_prompt(enriched_payload)
-    result = call_model(prompt)
+def build_assistant_response(
+  payload: AssistantRequest,
+  result: Dict[str, Any],
+  rag_results: List[RagSegment],
+) -> AssistantResponse:
+  alignment = result.get("alignment") or {}
+  
+  # Normaliser la question de suivi pour qu'elle soit formulée comme un utilisateur
+  raw_followup = result.get("follow_up_question")
+  normalized_followup = normalize_followup_question(raw_followup)
+  
+  # Validation : vérifier que l'ouverture a une réponse dans le RAG
+  if normalized_followup:
+    if not has_rag_answer(normalized_followup, rag_results):
+      # Fallback : générer une alternative depuis données structurées
+      structured_data = {
+        "tarifs_data": tarifs_data,
+        "rpe_data": rpe_data,
+        "lieux_data": lieux_data,
+        "ecoles_data": ecoles_data,
+      }
+      alternative_followup = generate_followup_from_structured_data(
+        payload.question or "",
+        rag_results,
+        structured_data
+      )
+      if alternative_followup:
+        normalized_followup = normalize_followup_question(alternative_followup)
+      else:
+        # Si pas d'alternative, supprimer l'ouverture plutôt que proposer une question sans réponse
+        normalized_followup = None
+  
+  # Plus besoin de nettoyer les références aux segments car Claude ne les voit jamais
+  answer_html = result.get("answer_html", "<p>(Réponse indisponible)</p>")
+  summary = alignment.get("summary", "Alignement non précisée.")
+
+  response = AssistantResponse(
+    answer_html=answer_html,
+    answer_text=result.get("answer_text"),
+    follow_up_question=normalized_followup,
+    alignment=AlignmentPayload(
+      status=alignment.get("status", "info"),
+      label=alignment.get("label", "Analyse RAG"),
+      summary=summary,
+    ),
+    sources=result.get("sources", []),
+    usage=result.get("usage"),
+  )
+  return response
 
-    alignment = result.get("alignment") or {}
-    
-    # Normaliser la question de suivi pour qu'elle soit formulée comme un utilisateur
-    raw_followup = result.get("follow_up_question")
-    normalized_followup = normalize_followup_question(raw_followup)
-    
-    # Validation : vérifier que l'ouverture a une réponse dans le RAG
-    if normalized_followup:
-      if not has_rag_answer(normalized_followup, rag_results):
-        # Fallback : générer une alternative depuis données structurées
-        structured_data = {
-          "tarifs_data": tarifs_data,
-          "rpe_data": rpe_data,
-          "lieux_data": lieux_data,
-          "ecoles_data": ecoles_data,
-        }
-        alternative_followup = generate_followup_from_structured_data(
-          payload.question or "",
-          rag_results,
-          structured_data
-        )
-        if alternative_followup:
-          normalized_followup = normalize_followup_question(alternative_followup)
-        else:
-          # Si pas d'alternative, supprimer l'ouverture plutôt que proposer une question sans réponse
-          normalized_followup = None
-    
-    # Plus besoin de nettoyer les références aux segments car Claude ne les voit jamais
-    answer_html = result.get("answer_html", "<p>(Réponse indisponible)</p>")
-    summary = alignment.get("summary", "Alignement non précisée.")
-
-    response = AssistantResponse(
-      answer_html=answer_html,
-      answer_text=result.get("answer_text"),
-      follow_up_question=normalized_followup,
-      alignment=AlignmentPayload(
-        status=alignment.get("status", "info"),
-        label=alignment.get("label", "Analyse RAG"),
-        summary=summary,
-      ),
-      sources=result.get("sources", []),
-    )
-    
-    # Sauvegarder dans le cache
+
+def encode_question(text: str) -> Optional[np.ndarray]:
+  """
+  Embedding normalisé de la question, mémorisé par texte à la casse et aux espaces près
+  (pas normalize_text : ses chiffres "leet" confondraient "quotient 6" et "quotient 9").
+  """
+  if embed_model is None or not text:
+    return None
+  key = fold_case_space(text) or text
+  return query_embedding_memo.get_or_compute(key, lambda: _encode_readonly(text))
+
+
+def _encode_readonly(text: str) -> np.ndarray:
+  vector = embed_model.encode([text], normalize_embeddings=True)[0]
+  # Partagé entre requêtes via le mémo : lecture seule
+  vector.setflags(write=False)
+  return vector
+
+
+def semantic_cache_for(payload: AssistantRequest) -> Any:
+  """
+  Cache sémantique applicable à la requête, ou None.
+  Réservé aux questions sans historique : une relance courte ("et le mercredi ?")
+  dépend du contexte de la conversation.
+  """
+  if not SEMANTIC_CACHE_ENABLED or embed_model is None or payload.conversation or payload.segment_format:
+    return None
+  return get_semantic_cache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl=3600,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+  )
+
+
+def answer_cache_key(payload: AssistantRequest) -> str:
+  """Clé du cache exact ; les réponses produites en format compact ont leurs propres entrées."""
+  question = payload.question or payload.normalized_question or ""
+  segment_format = segment_format_for(payload)
+  if segment_format != "legacy":
+    return f"{CACHE_VERSION}:{segment_format}:{question}"
+  return f"{CACHE_VERSION}:{question}"
+
+
+def answer_cache():
+  """Cache de réponses exactes (TTL 1h), sur le backend choisi par CACHE_BACKEND."""
+  return get_cache(
+    ttl=3600,
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    backend=CACHE_BACKEND,
+    sqlite_path=CACHE_SQLITE_PATH,
+    redis_url=REDIS_URL,
+  )
+
+
+async def lookup_cached_response(
+  payload: AssistantRequest,
+  cache: Any,
+  cache_key: str,
+) -> Tuple[Optional[AssistantResponse], Optional[np.ndarray]]:
+  """
+  Cherche une réponse en cache : clé exacte, puis question sémantiquement proche.
+  Retourne (réponse ou None, embedding de la question pour l'enregistrement ultérieur).
+  """
+  if cache and cache_key:
+    # Redis / SQLite : lecture hors de la boucle asyncio
+    cached_result = await asyncio.to_thread(cache.get, cache_key)
+    if cached_result is not None:
+      print(f"[CACHE HIT] Question: {cache_key[:50]}...")
+      return AssistantResponse(**cached_result), None
+
+  semantic_cache = semantic_cache_for(payload)
+  if semantic_cache is None:
+    return None, None
+  question = payload.question or payload.normalized_question or ""
+  question_vec = await run_in_retrieval_executor(encode_question, question)
+  if question_vec is None:
+    return None, None
+  match = semantic_cache.lookup(question_vec, question)
+  if match is not None:
+    cached_result, cached_question, similarity = match
+    print(f"[SEMANTIC CACHE HIT] {question[:50]!r} ≈ {cached_question[:50]!r} ({similarity:.3f})")
+    return AssistantResponse(**cached_result), None
+  return None, question_vec
+
+
+def store_cached_response(
+  cache: Any,
+  cache_key: str,
+  response: AssistantResponse,
+  payload: Optional[AssistantRequest] = None,
+  question_vec: Optional[np.ndarray] = None,
+) -> None:
+  try:
+    # Convertir response en dict pour le cache (sans les jetons, propres à l'appel d'origine)
+    cache_value = response.model_dump(exclude={"usage"}) if hasattr(response, "model_dump") else response.dict(exclude={"usage"})
     if cache and cache_key:
-      try:
-        # Convertir response en dict pour le cache
-        cache_value = response.model_dump() if hasattr(response, "model_dump") else response.dict()
-        cache.set(cache_key, cache_value, ttl=3600)  # TTL de 1h
-      except Exception as e:
-        print(f"⚠️ Erreur lors de la sauvegarde dans le cache: {e}")
+      cache.set(cache_key, cache_value, ttl=3600)  # TTL de 1h
+    semantic_cache = semantic_cache_for(payload) if payload is not None else None
+    if semantic_cache is not None and question_vec is not None:
+      question = payload.question or payload.normalized_question or ""
+      semantic_cache.add(question_vec, question, cache_value, ttl=3600)
+  except Exception as e:
+    print(f"⚠️ Erreur lors de la sauvegarde dans le cache: {e}")
+
+
+def structured_response(payload: AssistantRequest) -> Optional[AssistantResponse]:
+  """Réponse tirée directement des données structurées si la question le permet (sans Claude)."""
+  if structured_engine is None:
+    return None
+  result = structured_engine.answer(
+    payload.question or payload.normalized_question,
+    has_history=bool(payload.conversation),
+  )
+  if result is None:
+    return None
+  print(f"[STRUCTURED] {result['kind']}: {(payload.question or '')[:50]!r}")
+  return AssistantResponse(
+    answer_html=result["answer_html"],
+    answer_text=result["answer_text"],
+    alignment=AlignmentPayload(status="success", label=result["label"], summary=result["summary"]),
+    sources=result["sources"],
+  )
+
+
+async def run_in_retrieval_executor(func, *args):
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(retrieval_executor, func, *args)
+
+
+@app.get("/stats")
+def stats_endpoint():
+  """Statistiques d'exploitation (caches)."""
+  return {
+    "cache": cache_stats(),
+    "semantic_cache": semantic_cache_stats(),
+    "single_flight": answer_flights.stats(),
+    "model_usage": model_usage_stats(),
+    "model_routes": {
+      "enabled": MODEL_ROUTING_ENABLED,
+      "models": {ROUTE_FAST: CLAUDE_FAST_MODEL, ROUTE_LARGE: CLAUDE_MODEL},
+      "routes": route_stats.stats(),
+    },
+    "segment_store": segment_store.stats() if segment_store is not None else None,
+    "query_memo": {
+      "embeddings": query_embedding_memo.stats(),
+      "bm25": bm25_query_memo.stats(),
+    },
+    "bm25": {
+      "engine": "numpy" if bm25_index is not None else ("whoosh" if whoosh_index else None),
+      **(bm25_index.stats() if bm25_index is not None else {}),
+    },
+    "search_fusion": {
+      "mode": SEARCH_FUSION if SEARCH_FUSION in FUSION_MODES else FUSION_LEGACY,
+      "lexicon_boost": lexicon_boost.stats() if lexicon_boost is not None else None,
+    },
+    "structured_answers": {
+      "enabled": structured_engine is not None,
+      **(structured_engine.stats() if structured_engine is not None else {}),
+    },
+  }
+
+
+@app.post("/search", response_model=SearchResponse)
+async def search_endpoint(payload: SearchRequest):
+  """
+  Recherche seule (sans Claude) : top-k segments compacts (identifiant stable, titre,
+  URL, score, extrait). L'extension n'a plus à télécharger ni classer tout le corpus.
+  """
+  started = time.perf_counter()
+  top_k = max(1, min(payload.top_k, SEARCH_MAX_TOP_K))
+  hits = await run_in_retrieval_executor(
+    search_corpus, payload.question, payload.normalized_question, top_k, payload.min_score
+  )
+  results = [
+    SearchHit(
+      id=meta.get("id"),
+      label=meta.get("label") or meta.get("source"),
+      url=meta.get("url"),
+      score=round(score, 4),
+      excerpt=(meta.get("content") or "")[:SEARCH_EXCERPT_CHARS],
+    )
+    for score, meta in hits
+  ]
+  return SearchResponse(results=results, took_ms=round((time.perf_counter() - started) * 1000, 2))
+
+
+@app.post("/rag-assistant", response_model=AssistantResponse)
+async def rag_assistant_endpoint(payload: AssistantRequest):
+  try:
+    # Contact / adresse connus : réponse immédiate, ni cache ni Claude
+    direct_response = structured_response(payload)
+    if direct_response is not None:
+      return direct_response
+
+    # Vérifier le cache avant de faire la recherche RAG
+    cache = answer_cache()
+    # Inclure la version dans la clé pour invalider automatiquement les anciennes réponses
+    cache_key = answer_cache_key(payload)
     
-    return response
+    cached_response, question_vec = await lookup_cached_response(payload, cache, cache_key)
+    if cached_response is not None:
+      return cached_response
+
+    async def generate() -> AssistantResponse:
+      prompt, rag_results, route = await run_in_retrieval_executor(prepare_assistant_prompt, payload)
+      result = await call_model_async(prompt, route)
+      response = build_assistant_response(payload, result, rag_results)
+
+      # Sauvegarder dans le cache (écriture Redis / SQLite hors de la boucle asyncio)
+      await asyncio.to_thread(store_cached_response, cache, cache_key, response, payload, question_vec)
+      return response
+
+    # Les requêtes identiques arrivées pendant la génération attendent celle-ci
+    return await answer_flights.do(cache_key, generate)
   except HTTPException:
     # Re-raise les HTTPException (déjà gérées)
     raise
@@ -1406,6 +2290,61 @@ def rag_assistant_endpoint(payload: AssistantRequest):
     )
 
 
+@app.post("/rag-assistant/stream")
+async def rag_assistant_stream_endpoint(payload: AssistantRequest):
+  """
+  Variante Server-Sent Events de /rag-assistant :
+  - event "token" : fragments de answer_html dès que Claude les émet,
+  - event "done"  : AssistantResponse complète (alignment, sources, follow_up_question),
+  - event "error" : détail de l'erreur si la génération échoue.
+  """
+  cache = answer_cache()
+  cache_key = answer_cache_key(payload)
+
+  async def event_stream():
+    try:
+      direct_response = structured_response(payload)
+      if direct_response is not None:
+        yield format_sse("token", {"text": direct_response.answer_html})
+        yield format_sse("done", direct_response.model_dump())
+        return
+
+      cached_response, question_vec = await lookup_cached_response(payload, cache, cache_key)
+      if cached_response is not None:
+        yield format_sse("token", {"text": cached_response.answer_html})
+        yield format_sse("done", cached_response.model_dump())
+        return
+
+      prompt, rag_results, route = await run_in_retrieval_executor(prepare_assistant_prompt, payload)
+      extractor = AnswerHtmlStreamExtractor()
+      raw_parts: List[str] = []
+      usage: Dict[str, Any] = {}
+      async for text in stream_model_text(prompt, usage, route):
+        raw_parts.append(text)
+        html_delta = extractor.feed(text)
+        if html_delta:
+          yield format_sse("token", {"text": html_delta})
+
+      result = parse_model_text("".join(raw_parts))
+      result["usage"] = usage or None
+      response = build_assistant_response(payload, result, rag_results)
+      await asyncio.to_thread(store_cached_response, cache, cache_key, response, payload, question_vec)
+      yield format_sse("done", response.model_dump())
+    except HTTPException as exc:
+      yield format_sse("error", {"status": exc.status_code, "detail": exc.detail})
+    except Exception as e:
+      import traceback
+      print(f"❌ Erreur dans rag_assistant_stream_endpoint: {e}")
+      print(f"Traceback: {traceback.format_exc()}")
+      yield format_sse("error", {"status": 500, "detail": f"Erreur serveur: {str(e)}"})
+
+  return StreamingResponse(
+    event_stream(),
+    media_type="text/event-stream",
+    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+  )
+
+
 if __name__ == "__main__":
   import os
   # Port depuis variable d'environnement (pour Railway/Render) ou 8711 par défaut
@@ -1420,7 +2359,7 @@ if __name__ == "__main__":
       ssl_keyfile=ssl_keyfile,
       ssl_certfile=ssl_certfile,
       timeout_keep_alive=30,
-      limit_concurrency=10
+      limit_concurrency=LIMIT_CONCURRENCY
     )
   else:
     uvicorn.run(
@@ -1428,5 +2367,5 @@ if __name__ == "__main__":
       host="0.0.0.0",
       port=port,
       timeout_keep_alive=30,
-      limit_concurrency=10
+      limit_concurrency=LIMIT_CONCURRENCY
     )
@@ -0,0 +1,255 @@
+"""
+Fusion des scores des moteurs de recherche (BM25, vecteurs) et du bonus lexical.
+
+Chaque moteur fournit un tableau d'indices de documents (position dans corpus_metadata)
+et un tableau de scores ; la fusion se fait sur ces tableaux NumPy :
+  - union des candidats dans l'ordre de première apparition (départage des ex æquo),
+  - transformation des scores selon le mode, puis somme pondérée (np.bincount),
+  - un seul np.argpartition pour les top_k, seuls ces k scores sont triés.
+
+Modes :
+  - "legacy" : somme brute pondérée (BM25 × 1.0 + cosinus × 0.6 + occurrences × 2.5),
+    classement identique à l'ancien dictionnaire de semantic_search ;
+  - "rrf" : Reciprocal Rank Fusion, Σ poids / (RRF_K + rang) ;
+  - "minmax" / "zscore" : scores de chaque moteur ramenés à [0, 1] ou centrés réduits.
+
+Les échelles sont différentes : les seuils calibrés sur les scores "legacy" (routage du
+modèle, bonus) ne s'appliquent pas tels quels aux autres modes.
+
+Le bonus lexical compte, pour chaque candidat, les termes administratifs du lexique
+présents dans son texte normalisé (sous-chaîne, comme `terme in texte`). La matrice
+creuse documents × termes est calculée au chargement (LexiconBoostMatrix) au lieu de
+reparcourir le texte de chaque candidat à chaque requête.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+  from .keyword_matcher import KeywordAutomaton
+except ImportError:
+  from keyword_matcher import KeywordAutomaton
+
+FUSION_LEGACY = "legacy"
+FUSION_RRF = "rrf"
+FUSION_MINMAX = "minmax"
+FUSION_ZSCORE = "zscore"
+FUSION_MODES = (FUSION_LEGACY, FUSION_RRF, FUSION_MINMAX, FUSION_ZSCORE)
+
+# Constante de lissage usuelle de la RRF (Cormack et al.)
+RRF_K = 60
+
+# Poids par moteur : scores bruts en "legacy", scores ramenés à une même échelle sinon
+FUSION_WEIGHTS: Dict[str, Dict[str, float]] = {
+  FUSION_LEGACY: {"bm25": 1.0, "vector": 0.6, "lexicon": 2.5},
+  FUSION_RRF: {"bm25": 1.0, "vector": 1.0, "lexicon": 0.5},
+  FUSION_MINMAX: {"bm25": 1.0, "vector": 1.0, "lexicon": 0.5},
+  FUSION_ZSCORE: {"bm25": 1.0, "vector": 1.0, "lexicon": 0.5},
+}
+
+
+class RetrieverRun(NamedTuple):
+  """Résultats d'un moteur : indices de documents, scores (même ordre) et poids."""
+
+  indices: np.ndarray
+  scores: np.ndarray
+  weight: float = 1.0
+  # Le bonus lexical s'applique aux documents de ce moteur (BM25 dans semantic_search)
+  lexicon_boost: bool = False
+
+
+class LexiconBoostMatrix:
+  """
+  Matrice creuse documents × termes, stockée par colonne (CSC) : pour chaque terme,
+  indices triés des documents dont le texte normalisé le contient.
+  """
+
+  def __init__(self, normalized_docs: Sequence[Optional[str]], terms: Iterable[str]):
+    self._term_ids: Dict[str, int] = {}
+    automaton = KeywordAutomaton()
+    for term in terms:
+      if term and term not in self._term_ids:
+        self._term_ids[term] = len(self._term_ids)
+        automaton.add(term, ("term", self._term_ids[term]))
+    automaton.build()
+
+    # Un passage de l'automate par document (au lieu d'un test par document et par terme)
+    columns: List[List[int]] = [[] for _ in self._term_ids]
+    for doc, text in enumerate(normalized_docs):
+      seen = set()
+      for _, (_, term_id) in automaton.iter_matches(text or ""):
+        if term_id not in seen:
+          seen.add(term_id)
+          columns[term_id].append(doc)
+    self.n_docs = len(normalized_docs)
+    self.indptr = np.zeros(len(columns) + 1, dtype=np.int64)
+    self.indptr[1:] = np.cumsum([len(column) for column in columns])
+    self.doc_indices = np.fromiter(
+      (doc for column in columns for doc in column), dtype=np.int64, count=int(self.indptr[-1])
+    )
+
+  @property
+  def n_terms(self) -> int:
+    return len(self._term_ids)
+
+  @property
+  def nnz(self) -> int:
+    return int(self.doc_indices.size)
+
+  def term_docs(self, term: str) -> Optional[np.ndarray]:
+    """Documents contenant le terme ; None si le terme n'a pas été indexé."""
+    term_id = self._term_ids.get(term)
+    if term_id is None:
+      return None
+    return self.doc_indices[self.indptr[term_id]:self.indptr[term_id + 1]]
+
+  def hits(
+    self,
+    doc_indices: np.ndarray,
+    terms: Sequence[str],
+    normalized_docs: Optional[Sequence[Optional[str]]] = None,
+  ) -> np.ndarray:
+    """
+    Nombre de termes (répétitions comprises, comme l'ancienne boucle) présents dans
+    chaque document. Un terme absent de la matrice est cherché dans normalized_docs.
+    """
+    postings: List[np.ndarray] = []
+    unknown: List[str] = []
+    for term in terms:
+      if not term:
+        continue
+      docs = self.term_docs(term)
+      if docs is not None:
+        postings.append(docs)
+      else:
+        unknown.append(term)
+    if postings:
+      # Somme des colonnes des termes de la requête (une ligne par document), puis lecture des candidats
+      counts = np.bincount(np.concatenate(postings), minlength=self.n_docs)[doc_indices]
+    else:
+      counts = np.zeros(len(doc_indices), dtype=np.int64)
+    for term in unknown:
+      if normalized_docs is not None:
+        counts += np.fromiter(
+          (term in (normalized_docs[doc] or "") for doc in doc_indices.tolist()),
+          dtype=np.int64,
+          count=len(doc_indices),
+        )
+    return counts
+
+  def stats(self) -> Dict[str, int]:
+    return {"docs": self.n_docs, "terms": self.n_terms, "nnz": self.nnz}
+
+
+def _transform(scores: np.ndarray, mode: str) -> np.ndarray:
+  """Scores d'un moteur ramenés à l'échelle du mode (ordre des tableaux conservé)."""
+  if mode == FUSION_RRF:
+    # Rang 1 pour le meilleur score ; ordre d'origine pour les ex æquo
+    order = np.argsort(-scores, kind="stable")
+    ranks = np.empty(scores.size, dtype=np.float64)
+    ranks[order] = np.arange(1, scores.size + 1)
+    return 1.0 / (RRF_K + ranks)
+  if mode == FUSION_MINMAX:
+    low, high = scores.min(), scores.max()
+    if high - low <= 0:
+      return np.ones(scores.size, dtype=np.float64)
+    return (scores - low) / (high - low)
+  if mode == FUSION_ZSCORE:
+    std = scores.std()
+    if std <= 0:
+      return np.zeros(scores.size, dtype=np.float64)
+    return (scores - scores.mean()) / std
+  return scores.astype(np.float64, copy=False)
+
+
+def _lexicon_bonus(
+  candidates: np.ndarray,
+  boosted: np.ndarray,
+  mode: str,
+  lexicon: Optional[LexiconBoostMatrix],
+  lexicon_terms: Sequence[str],
+  lexicon_weight: Optional[float],
+  normalized_docs: Optional[Sequence[Optional[str]]],
+) -> Optional[np.ndarray]:
+  """Bonus lexical par candidat (zéro hors des moteurs concernés) ; None si aucun."""
+  terms = [term for term in lexicon_terms if term]
+  if not terms or not boosted.any() or (lexicon is None and normalized_docs is None):
+    return None
+  slots = np.flatnonzero(boosted)
+  if lexicon is not None:
+    counts = lexicon.hits(candidates[slots], terms, normalized_docs)
+  else:
+    counts = np.fromiter(
+      (sum(1 for term in terms if term in (normalized_docs[doc] or "")) for doc in candidates[slots].tolist()),
+      dtype=np.int64,
+      count=slots.size,
+    )
+  if not counts.any():
+    return None
+  if mode == FUSION_RRF:
+    # Liste classée supplémentaire : seuls les documents contenant au moins un terme
+    keep = counts > 0
+    slots, counts = slots[keep], counts[keep]
+  weight = FUSION_WEIGHTS[mode]["lexicon"] if lexicon_weight is None else lexicon_weight
+  bonus = np.zeros(candidates.size, dtype=np.float64)
+  bonus[slots] = weight * _transform(counts.astype(np.float64), mode)
+  return bonus
+
+
+def fuse_scores(
+  runs: Sequence[RetrieverRun],
+  top_k: int,
+  mode: str = FUSION_LEGACY,
+  lexicon: Optional[LexiconBoostMatrix] = None,
+  lexicon_terms: Sequence[str] = (),
+  lexicon_weight: Optional[float] = None,
+  normalized_docs: Optional[Sequence[Optional[str]]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+  """
+  Indices des top_k documents et scores fusionnés, par score décroissant (ex æquo :
+  ordre de première apparition dans les moteurs).
+  """
+  if mode not in FUSION_MODES:
+    raise ValueError(f"Mode de fusion inconnu: {mode}")
+  runs = [run for run in runs if len(run.indices)]
+  if not runs or top_k <= 0:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+  all_indices = np.concatenate([np.asarray(run.indices, dtype=np.int64) for run in runs])
+  unique, first_seen = np.unique(all_indices, return_index=True)
+  appearance = np.argsort(first_seen, kind="stable")
+  candidates = unique[appearance]
+  # Position de chaque document dans `candidates`
+  slot_of_sorted = np.empty(unique.size, dtype=np.int64)
+  slot_of_sorted[appearance] = np.arange(unique.size)
+
+  run_slots = [slot_of_sorted[np.searchsorted(unique, np.asarray(run.indices, dtype=np.int64))] for run in runs]
+  boosted = np.zeros(candidates.size, dtype=bool)
+  for run, slots in zip(runs, run_slots):
+    if run.lexicon_boost:
+      boosted[slots] = True
+  bonus = _lexicon_bonus(candidates, boosted, mode, lexicon, lexicon_terms, lexicon_weight, normalized_docs)
+
+  fused = np.zeros(candidates.size, dtype=np.float64)
+  pending_bonus = bonus is not None
+  for run, slots in zip(runs, run_slots):
+    fused += np.bincount(slots, run.weight * _transform(np.asarray(run.scores, dtype=np.float64), mode), candidates.size)
+    # Bonus ajouté juste après le moteur concerné : mêmes additions flottantes que l'ancien code
+    if pending_bonus and run.lexicon_boost:
+      fused += bonus
+      pending_bonus = False
+
+  k = min(top_k, candidates.size)
+  if k < candidates.size:
+    # k-ième meilleur score ; parmi les ex æquo à la frontière, les premiers apparus
+    kth = fused[np.argpartition(-fused, k - 1)[k - 1]]
+    above = np.flatnonzero(fused > kth)
+    top = np.concatenate([above, np.flatnonzero(fused == kth)[: k - above.size]])
+  else:
+    top = np.arange(candidates.size)
+  # Tri des seuls k retenus : score décroissant puis ordre d'apparition
+  top = top[np.lexsort((top, -fused[top]))]
+  return candidates[top], fused[top]
@@ -0,0 +1,58 @@
+"""
+Magasin des segments du corpus, indexés par identifiant stable (corpus_artifacts.segment_id).
+
+Un client (extension, /search) peut référencer un segment par son identifiant au lieu de
+renvoyer contenu et extrait : le serveur reconstruit le segment depuis corpus_metadata
+(déjà en mémoire) et lit les colonnes précalculées au chargement (texte normalisé du
+segment, présence de données tarifaires) au lieu de les recalculer à chaque requête.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Sequence
+
+
+class SegmentStore:
+  """Position de chaque identifiant dans corpus_metadata + colonnes précalculées."""
+
+  def __init__(
+    self,
+    metadata: Sequence[Dict[str, Any]],
+    segment_ids: Sequence[str],
+    normalized: Sequence[str],
+    currency_flags: Sequence[bool],
+  ):
+    if not (len(metadata) == len(segment_ids) == len(normalized) == len(currency_flags)):
+      raise ValueError("Colonnes du magasin de segments de longueurs différentes")
+    self._metadata = metadata
+    self._normalized = list(normalized)
+    self._currency = list(currency_flags)
+    self._positions: Dict[str, int] = {}
+    for position, segment_id in enumerate(segment_ids):
+      # Copies identiques (même identifiant) : la première suffit
+      self._positions.setdefault(segment_id, position)
+
+  def __len__(self) -> int:
+    return len(self._metadata)
+
+  def position(self, segment_id: Optional[str]) -> Optional[int]:
+    if not segment_id:
+      return None
+    return self._positions.get(segment_id)
+
+  def metadata(self, position: int) -> Dict[str, Any]:
+    return self._metadata[position]
+
+  def normalized(self, position: int) -> str:
+    return self._normalized[position]
+
+  def has_currency(self, position: int) -> bool:
+    return self._currency[position]
+
+  def stats(self) -> Dict[str, int]:
+    return {
+      "segments": len(self._metadata),
+      "unique_ids": len(self._positions),
+      "currency_segments": sum(self._currency),
+    }
+
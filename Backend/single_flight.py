@@ -0,0 +1,53 @@
+"""
+Coalescence des requêtes identiques en vol ("single-flight").
+
+Quand plusieurs parents posent la même question en même temps, seule la première
+requête lance la génération ; les suivantes attendent son résultat au lieu d'appeler
+Claude à leur tour. La génération tourne dans une tâche indépendante : si le client
+qui l'a déclenchée se déconnecte, les autres reçoivent quand même la réponse.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+  """Une seule exécution de `func` par clé à un instant donné (boucle asyncio unique)."""
+
+  def __init__(self):
+    self._calls: Dict[str, asyncio.Task] = {}
+    self.leaders = 0
+    self.coalesced = 0
+
+  def in_flight(self, key: str) -> bool:
+    return key in self._calls
+
+  async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+    task = self._calls.get(key)
+    if task is None:
+      self.leaders += 1
+      task = asyncio.ensure_future(func())
+      self._calls[key] = task
+      task.add_done_callback(lambda done, key=key: self._finish(key, done))
+    else:
+      self.coalesced += 1
+    # shield : l'annulation d'un appelant n'annule pas la génération partagée
+    return await asyncio.shield(task)
+
+  def _finish(self, key: str, task: asyncio.Task) -> None:
+    if self._calls.get(key) is task:
+      del self._calls[key]
+    if not task.cancelled():
+      # Marque l'exception comme récupérée si tous les appelants sont partis
+      task.exception()
+
+  def stats(self) -> Dict[str, Any]:
+    total = self.leaders + self.coalesced
+    return {
+      "in_flight": len(self._calls),
+      "leaders": self.leaders,
+      "coalesced": self.coalesced,
+      "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,125 @@
+"""
+Extraction au fil de l'eau de "answer_html" dans le JSON que Claude génère en streaming.
+
+Les fragments reçus coupent le texte n'importe où : au milieu de la clé, d'un échappement
+"\\n" ou d'une séquence "\\uXXXX". Les caractères hors du plan de base (emoji…) arrivent en
+paire de substituts "\\uD83D\\uDE00", à recombiner avant d'émettre le texte : un substitut
+isolé ne s'encode pas en UTF-8.
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+REPLACEMENT_CHAR = "\ufffd"
+
+
+def _hex4(text: str) -> Optional[int]:
+  if len(text) != 4:
+    return None
+  try:
+    return int(text, 16)
+  except ValueError:
+    return None
+
+
+class AnswerHtmlStreamExtractor:
+  """
+  Extrait au fil de l'eau la valeur de "answer_html" dans le JSON généré par Claude.
+  feed() reçoit les fragments de texte bruts et renvoie la portion décodée
+  de answer_html disponible (chaîne vide tant que le champ n'a pas commencé).
+  """
+
+  KEY = '"answer_html"'
+  ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+  def __init__(self):
+    self._buffer = ""
+    self._state = "key"  # key → colon → value → done
+    self._pending_escape = ""
+
+  @property
+  def done(self) -> bool:
+    return self._state == "done"
+
+  def feed(self, chunk: str) -> str:
+    if self._state == "done" or not chunk:
+      return ""
+    self._buffer += chunk
+    if self._state == "key":
+      key_pos = self._buffer.find(self.KEY)
+      if key_pos == -1:
+        # Garder la fin du tampon au cas où la clé serait coupée entre deux fragments
+        self._buffer = self._buffer[-len(self.KEY):]
+        return ""
+      self._buffer = self._buffer[key_pos + len(self.KEY):]
+      self._state = "colon"
+    if self._state == "colon":
+      stripped = self._buffer.lstrip()
+      if stripped.startswith(":"):
+        stripped = stripped[1:].lstrip()
+      if not stripped:
+        self._buffer = ""
+        return ""
+      if stripped[0] != '"':
+        # Valeur inattendue (null, nombre…) : on laisse le parseur final s'en charger
+        self._state = "done"
+        return ""
+      self._buffer = stripped[1:]
+      self._state = "value"
+    return self._decode()
+
+  def _decode_unicode(self, text: str, i: int) -> Optional[Tuple[str, int]]:
+    """
+    Séquence "\\uXXXX" en position i : (caractère, longueur consommée), ou None si la
+    suite n'est pas encore arrivée. Une paire de substituts donne un seul caractère ;
+    un substitut isolé devient U+FFFD.
+    """
+    if i + 6 > len(text):
+      return None
+    code = _hex4(text[i + 2 : i + 6])
+    if code is None:
+      return text[i : i + 6], 6
+    if 0xDC00 <= code <= 0xDFFF:
+      return REPLACEMENT_CHAR, 6
+    if not 0xD800 <= code <= 0xDBFF:
+      return chr(code), 6
+    # Substitut haut : attendre le "\\uXXXX" bas qui le suit normalement
+    following = text[i + 6 : i + 12]
+    if len(following) < 6 and "\\u".startswith(following[:2]):
+      return None
+    low = _hex4(following[2:]) if following.startswith("\\u") else None
+    if low is None or not 0xDC00 <= low <= 0xDFFF:
+      return REPLACEMENT_CHAR, 6
+    return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+
+  def _decode(self) -> str:
+    out: List[str] = []
+    text = self._pending_escape + self._buffer
+    self._pending_escape = ""
+    self._buffer = ""
+    i = 0
+    while i < len(text):
+      char = text[i]
+      if char == '"':
+        self._state = "done"
+        break
+      if char != "\\":
+        out.append(char)
+        i += 1
+        continue
+      if i + 1 >= len(text):
+        self._pending_escape = text[i:]
+        break
+      marker = text[i + 1]
+      if marker == "u":
+        decoded = self._decode_unicode(text, i)
+        if decoded is None:
+          self._pending_escape = text[i:]
+          break
+        out.append(decoded[0])
+        i += decoded[1]
+        continue
+      out.append(self.ESCAPES.get(marker, marker))
+      i += 2
+    return "".join(out)
@@ -0,0 +1,199 @@
+"""
+Réponses déterministes à partir des données structurées (sans appel à Claude).
+
+Les questions du type « contact du RPE Babillages », « adresse de l'Espace Dewailly » ou
+« où se trouve l'école Jules Verne » se répondent mot pour mot depuis rpe_contacts.json,
+lieux_importants.json et ecoles_amiens.json. Le moteur ne répond que si la correspondance
+est sûre : question courte et sans historique, une demande de contact / d'adresse, et
+exactement une fiche désignée qui contient l'information demandée, sans autre demande ni
+négation dans la question. Sinon il renvoie None et la requête suit le chemin RAG.
+
+Les tarifs (tarifs_2024_2025.json) ne sont pas couverts : les montants extraits du PDF
+sont découpés ("9 4,05 €"), on ne peut pas les citer tels quels sans risque d'erreur.
+"""
+
+from __future__ import annotations
+
+import html
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+  from .place_index import PLACE_ECOLE, PLACE_LIEU, PLACE_RPE, PLACE_SECTEUR, PlaceIndex
+  from .text_normalize import normalize_text
+except ImportError:
+  from place_index import PLACE_ECOLE, PLACE_LIEU, PLACE_RPE, PLACE_SECTEUR, PlaceIndex
+  from text_normalize import normalize_text
+
+# Au-delà, la question porte probablement sur autre chose qu'une simple fiche
+MAX_QUESTION_TOKENS = 16
+
+CONTACT_TERMS = ("contact", "contacter", "joindre", "appeler", "telephone", "tel", "numero", "mail", "email", "courriel", "coordonnees")
+ADDRESS_TERMS = ("adresse", "ou se trouve", "ou est", "ou se situe", "situe", "localisation", "aller a", "acceder")
+RPE_TERMS = ("rpe", "relais petite enfance", "relais")
+# Secteurs faits uniquement de ces mots ("Centre", "Nord", "Sud-Est"…) : trop génériques
+# ("relais du centre de loisirs"), retenus seulement après le mot "secteur"
+GENERIC_SECTOR_WORDS = frozenset(("centre", "ville", "nord", "sud", "est", "ouest"))
+SCHOOL_TERMS = ("ecole", "college", "lycee", "maternelle")
+# Autre demande dans la même question ("…, et quels documents ?") : la fiche n'y répond pas
+OTHER_INTENT_TERMS = (
+  "et quel", "et quels", "et quelle", "et quelles", "et comment", "et combien", "et quand",
+  "document", "documents", "piece", "pieces", "justificatif", "justificatifs", "dossier",
+  "demarche", "demarches", "procedure", "inscrire", "inscription", "inscriptions",
+)
+# Négation / exclusion ("un autre relais que…") : la fiche désignée est justement à écarter
+NEGATION_TERMS = ("pas", "sauf", "hormis", "excepte", "autre", "autres", "plutot que")
+
+
+def _padded(text: str) -> str:
+  return f" {text} "
+
+
+def _mentions(padded_question: str, terms: Sequence[str]) -> bool:
+  return any(_padded(term) in padded_question for term in terms)
+
+
+def _sector_named(padded_question: str, sector_key: str) -> bool:
+  """Un nom de quartier suffit ; un secteur générique doit suivre le mot "secteur"."""
+  if not set(sector_key.split()) <= GENERIC_SECTOR_WORDS:
+    return True
+  return f" secteur {sector_key} " in padded_question
+
+
+class StructuredAnswerEngine:
+  """Gabarits de réponse sur les fiches de l'index des lieux (RPE, lieux, écoles)."""
+
+  def __init__(self, places: PlaceIndex):
+    self._places = places
+    self._lock = threading.Lock()
+    self.requests = 0
+    self.answered: Dict[str, int] = {}
+
+  def answer(self, question: Optional[str], has_history: bool = False) -> Optional[Dict[str, Any]]:
+    """Réponse (answer_html, answer_text, label, summary, sources, kind) ou None."""
+    with self._lock:
+      self.requests += 1
+    result = None if has_history else self._answer(normalize_text(question))
+    if result is not None:
+      with self._lock:
+        self.answered[result["kind"]] = self.answered.get(result["kind"], 0) + 1
+    return result
+
+  def _answer(self, normalized: str) -> Optional[Dict[str, Any]]:
+    if not normalized or len(normalized.split()) > MAX_QUESTION_TOKENS:
+      return None
+    padded = _padded(normalized)
+    wants_contact = _mentions(padded, CONTACT_TERMS)
+    wants_address = _mentions(padded, ADDRESS_TERMS)
+    if not (wants_contact or wants_address):
+      return None
+    if _mentions(padded, OTHER_INTENT_TERMS) or _mentions(padded, NEGATION_TERMS):
+      return None
+    keys = self._places.find_keys(normalized)
+    return (
+      self._answer_rpe(padded, keys, wants_contact, wants_address)
+      or self._answer_lieu(keys, wants_contact, wants_address)
+      or self._answer_school(padded, keys, wants_contact, wants_address)
+    )
+
+  def _records(self, kind: str, keys: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    unique: Dict[int, Dict[str, Any]] = {}
+    for key in keys.get(kind, []):
+      for record in self._places.lookup(kind, key):
+        unique.setdefault(id(record), record)
+    return list(unique.values())
+
+  def _answer_rpe(
+    self,
+    padded: str,
+    keys: Dict[str, List[str]],
+    wants_contact: bool,
+    wants_address: bool,
+  ) -> Optional[Dict[str, Any]]:
+    matches = self._records(PLACE_RPE, keys)
+    if not matches and _mentions(padded, RPE_TERMS):
+      sectors = [key for key in keys.get(PLACE_SECTEUR, []) if _sector_named(padded, key)]
+      matches = self._records(PLACE_SECTEUR, {PLACE_SECTEUR: sectors})
+    if len(matches) != 1:
+      return None
+    rpe = matches[0]
+    name = html.escape(rpe["nom"])
+    items = [f"<li>Adresse : {html.escape(rpe['adresse'])}</li>"]
+    if wants_contact or not wants_address:
+      items.append(f"<li>Téléphone : {html.escape(rpe['telephone'])}</li>")
+      items.append(f"<li>Email : <a href=\"mailto:{html.escape(rpe['email'])}\">{html.escape(rpe['email'])}</a></li>")
+    sectors = ", ".join(rpe.get("secteurs", []))
+    answer_html = (
+      f"<p><strong>{name}</strong> (secteurs : {html.escape(sectors)})</p>"
+      f"<ul>{''.join(items)}</ul>"
+      f"<p><a href=\"{html.escape(rpe['url'])}\">Page du relais</a></p>"
+    )
+    answer_text = f"{rpe['nom']} — {rpe['adresse']} — Tél. {rpe['telephone']} — {rpe['email']}"
+    return {
+      "kind": "rpe",
+      "answer_html": answer_html,
+      "answer_text": answer_text,
+      "label": "Relais Petite Enfance",
+      "summary": f"Coordonnées de {rpe['nom']} (rpe_contacts.json).",
+      "sources": [{"title": rpe["nom"], "url": rpe.get("url")}],
+    }
+
+  def _answer_lieu(
+    self,
+    keys: Dict[str, List[str]],
+    wants_contact: bool,
+    wants_address: bool,
+  ) -> Optional[Dict[str, Any]]:
+    # Fiches sans téléphone ni email : seules les questions d'adresse y trouvent leur réponse
+    if not wants_address or wants_contact:
+      return None
+    matches = self._records(PLACE_LIEU, keys)
+    if len(matches) != 1 or not matches[0].get("adresse"):
+      return None
+    lieu = matches[0]
+    description = f" — {html.escape(lieu['description'])}" if lieu.get("description") else ""
+    answer_html = f"<p><strong>{html.escape(lieu['nom'])}</strong> : {html.escape(lieu['adresse'])}{description}</p>"
+    if lieu.get("url"):
+      answer_html += f"<p><a href=\"{html.escape(lieu['url'])}\">En savoir plus</a></p>"
+    return {
+      "kind": "lieu",
+      "answer_html": answer_html,
+      "answer_text": f"{lieu['nom']} : {lieu['adresse']}",
+      "label": "Lieux et adresses",
+      "summary": f"Adresse de {lieu['nom']} (lieux_importants.json).",
+      "sources": [{"title": lieu["nom"], "url": lieu.get("url")}],
+    }
+
+  def _answer_school(
+    self,
+    padded: str,
+    keys: Dict[str, List[str]],
+    wants_contact: bool,
+    wants_address: bool,
+  ) -> Optional[Dict[str, Any]]:
+    if not wants_address or wants_contact:
+      return None
+    if not _mentions(padded, SCHOOL_TERMS) or len(keys.get(PLACE_ECOLE, [])) != 1:
+      return None
+    key = keys[PLACE_ECOLE][0]
+    if not self._places.unique_address(PLACE_ECOLE, key):
+      return None
+    school = self._places.lookup(PLACE_ECOLE, key)[0]
+    return {
+      "kind": "ecole",
+      "answer_html": f"<p><strong>{html.escape(school['nom'])}</strong> : {html.escape(school['adresse'])}</p>",
+      "answer_text": f"{school['nom']} : {school['adresse']}",
+      "label": "Écoles d'Amiens",
+      "summary": f"Adresse de {school['nom']} (ecoles_amiens.json).",
+      "sources": [{"title": school["nom"], "url": None}],
+    }
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      answered = sum(self.answered.values())
+      return {
+        "requests": self.requests,
+        "answered": answered,
+        "absorbed_fraction": round(answered / self.requests, 4) if self.requests else 0.0,
+        "by_kind": dict(self.answered),
+      }
@@ -0,0 +1,121 @@
+"""
+Normalisation de texte partagée par le serveur RAG, le pipeline hors ligne et les outils.
+
+Le même texte normalisé sert aux correspondances lexique / mots-clés côté serveur et
+aux colonnes précalculées du corpus (ML/embed_corpus.py) : les deux côtés doivent
+utiliser exactement cette fonction, sinon les colonnes ne correspondent plus.
+
+Implémentation : str.lower() sur la chaîne (le sigma final dépend du contexte), puis une
+table de traduction par caractère (accents retirés, chiffres "leet" remplacés, caractères
+non admis changés en espace), remplie à la demande et mise en cache, puis une seule
+regex compilée pour réduire les répétitions (3+ → 2).
+La sortie est identique, octet pour octet, à l'ancienne boucle caractère par caractère.
+"""
+
+from __future__ import annotations
+
+import re
+import string
+import unicodedata
+from typing import Callable, Iterable, List, Optional
+
+# Incrémenter si la sortie de normalize_text() change : invalide les colonnes précalculées
+NORMALIZE_VERSION = 1
+
+LEET_DIGITS = {
+  "0": "o",
+  "1": "i",
+  "2": "z",
+  "3": "e",
+  "4": "a",
+  "5": "s",
+  "6": "g",
+  "7": "t",
+  "8": "b",
+  "9": "g",
+}
+
+_REPEAT_RE = re.compile(r"(.)\1{2,}", re.DOTALL)
+
+
+def _strip_accents(text: str) -> str:
+  normalized = unicodedata.normalize("NFKD", text)
+  return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+def _is_ascii_word_char(char: str) -> bool:
+  return char in string.ascii_lowercase or char.isdigit() or char.isspace()
+
+
+def _is_alnum_char(char: str) -> bool:
+  return char.isalnum() or char.isspace()
+
+
+class _NormalizeTable(dict):
+  """
+  Table pour str.translate : code point (texte déjà en minuscules) → texte normalisé.
+
+  Les marques combinantes sont toutes retirées, donc normaliser caractère par
+  caractère donne le même flux que NFKD sur la chaîne entière. Les entrées sont
+  calculées au premier usage (__missing__) ; l'ASCII est prérempli.
+  """
+
+  def __init__(self, keep: Callable[[str], bool]):
+    super().__init__()
+    self._keep = keep
+    for code in range(128):
+      self[code] = self._map(chr(code))
+
+  def _map(self, char: str) -> str:
+    mapped = []
+    for part in _strip_accents(char):
+      part = LEET_DIGITS.get(part, part)
+      mapped.append(part if self._keep(part) else " ")
+    return "".join(mapped)
+
+  def __missing__(self, code: int) -> str:
+    value = self._map(chr(code))
+    self[code] = value
+    return value
+
+
+_ASCII_TABLE = _NormalizeTable(_is_ascii_word_char)
+_ALNUM_TABLE = _NormalizeTable(_is_alnum_char)
+
+
+def _normalize_with(text: Optional[str], table: _NormalizeTable) -> str:
+  if not text:
+    return ""
+  translated = text.lower().translate(table)
+  return " ".join(_REPEAT_RE.sub(r"\1\1", translated).split())
+
+
+def normalize_text(text: Optional[str]) -> str:
+  """Minuscules, sans accents, chiffres "leet" remplacés, tout sauf [a-z], chiffres et espaces → espace."""
+  return _normalize_with(text, _ASCII_TABLE)
+
+
+def normalize_text_alnum(text: Optional[str]) -> str:
+  """Variante de normalize_text qui conserve les lettres non ASCII (str.isalnum)."""
+  return _normalize_with(text, _ALNUM_TABLE)
+
+
+def normalize_many(texts: Iterable[Optional[str]]) -> List[str]:
+  """normalize_text sur une liste de textes (colonnes du corpus, lots de segments)."""
+  table = _ASCII_TABLE
+  repeat_sub = _REPEAT_RE.sub
+  return [" ".join(repeat_sub(r"\1\1", text.lower().translate(table)).split()) if text else "" for text in texts]
+
+
+def token_set(normalized: str) -> List[str]:
+  """Mots distincts (triés) d'un texte déjà normalisé."""
+  return sorted(set(normalized.split()))
+
+
+def fold_case_space(text: Optional[str]) -> str:
+  """
+  Minuscules et espaces réduits, sans autre transformation : clé de mémo pour ce qui
+  dépend des chiffres et des accents ("quotient 6" ≠ "quotient 9", contrairement à
+  normalize_text qui les ramène tous deux à "quotient g").
+  """
+  return " ".join((text or "").lower().split())
@@ -0,0 +1,271 @@
+"""
+Index vectoriels pour la recherche sémantique (semantic_search).
+
+- ExactIndex : force brute (produit scalaire complet) + argpartition, référence de qualité.
+- IVFIndex   : index approximatif "inverted file" en NumPy pur. Les vecteurs sont répartis
+  en n_lists listes par k-means sphérique (hors ligne, ML/embed_corpus.py) ; une requête
+  ne parcourt que les nprobe listes dont le centroïde est le plus proche.
+
+Le rappel@k de l'IVF par rapport à la force brute est mesuré par evaluate_ivf() pour
+choisir nprobe (compromis vitesse / qualité).
+"""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+IVF_FORMAT_VERSION = 1
+# Nombre de lignes converties à la fois lors de l'affectation k-means
+ASSIGN_CHUNK_ROWS = 8192
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+  """Indices des k meilleurs scores, triés par score décroissant (argpartition + tri partiel)."""
+  count = scores.shape[0]
+  if count == 0 or k <= 0:
+    return np.empty(0, dtype=np.int64)
+  if k >= count:
+    return np.argsort(-scores, kind="stable")
+  candidates = np.argpartition(-scores, k - 1)[:k]
+  return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def ivf_index_path(embeddings_path: Path) -> Path:
+  embeddings_path = Path(embeddings_path)
+  return embeddings_path.with_name(embeddings_path.stem + ".ivf.npz")
+
+
+class ExactIndex:
+  """Recherche exacte sur tout le magasin d'embeddings."""
+
+  name = "exact"
+
+  def __init__(self, store):
+    self.store = store
+
+  def search(self, query_vec: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    scores = self.store.dot(query_vec)
+    best = top_k(scores, k)
+    return best, scores[best]
+
+  def describe(self) -> str:
+    return f"exact ({len(self.store)} vecteurs)"
+
+
+class IVFIndex:
+  """Index IVF : centroïdes + listes inversées (ids triés par liste, offsets CSR)."""
+
+  name = "ivf"
+
+  def __init__(
+    self,
+    store,
+    centroids: np.ndarray,
+    list_offsets: np.ndarray,
+    list_ids: np.ndarray,
+    nprobe: int = 8,
+    corpus_hash: Optional[str] = None,
+  ):
+    self.store = store
+    self.centroids = np.asarray(centroids, dtype=np.float32)
+    self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+    self.list_ids = np.asarray(list_ids, dtype=np.int64)
+    self.nprobe = max(1, int(nprobe))
+    self.corpus_hash = corpus_hash
+
+  @property
+  def n_lists(self) -> int:
+    return int(self.centroids.shape[0])
+
+  def candidates(self, query_vec: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+    probe = min(nprobe or self.nprobe, self.n_lists)
+    centroid_scores = self.centroids @ np.asarray(query_vec, dtype=np.float32)
+    lists = top_k(centroid_scores, probe)
+    parts = [self.list_ids[self.list_offsets[i] : self.list_offsets[i + 1]] for i in lists]
+    if not parts:
+      return np.empty(0, dtype=np.int64)
+    return np.concatenate(parts)
+
+  def search(
+    self,
+    query_vec: np.ndarray,
+    k: int,
+    nprobe: Optional[int] = None,
+  ) -> Tuple[np.ndarray, np.ndarray]:
+    candidate_ids = self.candidates(query_vec, nprobe)
+    if candidate_ids.size == 0:
+      return candidate_ids, np.empty(0, dtype=np.float32)
+    scores = self.store.rows(candidate_ids) @ np.asarray(query_vec, dtype=np.float32)
+    best = top_k(scores, k)
+    return candidate_ids[best], scores[best]
+
+  def describe(self) -> str:
+    return f"ivf ({len(self.store)} vecteurs, {self.n_lists} listes, nprobe={self.nprobe})"
+
+  def save(self, path: Path) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+      path,
+      format_version=np.array(IVF_FORMAT_VERSION),
+      centroids=self.centroids,
+      list_offsets=self.list_offsets,
+      list_ids=self.list_ids,
+      corpus_hash=np.array(self.corpus_hash or ""),
+    )
+
+  @classmethod
+  def load(cls, path: Path, store, nprobe: int = 8) -> "IVFIndex":
+    with np.load(Path(path)) as data:
+      version = int(data["format_version"])
+      if version != IVF_FORMAT_VERSION:
+        raise ValueError(f"Version d'index IVF non supportée: {version}")
+      corpus_hash = str(data["corpus_hash"]) or None
+      index = cls(
+        store,
+        centroids=data["centroids"],
+        list_offsets=data["list_offsets"],
+        list_ids=data["list_ids"],
+        nprobe=nprobe,
+        corpus_hash=corpus_hash,
+      )
+    if int(index.list_offsets[-1]) != len(store):
+      raise ValueError(f"Index IVF construit pour {int(index.list_offsets[-1])} vecteurs, magasin: {len(store)}")
+    return index
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+  norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+  return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+  assignments = np.empty(vectors.shape[0], dtype=np.int64)
+  for start in range(0, vectors.shape[0], ASSIGN_CHUNK_ROWS):
+    end = min(start + ASSIGN_CHUNK_ROWS, vectors.shape[0])
+    assignments[start:end] = np.argmax(vectors[start:end] @ centroids.T, axis=1)
+  return assignments
+
+
+def train_ivf(
+  store,
+  n_lists: int,
+  iterations: int = 20,
+  seed: int = 0,
+  nprobe: int = 8,
+  corpus_hash: Optional[str] = None,
+) -> IVFIndex:
+  """K-means sphérique (similarité cosinus) puis construction des listes inversées."""
+  vectors = store.rows(np.arange(len(store)))
+  count = vectors.shape[0]
+  n_lists = max(1, min(int(n_lists), count))
+  rng = np.random.default_rng(seed)
+  centroids = vectors[rng.choice(count, size=n_lists, replace=False)].copy()
+
+  assignments = _assign(vectors, centroids)
+  for _ in range(iterations):
+    sums = np.zeros_like(centroids)
+    np.add.at(sums, assignments, vectors)
+    sizes = np.bincount(assignments, minlength=n_lists)
+    empty = np.flatnonzero(sizes == 0)
+    if empty.size:
+      # Listes vides : réamorcées sur des vecteurs tirés au hasard
+      sums[empty] = vectors[rng.choice(count, size=empty.size, replace=False)]
+    centroids = _normalize_rows(sums).astype(np.float32)
+    new_assignments = _assign(vectors, centroids)
+    if np.array_equal(new_assignments, assignments):
+      break
+    assignments = new_assignments
+
+  order = np.argsort(assignments, kind="stable")
+  sizes = np.bincount(assignments, minlength=n_lists)
+  list_offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+  return IVFIndex(store, centroids, list_offsets, order.astype(np.int64), nprobe=nprobe, corpus_hash=corpus_hash)
+
+
+def recall_at_k(
+  index: IVFIndex,
+  reference: ExactIndex,
+  queries: np.ndarray,
+  k: int,
+  nprobe: Optional[int] = None,
+) -> float:
+  """
+  Proportion moyenne des k voisins exacts retrouvés par l'index approximatif.
+  Un résultat compte s'il atteint le score du k-ième voisin exact : le corpus contient
+  beaucoup de segments dupliqués, dont l'ordre entre ex æquo est arbitraire.
+  """
+  if len(queries) == 0:
+    return 0.0
+  total = 0.0
+  for query in queries:
+    expected, expected_scores = reference.search(query, k)
+    if not expected.size:
+      continue
+    _, found_scores = index.search(query, k, nprobe=nprobe)
+    threshold = float(expected_scores[-1]) - 1e-6
+    total += min(int(np.count_nonzero(found_scores >= threshold)), expected.size) / expected.size
+  return total / len(queries)
+
+
+def evaluate_ivf(
+  index: IVFIndex,
+  queries: np.ndarray,
+  k: int = 10,
+  nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32),
+) -> List[Dict[str, Any]]:
+  """Rappel@k et latence moyenne par valeur de nprobe, comparés à la force brute."""
+  reference = ExactIndex(index.store)
+  started = time.perf_counter()
+  for query in queries:
+    reference.search(query, k)
+  exact_ms = (time.perf_counter() - started) * 1000 / max(len(queries), 1)
+
+  report: List[Dict[str, Any]] = []
+  for nprobe in sorted({min(p, index.n_lists) for p in nprobes}):
+    started = time.perf_counter()
+    for query in queries:
+      index.search(query, k, nprobe=nprobe)
+    ivf_ms = (time.perf_counter() - started) * 1000 / max(len(queries), 1)
+    report.append(
+      {
+        "nprobe": nprobe,
+        f"recall@{k}": round(recall_at_k(index, reference, queries, k, nprobe=nprobe), 4),
+        "ivf_ms": round(ivf_ms, 3),
+        "exact_ms": round(exact_ms, 3),
+      }
+    )
+  return report
+
+
+def load_vector_index(
+  kind: str,
+  store,
+  embeddings_path: Path,
+  nprobe: int = 8,
+  corpus_hash: Optional[str] = None,
+):
+  """
+  Retourne l'index demandé ("exact" ou "ivf"). L'IVF retombe sur la force brute
+  s'il est absent, illisible ou construit pour un autre corpus.
+  """
+  if kind == "ivf":
+    path = ivf_index_path(embeddings_path)
+    if not path.exists():
+      print(f"⚠️ Index IVF introuvable ({path}) : recherche exacte utilisée.")
+      return ExactIndex(store)
+    try:
+      index = IVFIndex.load(path, store, nprobe=nprobe)
+    except (ValueError, OSError, KeyError) as exc:
+      # Fichier périmé (autre nombre de vecteurs, autre version) ou illisible
+      print(f"⚠️ Index IVF inutilisable ({exc}) : recherche exacte utilisée.")
+      return ExactIndex(store)
+    if corpus_hash and index.corpus_hash and index.corpus_hash != corpus_hash:
+      print("⚠️ Index IVF construit pour un autre corpus : recherche exacte utilisée.")
+      return ExactIndex(store)
+    return index
+  return ExactIndex(store)
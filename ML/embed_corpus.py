@@ -1,11 +1,29 @@
 import json
 import os
+import sys
 from pathlib import Path
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
 BASE_DIR = Path(__file__).resolve().parent
+# Modules partagés avec le serveur (format des artefacts)
+sys.path.insert(0, str(BASE_DIR.parent / "Backend"))
+
+from corpus_artifacts import (
+  SUPPORTED_DTYPES,
+  WHOOSH_AVAILABLE,
+  build_normalized_columns,
+  build_whoosh_index,
+  compute_corpus_hash,
+  describe_store,
+  load_embedding_store,
+  normalized_columns_path,
+  save_embedding_store,
+  save_normalized_columns,
+  whoosh_index_dir,
+)
+from vector_index import evaluate_ivf, ivf_index_path, train_ivf
 
 # Chemins avec support corpus généralisé
 CORPUS_GENERALIZED_PATH = BASE_DIR / "data" / "corpus_metadata_generalized.json"
@@ -16,6 +34,7 @@ EMBEDDINGS_GENERALIZED_PATH = BASE_DIR / "data" / "corpus_embeddings_generalized
 EMBEDDINGS_PATH = BASE_DIR / "data" / "corpus_embeddings.npy"
 METADATA_PATH = BASE_DIR / "data" / "corpus_metadata.json"
 METADATA_GENERALIZED_PATH = BASE_DIR / "data" / "corpus_metadata_generalized.json"
+QUESTIONS_PATH = BASE_DIR.parent / "Backend" / "I-AMIENS" / "data" / "questions_usager.json"
 
 
 def load_corpus(use_generalized: bool = True):
@@ -50,25 +69,85 @@ def load_corpus(use_generalized: bool = True):
   raise SystemExit(f"Corpus introuvable. Cherché dans:\n- {CORPUS_GENERALIZED_PATH}\n- {CORPUS_SEGMENTS_PATH}\n- {CORPUS_METADATA_PATH}")
 
 
-def save_embeddings(embeddings: np.ndarray, metadata, use_generalized: bool = True):
+def save_embeddings(
+  embeddings: np.ndarray,
+  metadata,
+  use_generalized: bool = True,
+  model_name: str = "",
+  dtype: str = "float16",
+):
   """
-  Sauvegarde les embeddings et métadonnées.
+  Sauvegarde les embeddings (magasin versionné + en-tête) et métadonnées.
   Utilise les chemins généralisés si use_generalized=True et corpus généralisé détecté.
   """
   if use_generalized and CORPUS_GENERALIZED_PATH.exists():
-    # Sauvegarder dans fichiers généralisés
-    np.save(EMBEDDINGS_GENERALIZED_PATH, embeddings)
-    with METADATA_GENERALIZED_PATH.open("w", encoding="utf-8") as f:
-      json.dump(metadata, f, ensure_ascii=False, indent=2)
-    print(f"✅ Embeddings généralisés sauvegardés dans {EMBEDDINGS_GENERALIZED_PATH}")
-    print(f"✅ Métadonnées généralisées sauvegardées dans {METADATA_GENERALIZED_PATH}")
+    embeddings_path = EMBEDDINGS_GENERALIZED_PATH
+    metadata_path = METADATA_GENERALIZED_PATH
+    kind = "généralisé"
   else:
-    # Sauvegarder dans fichiers standards
-    np.save(EMBEDDINGS_PATH, embeddings)
-    with METADATA_PATH.open("w", encoding="utf-8") as f:
-      json.dump(metadata, f, ensure_ascii=False, indent=2)
-    print(f"✅ Embeddings sauvegardés dans {EMBEDDINGS_PATH}")
-    print(f"✅ Métadonnées sauvegardées dans {METADATA_PATH}")
+    embeddings_path = EMBEDDINGS_PATH
+    metadata_path = METADATA_PATH
+    kind = "standard"
+
+  corpus_hash = compute_corpus_hash(metadata)
+  save_embedding_store(
+    embeddings_path,
+    embeddings,
+    model_name=model_name,
+    corpus_hash=corpus_hash,
+    dtype=dtype,
+  )
+  with metadata_path.open("w", encoding="utf-8") as f:
+    json.dump(metadata, f, ensure_ascii=False, indent=2)
+  store = load_embedding_store(embeddings_path)
+  print(f"✅ Embeddings ({kind}, {describe_store(store)}) sauvegardés dans {embeddings_path}")
+  print(f"✅ Métadonnées sauvegardées dans {metadata_path}")
+
+  # Texte normalisé + mots de chaque segment : évite _normalize sur le corpus à chaque requête
+  columns_path = normalized_columns_path(metadata_path)
+  save_normalized_columns(columns_path, build_normalized_columns(metadata, corpus_hash))
+  print(f"✅ Colonnes normalisées sauvegardées dans {columns_path}")
+
+  # Index BM25 persistant, ouvert en lecture seule par le serveur
+  if WHOOSH_AVAILABLE:
+    index_dir = build_whoosh_index(whoosh_index_dir(metadata_path), metadata, corpus_hash)
+    print(f"✅ Index Whoosh construit dans {index_dir}")
+  else:
+    print("⚠️ Whoosh non installé : l'index BM25 sera construit au démarrage du serveur.")
+  return store, embeddings_path, corpus_hash
+
+
+def load_eval_questions() -> list:
+  """Questions usagers (canoniques, SMS, variantes) utilisées comme requêtes d'évaluation."""
+  if not QUESTIONS_PATH.exists():
+    return []
+  with QUESTIONS_PATH.open(encoding="utf-8") as f:
+    data = json.load(f)
+  questions = []
+  for item in data.get("questions", []):
+    questions.extend(q for q in [item.get("canonical"), item.get("sms"), *item.get("variants", [])] if q)
+  return questions
+
+
+def build_ivf(store, embeddings_path: Path, corpus_hash: str, n_lists: int, nprobe: int, model) -> None:
+  """Entraîne l'index IVF, le sauvegarde et affiche le rappel@k face à la force brute."""
+  print(f"🔄 Entraînement IVF ({n_lists} listes)…")
+  index = train_ivf(store, n_lists=n_lists, nprobe=nprobe, corpus_hash=corpus_hash)
+  path = ivf_index_path(embeddings_path)
+  index.save(path)
+  print(f"✅ Index IVF sauvegardé dans {path}")
+
+  questions = load_eval_questions()
+  if questions:
+    queries = model.encode(questions, batch_size=64, normalize_embeddings=True)
+  else:
+    # Pas de questions usagers : échantillon de segments du corpus comme requêtes
+    sample = np.random.default_rng(0).choice(len(store), size=min(200, len(store)), replace=False)
+    queries = store.rows(sample)
+  print(f"📊 Rappel IVF vs force brute ({len(queries)} requêtes) :")
+  for k in (5, 10):
+    for row in evaluate_ivf(index, queries, k=k):
+      print(f"   k={k:<3} nprobe={row['nprobe']:<3} recall@{k}={row[f'recall@{k}']:.3f}  ivf={row['ivf_ms']:.2f} ms  exact={row['exact_ms']:.2f} ms")
 
 
 def build_metadata(corpus):
@@ -97,6 +176,24 @@ def main():
     action="store_true",
     help="Utiliser corpus généralisé (corpus_metadata_generalized.json)"
   )
+  parser.add_argument(
+    "--dtype",
+    choices=SUPPORTED_DTYPES,
+    default=os.environ.get("EMBED_STORE_DTYPE", "float16"),
+    help="Format de stockage des embeddings (float16 par défaut, int8 = quantifié)"
+  )
+  parser.add_argument(
+    "--ivf-lists",
+    type=int,
+    default=0,
+    help="Construire un index approximatif IVF avec N listes (0 = désactivé, ~4*sqrt(nb segments) conseillé)"
+  )
+  parser.add_argument(
+    "--nprobe",
+    type=int,
+    default=8,
+    help="Nombre de listes IVF parcourues par requête (utilisé pour le rapport de rappel)"
+  )
   args = parser.parse_args()
   
   use_generalized = args.generalized or CORPUS_GENERALIZED_PATH.exists()
@@ -116,7 +213,21 @@ def main():
   )
 
   metadata = build_metadata(corpus)
-  save_embeddings(embeddings, metadata, use_generalized=use_generalized)
+  store, embeddings_path, corpus_hash = save_embeddings(
+    embeddings,
+    metadata,
+    use_generalized=use_generalized,
+    model_name=model_name,
+    dtype=args.dtype,
+  )
+  if args.ivf_lists > 0:
+    build_ivf(store, embeddings_path, corpus_hash, args.ivf_lists, args.nprobe, model)
+  else:
+    # Un index IVF d'un corpus précédent ne correspond plus aux nouveaux embeddings
+    stale_ivf = ivf_index_path(embeddings_path)
+    if stale_ivf.exists():
+      stale_ivf.unlink()
+      print(f"🔄 Ancien index IVF supprimé ({stale_ivf})")
 
 
 if __name__ == "__main__":
@@ -81,6 +81,7 @@ def call_backend(
   endpoint: str,
   question: str,
   ranked_segments: Optional[List[Dict[str, Any]]] = None,
+  segment_format: Optional[str] = None,
 ) -> Dict[str, Any]:
   payload = {
     "question": question,
@@ -88,6 +89,8 @@ def call_backend(
     "rag_results": ranked_segments or [],
     "conversation": [],
   }
+  if segment_format:
+    payload["segment_format"] = segment_format
   response = requests.post(endpoint, json=payload, timeout=30)
   response.raise_for_status()
   return response.json()
@@ -122,6 +125,10 @@ def analyse_response(result: Dict[str, Any]) -> Dict[str, Any]:
     "alignment_summary": alignment.get("summary"),
     "sources": "; ".join(src.get("title") or src.get("url", "") for src in sources),
     "top_segments": "; ".join(segment_labels(top_segments)),
+    # Jetons d'entrée (non cachés + cache) : compare le coût des formats de segments
+    "input_tokens": sum((result.get("usage") or {}).get(field, 0) for field in (
+      "input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens",
+    )),
   }
 
 
@@ -131,6 +138,12 @@ def main(argv: Optional[List[str]] = None) -> int:
   parser.add_argument("--questions", type=Path, default=QUESTIONS_PATH, help="Chemin du JSON de questions.")
   parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Fichier CSV de sortie.")
   parser.add_argument("--insecure", action="store_true", help="Désactive la vérification TLS (utile pour certif auto-signé).")
+  parser.add_argument(
+    "--segment-format",
+    choices=("legacy", "compact"),
+    default=None,
+    help="Format des segments dans le prompt (A/B : lancer une fois par format, avec un --output différent).",
+  )
   args = parser.parse_args(argv)
 
   questions = load_questions(args.questions)
@@ -158,6 +171,8 @@ def main(argv: Optional[List[str]] = None) -> int:
       "sources",
       "answer_text",
       "answer_html",
+      "segment_format",
+      "input_tokens",
     ]
     writer = csv.DictWriter(f, fieldnames=fieldnames)
     writer.writeheader()
@@ -171,6 +186,8 @@ def main(argv: Optional[List[str]] = None) -> int:
           "rag_results": [],
           "conversation": [],
         }
+        if args.segment_format:
+          payload["segment_format"] = args.segment_format
         response = requests.post(args.endpoint, json=payload, timeout=30, verify=verify)
         response.raise_for_status()
         result = response.json()
@@ -182,6 +199,7 @@ def main(argv: Optional[List[str]] = None) -> int:
           "top_segments": "",
           "sources": "",
           "answer_text": "",
+          "input_tokens": "",
         }
 
       writer.writerow(
@@ -190,6 +208,7 @@ def main(argv: Optional[List[str]] = None) -> int:
           "variant_label": entry.variant_label,
           "intent": entry.intent,
           "question": entry.text,
+          "segment_format": args.segment_format or "serveur",
           **summary,
         }
       )
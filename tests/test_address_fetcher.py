@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires du service d'adresses (tools/address_fetcher.py).
+"""
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from tools.address_fetcher import AddressService
+
+
+class SlowFetcher:
+    def __init__(self, answers, delay=0.0):
+        self.answers = answers
+        self.delay = delay
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, lieu_nom, city):
+        self.calls.append(lieu_nom)
+        if self.delay:
+            self.release.wait(self.delay)
+        return self.answers.get(lieu_nom)
+
+
+def test_cache_loaded_once_and_writes_batched(tmp_path):
+    cache_path = tmp_path / "lieux_cache.json"
+    cache_path.write_text(json.dumps({"espace dewailly": "Place Dewailly, Amiens"}), encoding="utf-8")
+    fetcher = SlowFetcher({"Gymnase Pierre": "1 rue Pierre, Amiens", "Stade Nord": "2 rue Nord, Amiens"})
+    service = AddressService(cache_path, flush_interval=60, fetchers=[fetcher])
+
+    assert service.get("Espace Dewailly") == "Place Dewailly, Amiens"
+    cache_path.unlink()
+    assert service.get("Espace Dewailly") == "Place Dewailly, Amiens"
+
+    assert service.get("Gymnase Pierre") == "1 rue Pierre, Amiens"
+    assert service.get("Stade Nord") == "2 rue Nord, Amiens"
+    assert not cache_path.exists()
+    service.flush()
+    saved = json.loads(cache_path.read_text(encoding="utf-8"))
+    assert saved == {
+        "espace dewailly": "Place Dewailly, Amiens",
+        "gymnase pierre": "1 rue Pierre, Amiens",
+        "stade nord": "2 rue Nord, Amiens",
+    }
+    assert [p.name for p in tmp_path.iterdir()] == ["lieux_cache.json"]
+
+
+def test_segments_checked_before_external_lookup(tmp_path):
+    fetcher = SlowFetcher({})
+    service = AddressService(tmp_path / "cache.json", flush_interval=0, fetchers=[fetcher])
+    segment = SimpleNamespace(content="La salle Jean Moulin, 12 rue de la Paix, 80000 Amiens", excerpt=None)
+    assert service.get("Salle Jean Moulin", segments_rag=[segment]) == "12 rue de la Paix"
+    assert fetcher.calls == []
+
+
+def test_background_lookup_does_not_block(tmp_path):
+    fetcher = SlowFetcher({"Médiathèque Nord": "3 place Nord, Amiens"}, delay=5.0)
+    service = AddressService(tmp_path / "cache.json", flush_interval=0, fetchers=[fetcher])
+
+    started = time.perf_counter()
+    assert service.get("Médiathèque Nord", wait=False) is None
+    assert service.get("Médiathèque Nord", wait=False) is None
+    assert time.perf_counter() - started < 1.0
+
+    fetcher.release.set()
+    service.drain(timeout=5)
+    assert fetcher.calls == ["Médiathèque Nord"]
+    assert service.get("Médiathèque Nord", wait=False) == "3 place Nord, Amiens"
+
+
+def test_negative_cache_expires(tmp_path):
+    fetcher = SlowFetcher({})
+    service = AddressService(tmp_path / "cache.json", negative_ttl=0.2, flush_interval=0, fetchers=[fetcher])
+    assert service.get("Lieu inconnu") is None
+    assert service.get("Lieu inconnu") is None
+    assert fetcher.calls == ["Lieu inconnu"]
+    assert service.stats["negative_hits"] == 1
+
+    time.sleep(0.25)
+    assert service.get("Lieu inconnu") is None
+    assert fetcher.calls == ["Lieu inconnu", "Lieu inconnu"]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires du moteur BM25F NumPy (Backend/bm25_index.py), comparé à Whoosh.
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+pytest.importorskip("whoosh")
+
+import bm25_index
+from bm25_index import BM25Index, bm25_index_path, build_bm25_columns, load_bm25_columns, open_or_build_bm25_index
+from corpus_artifacts import compute_corpus_hash, open_or_build_whoosh_index
+from whoosh import scoring
+from whoosh.qparser import MultifieldParser, OrGroup
+
+METADATA = [
+    {"label": "Tarifs de la cantine", "source": "tarifs.pdf", "content": "Le repas à la cantine scolaire coûte 4,05 €."},
+    {"label": "Crèches municipales", "source": "creches.html", "content": "Inscription en crèche auprès du relais petite enfance."},
+    {"label": "Accueil périscolaire", "source": "periscolaire.html", "content": "Accueil du matin et du soir, tarifs selon le quotient familial."},
+    {"label": "Centre de loisirs", "source": "loisirs.html", "content": "Le centre de loisirs accueille les enfants le mercredi et pendant les vacances."},
+    {"label": "Restauration scolaire", "source": "cantine.html", "content": "Menus de la cantine, inscription à la restauration scolaire et tarifs des repas."},
+]
+QUESTIONS = [
+    "Quel est le tarif de la cantine ?",
+    "inscription crèche",
+    "centre de loisirs mercredi",
+    "accueil du soir tarifs",
+    "vacances",
+]
+
+
+def whoosh_results(index, question, limit):
+    parser = MultifieldParser(["label", "content"], schema=index.schema, group=OrGroup)
+    with index.searcher(weighting=scoring.BM25F(B=0.75, K1=1.6)) as searcher:
+        return [(int(hit["id"]), hit.score) for hit in searcher.search(parser.parse(question), limit=limit)]
+
+
+def test_matches_whoosh_ranking_and_scores(tmp_path):
+    corpus_hash = compute_corpus_hash(METADATA)
+    whoosh_index, _ = open_or_build_whoosh_index(tmp_path / "whoosh", METADATA, corpus_hash)
+    engine = BM25Index(build_bm25_columns(METADATA, corpus_hash))
+    for question in QUESTIONS:
+        expected = whoosh_results(whoosh_index, question, 3)
+        indices, scores = engine.search(question, 3)
+        assert indices.tolist() == [doc for doc, _ in expected], question
+        assert scores.tolist() == pytest.approx([score for _, score in expected]), question
+
+
+def test_unknown_terms_and_token_cache():
+    engine = BM25Index(build_bm25_columns(METADATA, "hash"))
+    indices, scores = engine.search("xyzzy", 5)
+    assert indices.size == 0 and scores.size == 0
+    engine.search("cantine cantine", 5)
+    # Question répétée : une seule analyse par mot distinct
+    assert engine.stats()["token_cache"] == 2
+
+
+def test_token_cache_is_thread_safe(monkeypatch):
+    # Cache minuscule : évictions constantes pendant que d'autres threads lisent
+    monkeypatch.setattr(bm25_index, "TOKEN_CACHE_SIZE", 4)
+    engine = BM25Index(build_bm25_columns(METADATA, "hash"))
+    expected = {question: engine.search(question, 3)[0].tolist() for question in QUESTIONS}
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(200):
+                for question in QUESTIONS:
+                    assert engine.search(question, 3)[0].tolist() == expected[question]
+        except Exception as exc:  # remonté au thread principal
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert engine.stats()["token_cache"] <= 4
+
+
+def test_columns_round_trip_and_invalidation(tmp_path):
+    path = bm25_index_path(tmp_path / "corpus_metadata.json")
+    assert path.name == "corpus_metadata.bm25.npz"
+    engine, rebuilt = open_or_build_bm25_index(path, METADATA, "hash-1")
+    assert rebuilt and path.exists()
+    reopened, rebuilt = open_or_build_bm25_index(path, METADATA, "hash-1")
+    assert not rebuilt
+    assert reopened.search("cantine", 5)[0].tolist() == engine.search("cantine", 5)[0].tolist()
+    assert load_bm25_columns(path, "hash-2") is None
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests du constructeur de gazetteer (tools/build_gazetteer.py) contre un faux Nominatim local.
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from place_index import PLACE_GAZETTEER, PlaceIndex
+from tools.build_gazetteer import RateLimiter, build_gazetteer
+
+
+class FakeNominatim(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        FakeNominatim.requests_seen.append((time.monotonic(), url.path, params))
+        if url.path == "/search":
+            if "Aragon" in params["q"]:
+                body = [{"lat": "49.89", "lon": "2.30", "address": {"house_number": "50", "road": "Rue Dom Bouquet"}}]
+            elif "FLANDRES" in params["q"]:
+                body = [{"lat": "49.88", "lon": "2.27", "address": {"house_number": "1", "road": "Rue de Flandres"}}]
+            else:
+                body = []
+        elif url.path == "/reverse":
+            body = {"address": {"house_number": "12", "road": "Rue Réaumur", "postcode": "80000", "city": "Amiens"}}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def nominatim():
+    FakeNominatim.requests_seen = []
+    server = HTTPServer(("127.0.0.1", 0), FakeNominatim)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def write_data(data_dir):
+    files = {
+        "lieux_importants.json": {"lieux": [{"nom": "Espace Dewailly", "adresse": "Place Dewailly, 80000 Amiens", "coordonnees": {"lat": 49.89, "lon": 2.29}}]},
+        "ecoles_amiens.json": {"ecoles": [
+            {"nom": "École primaire Réaumur", "adresse": None, "coordonnees": {"lat": 49.9, "lon": 2.3}, "osm_id": 1},
+            {"nom": "École primaire", "adresse": "Rue A, 80000 Amiens", "coordonnees": {"lat": 49.8, "lon": 2.2}, "osm_id": 2},
+        ]},
+        "rpe_contacts.json": {"rpe_list": [{"nom": "RPE Babillages", "adresse": "1 RUE DE FLANDRES 80000 AMIENS"}]},
+        "corpus_metadata.json": [
+            {"content": "Rendez-vous à la Médiathèque Louis Aragon pour l'éveil musical."},
+            {"content": "La médiathèque Louis Aragon propose des lectures."},
+            {"content": "Une seule mention du Gymnase Inconnu."},
+        ],
+    }
+    for name, content in files.items():
+        (data_dir / name).write_text(json.dumps(content, ensure_ascii=False), encoding="utf-8")
+
+
+def test_build_against_local_nominatim(tmp_path, nominatim):
+    write_data(tmp_path)
+    output = tmp_path / "gazetteer.json"
+    gazetteer = build_gazetteer(tmp_path, output, base_url=nominatim, delay=0.2)
+
+    by_name = {entry["nom"]: entry for entry in gazetteer["lieux"]}
+    assert set(by_name) == {"Espace Dewailly", "École primaire Réaumur", "École primaire", "RPE Babillages", "Médiathèque Louis Aragon"}
+    assert by_name["École primaire Réaumur"]["adresse"] == "12 Rue Réaumur, 80000 Amiens"
+    assert by_name["École primaire Réaumur"]["cles"] == ["ecole primaire reaumur", "reaumur"]
+    assert by_name["RPE Babillages"]["adresse"] == "1 RUE DE FLANDRES 80000 AMIENS"
+    assert (by_name["RPE Babillages"]["lat"], by_name["RPE Babillages"]["lon"]) == (49.88, 2.27)
+    assert by_name["Médiathèque Louis Aragon"]["adresse"] == "50 Rue Dom Bouquet, Amiens"
+    assert by_name["Médiathèque Louis Aragon"]["variantes"] == ["Médiathèque Louis Aragon", "médiathèque Louis Aragon"]
+
+    # Entrées déjà complètes : pas de requête ; une requête par entrée à compléter, espacées
+    # (instants de réception côté serveur : marge pour la gigue réseau locale)
+    paths = [path for _, path, _ in FakeNominatim.requests_seen]
+    assert sorted(paths) == ["/reverse", "/search", "/search"]
+    times = [seen for seen, _, _ in FakeNominatim.requests_seen]
+    assert all(later - earlier >= 0.15 for earlier, later in zip(times, times[1:]))
+
+    # Reconstruction : tout est repris du gazetteer existant
+    FakeNominatim.requests_seen = []
+    assert build_gazetteer(tmp_path, output, base_url=nominatim, delay=0.2) == gazetteer
+    assert FakeNominatim.requests_seen == []
+
+    index = PlaceIndex(gazetteer=json.loads(output.read_text(encoding="utf-8")))
+    keys = index.find_keys("ou se trouve la mediatheque louis aragon")
+    assert keys[PLACE_GAZETTEER] == ["mediatheque louis aragon"]
+    assert index.unique_address(PLACE_GAZETTEER, "babillages") == "1 RUE DE FLANDRES 80000 AMIENS"
+
+
+def test_rate_limiter_spaces_calls():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(1.1, clock=lambda: now[0], sleep=sleep)
+    limiter.wait()
+    now[0] += 0.3
+    limiter.wait()
+    now[0] += 2.0
+    limiter.wait()
+    assert sleeps == [pytest.approx(0.8)]
+    assert limiter.calls == 3
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires du cache de réponses (Backend/cache.py).
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from cache import QueryMemo, SemanticCache, SimpleCache, SQLiteCache
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_simple_cache_ttl():
+    cache = SimpleCache(default_ttl=60)
+    cache.set("v3:tarif cantine", {"answer_html": "ok"})
+    assert cache.get("v3:Tarif cantine ") == {"answer_html": "ok"}
+    cache.set("v3:expiré", "x", ttl=1)
+    cache._cache[cache._make_key("v3:expiré")]["expires_at"] = time.time() - 1
+    assert cache.get("v3:expiré") is None
+
+
+def test_simple_cache_lru_eviction():
+    cache = SimpleCache(default_ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" devient la plus récente
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_simple_cache_max_bytes():
+    cache = SimpleCache(default_ttl=60, max_entries=None, max_bytes=100)
+    cache.set("a", "x" * 40)
+    cache.set("b", "y" * 40)
+    cache.set("c", "z" * 40)
+    assert cache.size() == 2
+    assert cache.get("a") is None
+    assert cache.stats()["total_bytes"] <= 100
+
+
+def test_simple_cache_periodic_purge_uses_expiry_heap():
+    cache = SimpleCache(default_ttl=60, purge_interval=0)
+    cache.set("court", 1, ttl=1)
+    cache.set("long", 2, ttl=60)
+    cache.set("long", 3, ttl=60)  # réécriture : entrée périmée dans le tas
+    now = time.time() + 5
+    assert cache._purge_expired(now) == 1
+    assert cache.size() == 1
+    assert cache.get("long") == 3
+
+
+def test_simple_cache_thread_safety():
+    cache = SimpleCache(default_ttl=60, max_entries=50)
+
+    def worker(offset):
+        for i in range(500):
+            cache.set(f"q{(offset + i) % 80}", i)
+            cache.get(f"q{i % 80}")
+
+    threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats["total_entries"] == cache.size() <= 50
+    assert stats["total_bytes"] == sum(entry["size"] for entry in cache._cache.values())
+
+
+def test_sqlite_cache_shared_between_instances(tmp_path):
+    path = tmp_path / "answers.sqlite3"
+    worker_a = SQLiteCache(str(path), default_ttl=60)
+    worker_b = SQLiteCache(str(path), default_ttl=60)
+    worker_a.set("v3:Horaires cantine ?", {"answer_html": "<p>12h</p>", "sources": []})
+    assert worker_b.get("v3:horaires cantine ?") == {"answer_html": "<p>12h</p>", "sources": []}
+    assert worker_b.get("v2:horaires cantine ?") is None
+    assert worker_b.stats()["hits"] == 1
+
+
+def test_sqlite_cache_ttl_and_max_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "answers.sqlite3"), default_ttl=60, max_entries=2, purge_interval=0)
+    cache.set("short", "x", ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    for name in ("a", "b", "c"):
+        cache.set(name, name)
+        time.sleep(0.01)
+    assert cache.size() == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == "c"
+
+
+def test_semantic_cache_hit_near_miss_and_miss():
+    cache = SemanticCache(threshold=0.9, near_miss_margin=0.1)
+    cache.add(_unit([1, 0, 0]), "tarif cantine ?", {"answer_html": "tarifs"})
+
+    match = cache.lookup(_unit([1, 0.1, 0]), "quel est le tarif de la cantine")
+    assert match is not None
+    assert match[0] == {"answer_html": "tarifs"}
+    assert match[1] == "tarif cantine ?"
+
+    assert cache.lookup(_unit([1, 0.6, 0]), "horaires cantine") is None
+    assert cache.lookup(_unit([0, 0, 1]), "contact RPE") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["near_misses"], stats["misses"]) == (1, 1, 1)
+
+
+def test_semantic_cache_requires_same_numbers():
+    cache = SemanticCache(threshold=0.9)
+    cache.add(_unit([1, 0, 0]), "tarif cantine catégorie 3", "cat3")
+    assert cache.lookup(_unit([1, 0, 0]), "tarif cantine catégorie 4") is None
+    assert cache.lookup(_unit([1, 0, 0]), "tarif de la cantine catégorie 3")[0] == "cat3"
+    stats = cache.stats()
+    assert (stats["hits"], stats["number_mismatches"], stats["near_misses"], stats["misses"]) == (1, 1, 0, 0)
+
+
+def test_semantic_cache_filters_numbers_before_best_match():
+    cache = SemanticCache(threshold=0.9)
+    cache.add(_unit([1, 0, 0]), "tarif cantine catégorie 4", "cat4")
+    cache.add(_unit([1, 0.2, 0]), "tarif de la cantine catégorie 3", "cat3")
+    # La plus proche porte un autre nombre : la suivante, au seuil, répond
+    match = cache.lookup(_unit([1, 0, 0]), "tarif cantine catégorie 3")
+    assert match is not None and match[0] == "cat3"
+
+
+def test_semantic_cache_is_bounded():
+    cache = SemanticCache(threshold=0.9, max_entries=2)
+    for i, ttl in enumerate((30, 10, 20)):
+        vector = np.zeros(3, dtype=np.float32)
+        vector[i] = 1.0
+        cache.add(vector, f"question {chr(97 + i)}", i, ttl=ttl)
+    assert cache.size() == 2
+    # L'entrée qui expirait le plus tôt (ttl=10) a été évincée
+    assert cache.lookup(np.array([0, 1, 0], dtype=np.float32), "question b") is None
+    assert cache.lookup(np.array([0, 0, 1], dtype=np.float32), "question c")[0] == 2
+
+
+def test_query_memo_lru_and_hit_rate():
+    memo = QueryMemo(max_entries=2)
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        return key.upper()
+
+    assert memo.get_or_compute("a", lambda: compute("a")) == "A"
+    assert memo.get_or_compute("a", lambda: compute("a")) == "A"
+    memo.get_or_compute("b", lambda: compute("b"))
+    memo.get_or_compute("a", lambda: compute("a"))
+    memo.get_or_compute("c", lambda: compute("c"))  # évince "b", le moins récemment utilisé
+    memo.get_or_compute("b", lambda: compute("b"))
+    assert calls == ["a", "b", "c", "b"]
+    stats = memo.stats()
+    assert stats["entries"] == 2
+    assert stats["hits"] == 2 and stats["misses"] == 4
+    assert stats["hit_rate"] == round(2 / 6, 4)
+    assert stats["evictions"] == 2
+
+
+def test_query_memo_disabled_and_clear():
+    memo = QueryMemo(max_entries=0)
+    assert memo.get_or_compute("a", lambda: 1) == 1
+    assert len(memo) == 0
+    memo = QueryMemo()
+    memo.get_or_compute("a", lambda: 1)
+    memo.clear()
+    assert memo.get_or_compute("a", lambda: 2) == 2
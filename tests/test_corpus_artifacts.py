@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires des artefacts du corpus (Backend/corpus_artifacts.py) : magasin
+d'embeddings, colonnes normalisées, index Whoosh, identifiants de segments.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from corpus_artifacts import (
+    build_normalized_columns,
+    compute_corpus_hash,
+    load_embedding_store,
+    load_normalized_columns,
+    normalized_columns_path,
+    open_or_build_whoosh_index,
+    read_whoosh_hash,
+    save_embedding_store,
+    save_normalized_columns,
+    segment_id,
+    store_header_path,
+    store_scales_path,
+    whoosh_index_dir,
+)
+from text_normalize import normalize_text
+
+
+METADATA = [
+    {"label": "Tarifs", "content": "Cantine : 3,50 € le repas (QF 1)."},
+    {"label": "Crèches", "content": "Pré-inscription en crèche... Relais Petite Enfance"},
+    {"label": "Vide", "content": ""},
+]
+
+
+def test_normalized_columns_match_normalize_text():
+    columns = build_normalized_columns(METADATA, compute_corpus_hash(METADATA))
+    assert columns["content"] == [normalize_text(meta["content"]) for meta in METADATA]
+    assert columns["tokens"][1] == sorted(set(normalize_text(METADATA[1]["content"]).split()))
+    assert columns["tokens"][2] == []
+
+
+def test_normalized_columns_round_trip_and_invalidation(tmp_path):
+    metadata_path = tmp_path / "corpus_metadata.json"
+    columns_path = normalized_columns_path(metadata_path)
+    assert columns_path.name == "corpus_metadata.normalized.json"
+
+    corpus_hash = compute_corpus_hash(METADATA)
+    save_normalized_columns(columns_path, build_normalized_columns(METADATA, corpus_hash))
+    assert load_normalized_columns(columns_path, corpus_hash)["content"][0].startswith("cantine")
+
+    changed = METADATA[:2]
+    assert load_normalized_columns(columns_path, compute_corpus_hash(changed)) is None
+    assert load_normalized_columns(tmp_path / "absent.json", corpus_hash) is None
+
+
+def test_segment_ids_are_stable_and_content_based():
+    ids = [segment_id(meta) for meta in METADATA]
+    assert len(set(ids)) == len(ids)
+    assert all(len(value) == 12 for value in ids)
+    # Même segment ailleurs dans un corpus reconstruit : même identifiant
+    assert segment_id(dict(METADATA[1])) == ids[1]
+    assert segment_id({**METADATA[1], "content": METADATA[1]["content"] + "."}) != ids[1]
+
+
+def _embeddings(count=50, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(size=(count, dim)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def test_embedding_store_round_trip_float16_and_int8(tmp_path):
+    embeddings = _embeddings()
+    corpus_hash = compute_corpus_hash(METADATA)
+    query = embeddings[3]
+    for dtype, tolerance in (("float16", 1e-3), ("int8", 2e-2)):
+        path = tmp_path / f"corpus_embeddings_{dtype}.npy"
+        header = save_embedding_store(path, embeddings, model_name="test-model", corpus_hash=corpus_hash, dtype=dtype)
+        store = load_embedding_store(path)
+        assert store.shape == embeddings.shape and len(store) == 50 and store.dim == 32
+        assert store.dtype == dtype == header["dtype"]
+        assert store.model_name == "test-model" and store.corpus_hash == corpus_hash
+        assert store_scales_path(path).exists() == (dtype == "int8")
+
+        rows = store.rows(np.arange(len(store)))
+        assert rows.dtype == np.float32
+        # Cosinus entre chaque ligne stockée et l'original, et scores d'une requête
+        cosines = np.sum(rows * embeddings, axis=1) / np.linalg.norm(rows, axis=1)
+        assert cosines.min() > 1 - tolerance
+        assert np.abs(store.dot(query) - embeddings @ query).max() < tolerance
+        assert int(np.argmax(store.dot(query))) == 3
+
+
+def test_embedding_store_hash_mismatch_triggers_rebuild(tmp_path):
+    path = tmp_path / "corpus_embeddings.npy"
+    old_hash = compute_corpus_hash(METADATA)
+    save_embedding_store(path, _embeddings(count=3), model_name="test-model", corpus_hash=old_hash, dtype="int8")
+
+    # Corpus modifié : le hash de l'en-tête ne correspond plus, le magasin est à reconstruire
+    changed = METADATA[:2]
+    new_hash = compute_corpus_hash(changed)
+    assert load_embedding_store(path).corpus_hash != new_hash
+
+    save_embedding_store(path, _embeddings(count=2, seed=1), model_name="test-model", corpus_hash=new_hash)
+    store = load_embedding_store(path)
+    assert store.corpus_hash == new_hash
+    assert store.shape == (2, 32) and store.dtype == "float16"
+    # Plus d'échelles int8 orphelines après reconstruction en float16
+    assert store.scales is None and not store_scales_path(path).exists()
+    assert store_header_path(path).exists()
+
+
+def test_whoosh_index_reopened_then_rebuilt_on_corpus_change(tmp_path):
+    pytest.importorskip("whoosh")
+    index_dir = whoosh_index_dir(tmp_path / "corpus_metadata.json")
+    assert index_dir.name == "corpus_metadata_whoosh"
+    corpus_hash = compute_corpus_hash(METADATA)
+
+    index, rebuilt = open_or_build_whoosh_index(index_dir, METADATA, corpus_hash)
+    assert rebuilt and index.doc_count() == 3
+    assert read_whoosh_hash(index_dir) == corpus_hash
+    index.close()
+    index_files = sorted(path.name for path in index_dir.iterdir())
+    assert any(name.endswith(".seg") for name in index_files)
+
+    # Même corpus : index réouvert tel quel, sans reconstruction
+    index, rebuilt = open_or_build_whoosh_index(index_dir, METADATA, corpus_hash)
+    assert not rebuilt and index.doc_count() == 3
+    assert sorted(path.name for path in index_dir.iterdir()) == index_files
+    index.close()
+
+    changed = METADATA[:2]
+    index, rebuilt = open_or_build_whoosh_index(index_dir, changed, compute_corpus_hash(changed))
+    assert rebuilt and index.doc_count() == 2
+    assert read_whoosh_hash(index_dir) == compute_corpus_hash(changed)
+    index.close()
+    # Aucun dossier temporaire de construction laissé à côté de l'index
+    assert [path.name for path in tmp_path.iterdir()] == [index_dir.name]
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires de l'automate de mots-clés (Backend/keyword_matcher.py).
+"""
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from keyword_matcher import (
+    CURRENCY,
+    INTENTION,
+    LEXICON_ADMIN,
+    LEXICON_USAGER,
+    KeywordAutomaton,
+    build_keyword_matcher,
+)
+
+
+def test_overlapping_patterns_are_all_reported():
+    automaton = KeywordAutomaton()
+    for word in ("he", "she", "his", "hers"):
+        automaton.add(word, ("mot", word))
+    matches = sorted(automaton.iter_matches("ushers"))
+    assert matches == [(3, ("mot", "he")), (3, ("mot", "she")), (5, ("mot", "hers"))]
+
+
+def test_scan_matches_naive_substring_search():
+    rng = random.Random(0)
+    patterns = ["".join(rng.choice("abc ") for _ in range(rng.randint(1, 4))) for _ in range(60)]
+    automaton = KeywordAutomaton()
+    for index, pattern in enumerate(patterns):
+        automaton.add(pattern, ("p", index))
+    for _ in range(300):
+        text = "".join(rng.choice("abcd ") for _ in range(rng.randint(0, 40)))
+        expected = {index for index, pattern in enumerate(patterns) if pattern in text}
+        assert automaton.scan(text).get("p", set()) == expected
+
+
+def test_build_keyword_matcher_classes():
+    lexicon = [
+        {"_normalized_usager": "cantine", "_normalized_admin": ["restauration scolaire"]},
+        {"_normalized_usager": "creche", "_normalized_admin": ["etablissement d accueil"]},
+    ]
+    intentions = {
+        "action": {"weight": 1.0, "keywords": ("payer", "où")},
+        "planification": {"weight": 0.8, "keywords": ("inscription",)},
+    }
+    matcher = build_keyword_matcher(lexicon, intentions, ("tarif", "€"), ["inscription"])
+    found = matcher.scan("combien pour payer la cantine et l inscription restauration scolaire")
+    assert found[LEXICON_USAGER] == {0}
+    assert found[LEXICON_ADMIN] == {0}
+    assert found[INTENTION] == {"action", "planification"}
+    assert CURRENCY not in found
+    # Les mots-clés accentués gardent leur sémantique : jamais trouvés dans un texte normalisé
+    assert INTENTION not in matcher.scan("ou est la mairie")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires du routage de modèle (Backend/model_router.py).
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from model_router import ROUTE_FAST, ROUTE_LARGE, RouteStats, choose_route
+
+
+def test_structured_lookup_goes_fast():
+    route, _ = choose_route("action", 1.0, 1, True, [12.0, 8.0])
+    assert route == ROUTE_FAST
+
+
+def test_synthesis_over_several_segments_goes_large():
+    route, reason = choose_route("compréhension", 0.5, 2, True, [12.0, 11.0, 9.0])
+    assert route == ROUTE_LARGE
+    assert "synthèse" in reason
+
+
+def test_lookup_needs_dominant_segment_without_structured_data():
+    assert choose_route("action", 1.0, 0, False, [14.0], fast_min_score=10.0)[0] == ROUTE_FAST
+    assert choose_route("action", 1.0, 0, False, [4.0], fast_min_score=10.0)[0] == ROUTE_LARGE
+    assert choose_route("inconnue", 0.0, 0, False, [14.0])[0] == ROUTE_LARGE
+
+
+def test_ongoing_conversation_goes_large():
+    assert choose_route("action", 1.0, 1, True, [12.0], history_turns=4)[0] == ROUTE_LARGE
+
+
+def test_route_stats():
+    stats = RouteStats()
+    for seconds in (0.1, 0.2, 0.3):
+        stats.record(ROUTE_FAST, seconds)
+    stats.record(ROUTE_LARGE, 2.0, error=True)
+    report = stats.stats()
+    assert report[ROUTE_FAST]["count"] == 3
+    assert report[ROUTE_FAST]["p50_ms"] == 200.0
+    assert report[ROUTE_FAST]["share"] == 0.75
+    assert report[ROUTE_LARGE]["errors"] == 1
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires de l'index des lieux (Backend/place_index.py).
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from place_index import (
+    PLACE_ECOLE,
+    PLACE_LIEU,
+    PLACE_RPE,
+    PLACE_SECTEUR,
+    PlaceIndex,
+    school_key,
+    texts_mentioning,
+)
+
+INDEX = PlaceIndex(
+    {"rpe_list": [{"nom": "RPE Pigeon Vole", "secteurs": ["Nord", "Saint Maurice"]}]},
+    {"lieux": [{"nom": "Espace Dewailly", "adresse": "Place Dewailly, 80000 Amiens"}, {"nom": "Salle"}]},
+    {"ecoles": [{"nom": "École primaire Réaumur"}, {"nom": "École maternelle Réaumur"}, {"nom": "École A"}]},
+)
+
+
+def test_school_key_strips_generic_words():
+    assert school_key("École maternelle d'application Jules Verne") == "jules verne"
+    assert school_key("École primaire") == ""
+
+
+def test_find_keys_on_whole_words():
+    keys = INDEX.find_keys("ou se trouve l espace dewailly et le rpe pigeon vole secteur saint maurice")
+    assert keys[PLACE_LIEU] == ["espace dewailly"]
+    assert keys[PLACE_RPE] == ["pigeon vole"]
+    assert keys[PLACE_SECTEUR] == ["saint maurice"]
+    assert INDEX.find_keys("les salles du nordiste") == {}
+    assert INDEX.find_keys("") == {}
+
+
+def test_lookup_groups_homonyms():
+    assert len(INDEX.lookup(PLACE_ECOLE, "reaumur")) == 2
+    assert INDEX.lookup(PLACE_ECOLE, "a") == []
+    assert INDEX.lookup(PLACE_SECTEUR, "nord")[0]["nom"] == "RPE Pigeon Vole"
+
+
+def test_texts_mentioning_matches_substring_scan():
+    names = ["Salle Jean Moulin", "Gymnase Pierre", "crèches"]
+    texts = [
+        "Le gymnase Pierre de Coubertin",
+        None,
+        "La salle jean moulin, 12 rue de la Paix",
+        "Nos crèches et la Salle Jean Moulin",
+    ]
+    expected = {
+        name: [i for i, text in enumerate(texts) if name.lower() in (text or "").lower()]
+        for name in names
+    }
+    expected = {name: indices for name, indices in expected.items() if indices}
+    assert texts_mentioning(names, texts) == expected
+    assert texts_mentioning([], texts) == {}
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires du budget de jetons du prompt (Backend/prompt_budget.py).
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from prompt_budget import (
+    allocate_budget,
+    estimate_tokens,
+    fit_history,
+    fit_ranked,
+    truncate_to_tokens,
+)
+
+
+def test_allocate_budget_redistributes_surplus():
+    caps = allocate_budget(1000, {"structured": 50, "history": 900, "segments": 900})
+    assert caps["structured"] == 50
+    assert caps["history"] + caps["segments"] <= 950
+    assert caps["segments"] > caps["history"]
+
+    assert allocate_budget(1000, {"structured": 10, "history": 20, "segments": 30}) == {
+        "structured": 10,
+        "history": 20,
+        "segments": 30,
+    }
+
+
+def test_truncate_to_tokens():
+    text = "mot " * 200
+    short = truncate_to_tokens(text, 20)
+    assert estimate_tokens(short) <= 20
+    assert short.endswith("…")
+    assert truncate_to_tokens("court", 20) == "court"
+
+
+def test_fit_history_keeps_most_recent_turns():
+    turns = [f"- Utilisateur: question {i} " + "x" * 70 + "\n" for i in range(6)]
+    kept, dropped = fit_history(turns, estimate_tokens(turns[0]) * 2)
+    assert kept == turns[-2:]
+    assert dropped == 4
+
+    memo = "- Assistant: Mémo RAG actuel : " + "y" * 2000 + "\n"
+    kept, dropped = fit_history(turns + [memo], 100)
+    assert len(kept) == 1 and kept[0].startswith("- Assistant: Mémo")
+    assert estimate_tokens(kept[0]) <= 100
+
+
+def test_fit_ranked_trims_and_drops_by_score():
+    long_variants = ["a" * 700, "a" * 350, "a" * 35]
+    variants = [long_variants, long_variants, long_variants]
+    chosen = fit_ranked(variants, [0.2, 0.9, 0.5], cap=estimate_tokens("a" * 700) + estimate_tokens("a" * 35))
+    assert chosen == [None, 0, 2]
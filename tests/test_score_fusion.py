@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires de la fusion des scores de recherche (Backend/score_fusion.py).
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from score_fusion import (
+    FUSION_LEGACY,
+    FUSION_MINMAX,
+    FUSION_RRF,
+    FUSION_ZSCORE,
+    LexiconBoostMatrix,
+    RetrieverRun,
+    fuse_scores,
+)
+
+DOCS = [
+    "tarifs de la restauration scolaire",
+    "inscription en creche municipale",
+    "accueil periscolaire et restauration",
+    "relais petite enfance",
+]
+
+
+def run(indices, scores, weight=1.0, lexicon_boost=False):
+    return RetrieverRun(np.array(indices, dtype=np.int64), np.array(scores, dtype=np.float64), weight, lexicon_boost)
+
+
+def test_lexicon_matrix_counts_substrings():
+    matrix = LexiconBoostMatrix(DOCS, ["restauration", "creche", "restauration", "absent"])
+    assert matrix.stats() == {"docs": 4, "terms": 3, "nnz": 3}
+    assert matrix.term_docs("restauration").tolist() == [0, 2]
+    # Répétitions comptées, terme non indexé cherché dans le texte
+    hits = matrix.hits(np.array([0, 1, 2, 3]), ["restauration", "restauration", "municipale"], DOCS)
+    assert hits.tolist() == [2, 1, 2, 0]
+
+
+def test_legacy_matches_weighted_sum_with_lexicon_on_bm25_only():
+    matrix = LexiconBoostMatrix(DOCS, ["restauration"])
+    indices, scores = fuse_scores(
+        [run([0, 1], [10.0, 9.0], 1.0, lexicon_boost=True), run([1, 2], [0.8, 0.5], 0.6)],
+        top_k=3,
+        mode=FUSION_LEGACY,
+        lexicon=matrix,
+        lexicon_terms=["restauration"],
+    )
+    # doc 2 contient le terme mais ne vient que des vecteurs : pas de bonus
+    assert indices.tolist() == [0, 1, 2]
+    assert scores.tolist() == pytest.approx([12.5, 9.0 + 0.48, 0.3])
+
+
+def test_ties_keep_first_seen_order_and_top_k():
+    indices, _ = fuse_scores([run([3, 1, 2, 0], [1.0, 1.0, 1.0, 1.0])], top_k=2)
+    assert indices.tolist() == [3, 1]
+
+
+def test_rrf_rewards_agreement_between_retrievers():
+    indices, scores = fuse_scores(
+        [run([0, 1, 2], [30.0, 20.0, 10.0]), run([2, 3, 0], [0.9, 0.8, 0.7])],
+        top_k=4,
+        mode=FUSION_RRF,
+    )
+    assert indices.tolist()[:2] == [0, 2]
+    assert scores[0] == pytest.approx(1 / 61 + 1 / 63)
+
+
+def test_normalized_modes_put_retrievers_on_same_scale():
+    runs = [run([0, 1], [100.0, 50.0]), run([2, 3], [0.9, 0.1])]
+    for mode in (FUSION_MINMAX, FUSION_ZSCORE):
+        indices, scores = fuse_scores(runs, top_k=4, mode=mode)
+        assert set(indices.tolist()[:2]) == {0, 2}
+        assert scores[0] == pytest.approx(scores[1])
+
+
+def test_empty_runs_and_unknown_mode():
+    indices, scores = fuse_scores([run([], [])], top_k=5)
+    assert indices.size == 0 and scores.size == 0
+    with pytest.raises(ValueError):
+        fuse_scores([run([0], [1.0])], top_k=5, mode="inconnu")
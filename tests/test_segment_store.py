@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires du magasin de segments (Backend/segment_store.py).
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from corpus_artifacts import segment_id
+from segment_store import SegmentStore
+
+METADATA = [
+    {"label": "Tarifs", "url": "https://example.org/tarifs", "content": "Repas : 4,05 €"},
+    {"label": "Crèches", "url": "https://example.org/creches", "content": "Inscription en crèche"},
+    {"label": "Tarifs", "url": "https://example.org/tarifs", "content": "Repas : 4,05 €"},
+]
+
+
+def make_store():
+    ids = [segment_id(meta) for meta in METADATA]
+    return SegmentStore(METADATA, ids, ["repas 4 05", "inscription en creche", "repas 4 05"], [True, False, True]), ids
+
+
+def test_positions_by_id():
+    store, ids = make_store()
+    assert len(store) == 3
+    assert store.position(ids[1]) == 1
+    assert store.metadata(store.position(ids[1]))["label"] == "Crèches"
+    # Copie identique : même identifiant, première position
+    assert ids[0] == ids[2]
+    assert store.position(ids[2]) == 0
+    assert store.position("inconnu") is None
+    assert store.position(None) is None
+
+
+def test_precomputed_columns_and_stats():
+    store, ids = make_store()
+    assert store.normalized(1) == "inscription en creche"
+    assert store.has_currency(0) and not store.has_currency(1)
+    assert store.stats() == {"segments": 3, "unique_ids": 2, "currency_segments": 2}
+
+
+def test_columns_must_have_same_length():
+    with pytest.raises(ValueError):
+        SegmentStore(METADATA, ["a", "b"], ["x", "y", "z"], [False, False, False])
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires de la coalescence des requêtes en vol (Backend/single_flight.py).
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from single_flight import SingleFlight
+
+
+def test_identical_requests_share_one_generation():
+    flights = SingleFlight()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer_html": "<p>12h</p>"}
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("v3:horaires", generate) for _ in range(20)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats()["coalesced"] == 19
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_distinct_keys_and_later_requests_run_separately():
+    flights = SingleFlight()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def scenario():
+        await asyncio.gather(flights.do("a", generate), flights.do("b", generate))
+        await flights.do("a", generate)
+
+    asyncio.run(scenario())
+    assert len(calls) == 3
+
+
+def test_errors_propagate_to_all_waiters():
+    flights = SingleFlight()
+
+    async def generate():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("timeout Claude")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flights.do("k", generate) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flights = SingleFlight()
+
+    async def generate():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do("k", generate))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("k", generate))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "ok"
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires de l'extraction de answer_html en streaming (Backend/stream_extract.py).
+"""
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from stream_extract import AnswerHtmlStreamExtractor
+
+
+def _feed_all(chunks):
+    extractor = AnswerHtmlStreamExtractor()
+    out = "".join(extractor.feed(chunk) for chunk in chunks)
+    return out, extractor
+
+
+def _split_every(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def test_escapes_split_across_chunks():
+    answer = 'Ligne 1\nLigne 2 « tarif » \\ "QF" é'
+    raw = json.dumps({"answer_html": answer, "sources": []}, ensure_ascii=True)
+    for size in range(1, 8):
+        out, extractor = _feed_all(_split_every(raw, size))
+        assert out == answer, size
+        assert extractor.done
+
+
+def test_surrogate_pairs_are_recombined():
+    answer = "<p>Inscription ouverte 🎉 pour 👶</p>"
+    raw = json.dumps({"answer_html": answer}, ensure_ascii=True)
+    assert "\\ud83c\\udf89" in raw
+    for size in range(1, 14):
+        out, _ = _feed_all(_split_every(raw, size))
+        assert out == answer, size
+        out.encode("utf-8")
+
+
+def test_truncated_escape_waits_for_next_chunk():
+    extractor = AnswerHtmlStreamExtractor()
+    assert extractor.feed('{"answer_html": "caf\\u00') == "caf"
+    assert extractor.feed('e9 ok') == "é ok"
+    # Substitut haut en fin de fragment : rien n'est émis avant le substitut bas
+    assert extractor.feed("\\ud83d") == ""
+    assert extractor.feed("\\ude0") == ""
+    assert extractor.feed('0"}') == "😀"
+    assert extractor.done
+
+
+def test_lone_surrogates_are_replaced():
+    out, _ = _feed_all(['{"answer_html": "a\\ud83d b \\ude00 c"}'])
+    assert out == "a\ufffd b \ufffd c"
+    out.encode("utf-8")
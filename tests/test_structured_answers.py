@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires des réponses déterministes (Backend/structured_answers.py).
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from place_index import PlaceIndex
+from structured_answers import StructuredAnswerEngine
+
+RPE_DATA = {
+    "rpe_list": [
+        {
+            "nom": "RPE Babillages",
+            "secteurs": ["Ouest", "Etouvie"],
+            "adresse": "1 RUE DE FLANDRES 80000 AMIENS",
+            "telephone": "03 22 97 11 04",
+            "email": "babillages@example.org",
+            "url": "https://example.org/babillages",
+        },
+        {
+            "nom": "RPE Pigeon Vole",
+            "secteurs": ["Nord"],
+            "adresse": "5 RUE DE LA ROCHEFOUCAULD 80000 AMIENS",
+            "telephone": "03 22 97 15 26",
+            "email": "pigeon@example.org",
+            "url": "https://example.org/pigeon-vole",
+        },
+        {
+            "nom": "RPE Itinérant",
+            "secteurs": ["Centre", "St Leu", "centre-ville"],
+            "adresse": "12 RUE DES TROIS CAILLOUX 80000 AMIENS",
+            "telephone": "03 22 97 40 40",
+            "email": "itinerant@example.org",
+            "url": "https://example.org/itinerant",
+        },
+    ]
+}
+LIEUX_DATA = {"lieux": [{"nom": "Espace Dewailly", "adresse": "Place Dewailly, 80000 Amiens", "url": None}]}
+ECOLES_DATA = {
+    "ecoles": [
+        {"nom": "École primaire Réaumur", "adresse": "Rue Reaumur, 80000 Amiens"},
+        {"nom": "École maternelle Réaumur", "adresse": "Rue Reaumur, 80000 Amiens"},
+        {"nom": "École maternelle Jules Verne", "adresse": "Rue d'Abbeville, 80000 Amiens"},
+        {"nom": "Collège Jules Verne", "adresse": "Rue Jules Verne, 80136 Rivery"},
+    ]
+}
+
+
+def make_engine():
+    return StructuredAnswerEngine(PlaceIndex(RPE_DATA, LIEUX_DATA, ECOLES_DATA))
+
+
+def test_rpe_by_name_and_by_sector():
+    engine = make_engine()
+    result = engine.answer("Quel est le téléphone du RPE Babillages ?")
+    assert result["kind"] == "rpe"
+    assert "03 22 97 11 04" in result["answer_html"]
+    assert result["sources"] == [{"title": "RPE Babillages", "url": "https://example.org/babillages"}]
+
+    result = engine.answer("contact du relais du secteur Nord")
+    assert "Pigeon Vole" in result["answer_text"]
+    result = engine.answer("Téléphone du RPE du secteur centre-ville")
+    assert "Itinérant" in result["answer_text"]
+    result = engine.answer("Comment joindre le relais de St Leu ?")
+    assert "Itinérant" in result["answer_text"]
+
+
+def test_generic_sector_words_need_a_sector_cue():
+    engine = make_engine()
+    assert engine.answer("Comment contacter le relais du centre de loisirs ?") is None
+    assert engine.answer("Téléphone du relais nord ?") is None
+
+
+def test_lieu_and_unambiguous_school():
+    engine = make_engine()
+    assert engine.answer("Adresse de l'Espace Dewailly")["answer_text"] == "Espace Dewailly : Place Dewailly, 80000 Amiens"
+    assert engine.answer("Où se trouve l'école Réaumur ?")["kind"] == "ecole"
+    # Deux établissements "Jules Verne" à des adresses différentes : pas de réponse directe
+    assert engine.answer("Où se trouve l'école Jules Verne ?") is None
+
+
+def test_lieu_and_school_cards_only_answer_address_questions():
+    engine = make_engine()
+    # Fiches sans téléphone ni email : pas de carte d'adresse pour une demande de contact
+    assert engine.answer("Quel est le numéro de téléphone de l'Espace Dewailly ?") is None
+    assert engine.answer("Comment contacter l'école Réaumur ?") is None
+    assert engine.answer("Adresse et téléphone de l'Espace Dewailly") is None
+    assert engine.answer("Où est l'Espace Dewailly ?")["kind"] == "lieu"
+
+
+def test_other_intents_and_negation_skip_the_shortcut():
+    engine = make_engine()
+    assert engine.answer("adresse pour s'inscrire en crèche à l'Espace Dewailly, et quels documents ?") is None
+    assert engine.answer("Adresse de l'Espace Dewailly et quels horaires ?") is None
+    assert engine.answer("Comment contacter l'école Réaumur pour une inscription ?") is None
+    assert engine.answer("Je cherche un autre relais que le RPE Babillages, contact ?") is None
+    assert engine.answer("Contact d'un relais du secteur Ouest sauf le RPE Babillages") is None
+    assert engine.answer("Ce n'est pas l'adresse du RPE Pigeon Vole ?") is None
+
+
+def test_falls_back_to_rag_when_not_confident():
+    engine = make_engine()
+    assert engine.answer("Quel est le tarif de la cantine ?") is None
+    assert engine.answer("Contact RPE") is None
+    assert engine.answer("Babillages") is None
+    assert engine.answer("Téléphone du RPE Babillages ?", has_history=True) is None
+    long_question = "Pouvez-vous me donner le téléphone du RPE Babillages " + "et aussi " * 10
+    assert engine.answer(long_question) is None
+
+
+def test_stats_report_absorbed_fraction():
+    engine = make_engine()
+    engine.answer("Téléphone du RPE Babillages")
+    engine.answer("Adresse de l'Espace Dewailly")
+    engine.answer("Quel est le tarif de la cantine ?")
+    engine.answer("Comment inscrire mon enfant ?")
+    stats = engine.stats()
+    assert stats["requests"] == 4
+    assert stats["answered"] == 2
+    assert stats["absorbed_fraction"] == 0.5
+    assert stats["by_kind"] == {"rpe": 1, "lieu": 1}
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests de Backend/text_normalize.py : sortie identique à l'ancienne boucle caractère par
+caractère (serveur et tools/curate_segments.py), sur du texte aléatoire et sur le corpus.
+"""
+import json
+import random
+import string
+import sys
+import unicodedata
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from cache import QueryMemo
+from text_normalize import fold_case_space, normalize_many, normalize_text, normalize_text_alnum
+
+LEET = str.maketrans({"0": "o", "1": "i", "2": "z", "3": "e", "4": "a", "5": "s", "6": "g", "7": "t", "8": "b", "9": "g"})
+
+
+def _legacy_strip_accents(text):
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+def _legacy(text, keep):
+    if not text:
+        return ""
+    replaced = _legacy_strip_accents(text.lower()).translate(LEET)
+    cleaned_chars = []
+    last_char = ""
+    repeat_count = 0
+    for char in replaced:
+        if keep(char):
+            if char == last_char:
+                repeat_count += 1
+                if repeat_count >= 3:
+                    continue
+            else:
+                repeat_count = 1
+                last_char = char
+            cleaned_chars.append(char)
+        else:
+            cleaned_chars.append(" ")
+            last_char = ""
+            repeat_count = 0
+    return " ".join("".join(cleaned_chars).split())
+
+
+def legacy_normalize(text):
+    """Ancien _normalize de Backend/rag_assistant_server.py."""
+    return _legacy(text, lambda char: char in string.ascii_lowercase or char.isdigit() or char.isspace())
+
+
+def legacy_curate_normalize(text):
+    """Ancien normalize de tools/curate_segments.py."""
+    return _legacy(text, lambda char: char.isalnum() or char.isspace())
+
+
+ALPHABET = (
+    "aaabbeeeoo  AEZ019\t\n.,;:!?'’-–/€$%()«»"
+    "éèêëÉÈàâÀçÇôöîïûüùœŒæßøØñ"
+    "   ​\x1c"
+    "̧́̈"
+    "²³½①ﬁﬀİıΣσςЖж٣३🙂"
+)
+
+
+def _random_texts(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 60)))
+
+
+def test_normalize_text_matches_legacy_on_random_text():
+    for text in _random_texts(5000):
+        assert normalize_text(text) == legacy_normalize(text), repr(text)
+
+
+def test_normalize_text_alnum_matches_curate_legacy():
+    for text in _random_texts(3000, seed=1):
+        assert normalize_text_alnum(text) == legacy_curate_normalize(text), repr(text)
+
+
+def test_normalize_text_edge_cases():
+    for text in (None, "", "   ", "aaaa", "éééé", "ééé", "1111", "Pré-inscription 2024/2025 !!!"):
+        assert normalize_text(text) == legacy_normalize(text)
+    assert normalize_text("Pré-inscription 2024/2025 !!!") == "pre inscription zoza zozs"
+
+
+def test_normalize_many_matches_corpus():
+    metadata_path = ROOT / "ML" / "data" / "corpus_metadata.json"
+    with metadata_path.open(encoding="utf-8") as f:
+        contents = [meta.get("content") for meta in json.load(f)][:400]
+    contents.append(None)
+    assert normalize_many(contents) == [legacy_normalize(text) for text in contents]
+
+
+def test_fold_case_space_keeps_digits_apart():
+    assert fold_case_space("  Quotient   6 ") == fold_case_space("quotient 6") == "quotient 6"
+    # normalize_text confond les deux questions ("quotient g"), pas la clé du mémo d'embeddings
+    assert normalize_text("quotient 6") == normalize_text("quotient 9")
+    assert fold_case_space("Tarif quotient 6 ?") != fold_case_space("Tarif quotient 9 ?")
+    memo = QueryMemo()
+    encoded = []
+    for question in ("Tarif quotient 6 ?", "tarif  QUOTIENT 6 ?", "Tarif quotient 9 ?"):
+        memo.get_or_compute(fold_case_space(question), lambda question=question: encoded.append(question))
+    assert encoded == ["Tarif quotient 6 ?", "Tarif quotient 9 ?"]
+    assert fold_case_space(None) == ""
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests unitaires de la recherche vectorielle (Backend/vector_index.py).
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from corpus_artifacts import load_embedding_store, save_embedding_store
+from vector_index import (
+    ExactIndex,
+    IVFIndex,
+    ivf_index_path,
+    load_vector_index,
+    recall_at_k,
+    top_k,
+    train_ivf,
+)
+
+
+def _clustered_vectors(n_clusters=8, per_cluster=40, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    vectors = np.repeat(centers, per_cluster, axis=0) + 0.1 * rng.normal(size=(n_clusters * per_cluster, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _store(tmp_path, vectors, name="corpus_embeddings.npy", corpus_hash="hash-a"):
+    path = tmp_path / name
+    save_embedding_store(path, vectors, model_name="test-model", corpus_hash=corpus_hash, dtype="float16")
+    return load_embedding_store(path), path
+
+
+def test_top_k_orders_best_scores_first():
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3], dtype=np.float32)
+    assert top_k(scores, 3).tolist() == [1, 3, 2]
+    assert top_k(scores, 10).tolist() == [1, 3, 2, 4, 0]
+    assert top_k(scores, 0).size == 0
+
+
+def test_exact_index_matches_brute_force(tmp_path):
+    vectors = _clustered_vectors()
+    store, _ = _store(tmp_path, vectors)
+    query = vectors[17]
+    indices, scores = ExactIndex(store).search(query, 5)
+
+    expected = np.argsort(-(store.rows(np.arange(len(store))) @ query), kind="stable")[:5]
+    assert set(indices.tolist()) == set(expected.tolist())
+    assert 17 in indices.tolist()
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_ivf_training_covers_every_vector_and_recalls_neighbours(tmp_path):
+    vectors = _clustered_vectors()
+    store, path = _store(tmp_path, vectors)
+    index = train_ivf(store, n_lists=8, nprobe=2, corpus_hash="hash-a")
+
+    assert index.n_lists == 8
+    assert int(index.list_offsets[-1]) == len(store)
+    assert sorted(index.list_ids.tolist()) == list(range(len(store)))
+
+    queries = vectors[::20]
+    assert recall_at_k(index, ExactIndex(store), queries, k=5, nprobe=2) >= 0.95
+
+    index.save(ivf_index_path(path))
+    loaded = load_vector_index("ivf", store, path, nprobe=2, corpus_hash="hash-a")
+    assert isinstance(loaded, IVFIndex)
+    assert np.array_equal(loaded.list_ids, index.list_ids)
+
+
+def test_stale_ivf_file_falls_back_to_exact_search(tmp_path):
+    vectors = _clustered_vectors()
+    store, path = _store(tmp_path, vectors)
+    train_ivf(store, n_lists=8, corpus_hash="hash-a").save(ivf_index_path(path))
+
+    # Corpus reconstruit avec moins de segments, ancien .ivf.npz resté sur le disque
+    smaller, _ = _store(tmp_path, vectors[:100], corpus_hash="hash-b")
+    assert isinstance(load_vector_index("ivf", smaller, path, corpus_hash="hash-b"), ExactIndex)
+
+    # Autre corpus de même taille
+    assert isinstance(load_vector_index("ivf", store, path, corpus_hash="hash-b"), ExactIndex)
+
+    # Fichier illisible
+    ivf_index_path(path).write_bytes(b"pas un npz")
+    assert isinstance(load_vector_index("ivf", store, path, corpus_hash="hash-a"), ExactIndex)
+
+
+def test_missing_ivf_file_falls_back_to_exact_search(tmp_path):
+    store, path = _store(tmp_path, _clustered_vectors())
+    assert isinstance(load_vector_index("ivf", store, path), ExactIndex)
+    assert isinstance(load_vector_index("exact", store, path), ExactIndex)
@@ -1,34 +1,67 @@
 #!/usr/bin/env python3
 """
 Système de récupération d'adresses : Site → OSM → Google Maps (fallback)
+
+AddressService garde le cache en mémoire (lieux_cache.json lu une seule fois), écrit le
+fichier par lots (écriture atomique, au plus une fois par ADDRESS_FLUSH_INTERVAL
+secondes), mémorise les échecs pendant ADDRESS_NEGATIVE_TTL secondes et peut lancer les
+recherches OSM en arrière-plan : la requête en cours n'attend pas Nominatim (timeout
+10 s) et utilise le lien vers la carte ; l'adresse sera disponible pour les suivantes.
 """
+import atexit
 import json
+import os
 import re
+import tempfile
+import threading
+import time
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Callable, Optional, List, Dict, Any, Sequence
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 ROOT = Path(__file__).resolve().parents[1]
 CACHE_PATH = ROOT / "data" / "lieux_cache.json"
 
+# Serveur Nominatim (surchargeable : miroir, instance locale, serveur de test)
+NOMINATIM_URL = os.environ.get("NOMINATIM_URL", "https://nominatim.openstreetmap.org")
+
+# Durée pendant laquelle un lieu introuvable n'est pas recherché à nouveau (secondes)
+ADDRESS_NEGATIVE_TTL = float(os.environ.get("ADDRESS_NEGATIVE_TTL", 24 * 3600))
+# Délai de regroupement des écritures de lieux_cache.json (secondes)
+ADDRESS_FLUSH_INTERVAL = float(os.environ.get("ADDRESS_FLUSH_INTERVAL", 5.0))
+# Recherches en arrière-plan en attente au maximum (au-delà, le lieu est ignoré pour cette requête)
+MAX_PENDING_LOOKUPS = 32
+
 # Charger cache
-def load_cache() -> Dict[str, str]:
+def load_cache(path: Path = CACHE_PATH) -> Dict[str, str]:
     """Charge le cache d'adresses."""
-    if CACHE_PATH.exists():
+    if path.exists():
         try:
-            with CACHE_PATH.open("r", encoding="utf-8") as f:
+            with path.open("r", encoding="utf-8") as f:
                 return json.load(f)
         except:
             return {}
     return {}
 
-def save_cache(cache: Dict[str, str]):
-    """Sauvegarde le cache."""
-    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with CACHE_PATH.open("w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False, indent=2)
+def save_cache(cache: Dict[str, str], path: Path = CACHE_PATH):
+    """Sauvegarde le cache (fichier temporaire puis renommage : jamais de fichier tronqué)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        # mkstemp crée le fichier en 0600 : rétablir les droits habituels d'un fichier de données
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
 
 def extract_address_from_text(text: str) -> Optional[str]:
     """Extrait une adresse depuis un texte (regex numéro + rue)."""
@@ -52,10 +85,10 @@ def extract_address_from_text(text: str) -> Optional[str]:
     
     return None
 
-def fetch_address_from_osm(lieu_nom: str, city: str = "Amiens") -> Optional[str]:
-    """Récupère l'adresse via Nominatim (OSM)."""
+def search_osm(lieu_nom: str, city: str = "Amiens", base_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Géocode un lieu via Nominatim (OSM) : {"adresse", "lat", "lon"} ou None."""
     try:
-        url = "https://nominatim.openstreetmap.org/search"
+        url = f"{(base_url or NOMINATIM_URL).rstrip('/')}/search"
         params = {
             "q": f"{lieu_nom} {city}",
             "format": "json",
@@ -72,6 +105,7 @@ def fetch_address_from_osm(lieu_nom: str, city: str = "Amiens") -> Optional[str]
             if data:
                 result = data[0]
                 # Construire adresse complète
+                address = None
                 address_parts = []
                 if result.get("address", {}).get("house_number"):
                     address_parts.append(result["address"]["house_number"])
@@ -79,61 +113,222 @@ def fetch_address_from_osm(lieu_nom: str, city: str = "Amiens") -> Optional[str]
                     address_parts.append(result["address"]["road"])
                 if address_parts:
                     address = " ".join(address_parts) + f", {city}"
-                    return address
                 elif result.get("display_name"):
-                    return result["display_name"]
+                    address = result["display_name"]
+                if address:
+                    return {
+                        "adresse": address,
+                        "lat": float(result["lat"]) if result.get("lat") else None,
+                        "lon": float(result["lon"]) if result.get("lon") else None,
+                    }
     except Exception as e:
         print(f"⚠️ Erreur OSM: {e}")
     
     return None
 
+def fetch_address_from_osm(lieu_nom: str, city: str = "Amiens", base_url: Optional[str] = None) -> Optional[str]:
+    """Récupère l'adresse via Nominatim (OSM)."""
+    result = search_osm(lieu_nom, city, base_url)
+    return result["adresse"] if result else None
+
 def fetch_address_from_google_maps(lieu_nom: str, city: str = "Amiens") -> Optional[str]:
     """Récupère l'adresse via Google Maps API (fallback)."""
     # Note: Nécessite une clé API Google Maps
     # Pour l'instant, retourne None (à implémenter si nécessaire)
     return None
 
+def find_address_in_segments(lieu_nom: str, segments_rag: Optional[List[Any]]) -> Optional[str]:
+    """Adresse extraite du premier segment RAG qui cite le lieu."""
+    for seg in segments_rag or []:
+        content = getattr(seg, "content", "") or getattr(seg, "excerpt", "") or ""
+        if lieu_nom.lower() in content.lower():
+            address = extract_address_from_text(content)
+            if address:
+                return address
+    return None
+
+
+class AddressService:
+    """
+    Cache d'adresses en mémoire + persistance par lots + cache négatif + recherches
+    externes (OSM, Google Maps) en arrière-plan.
+    """
+
+    def __init__(
+        self,
+        cache_path: Path = CACHE_PATH,
+        negative_ttl: float = ADDRESS_NEGATIVE_TTL,
+        flush_interval: float = ADDRESS_FLUSH_INTERVAL,
+        fetchers: Optional[Sequence[Callable[[str, str], Optional[str]]]] = None,
+        max_pending: int = MAX_PENDING_LOOKUPS,
+    ):
+        self.cache_path = Path(cache_path)
+        self.negative_ttl = negative_ttl
+        self.flush_interval = flush_interval
+        self.fetchers = list(fetchers) if fetchers is not None else [fetch_address_from_osm, fetch_address_from_google_maps]
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._addresses: Optional[Dict[str, str]] = None
+        self._misses: Dict[str, float] = {}
+        self._pending: Dict[str, Future] = {}
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+        # Un seul thread : Nominatim demande au plus une requête par seconde et par client
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="address-lookup")
+        self.stats = {"hits": 0, "segment_hits": 0, "negative_hits": 0, "lookups": 0, "lookup_failures": 0, "skipped": 0}
+
+    def _cache(self) -> Dict[str, str]:
+        # Appelé sous self._lock
+        if self._addresses is None:
+            self._addresses = load_cache(self.cache_path)
+        return self._addresses
+
+    def cached(self, lieu_nom: str) -> Optional[str]:
+        with self._lock:
+            return self._cache().get(lieu_nom.lower())
+
+    def remember(self, lieu_nom: str, address: str) -> None:
+        """Enregistre une adresse ; l'écriture disque est regroupée avec les suivantes."""
+        key = lieu_nom.lower()
+        with self._lock:
+            cache = self._cache()
+            self._misses.pop(key, None)
+            if cache.get(key) == address:
+                return
+            cache[key] = address
+            self._dirty = True
+            if self.flush_interval <= 0:
+                timer = None
+            elif self._flush_timer is None:
+                timer = self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                timer.daemon = True
+            else:
+                return
+        if timer is None:
+            self.flush()
+        else:
+            timer.start()
+
+    def flush(self) -> None:
+        """Écrit le cache sur disque s'il a changé."""
+        with self._lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+            snapshot = dict(self._cache())
+            self._dirty = False
+        try:
+            save_cache(snapshot, self.cache_path)
+        except Exception as e:
+            print(f"⚠️ Impossible d'écrire le cache d'adresses: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def _is_known_miss(self, key: str) -> bool:
+        # Appelé sous self._lock
+        expires = self._misses.get(key)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        del self._misses[key]
+        return False
+
+    def _lookup(self, lieu_nom: str, city: str) -> Optional[str]:
+        key = lieu_nom.lower()
+        try:
+            for fetcher in self.fetchers:
+                try:
+                    address = fetcher(lieu_nom, city)
+                except Exception as e:
+                    print(f"⚠️ Erreur recherche adresse ({lieu_nom}): {e}")
+                    address = None
+                if address:
+                    self.remember(lieu_nom, address)
+                    return address
+            with self._lock:
+                self.stats["lookup_failures"] += 1
+                self._misses[key] = time.monotonic() + self.negative_ttl
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def get(
+        self,
+        lieu_nom: str,
+        segments_rag: Optional[List[Any]] = None,
+        city: str = "Amiens",
+        wait: bool = True,
+    ) -> Optional[str]:
+        """
+        Adresse d'un lieu : cache mémoire → segments RAG → OSM → Google Maps.
+        wait=False : la recherche externe part en arrière-plan et None est renvoyé tout de suite.
+        """
+        key = lieu_nom.lower()
+        with self._lock:
+            address = self._cache().get(key)
+            if address:
+                self.stats["hits"] += 1
+                return address
+
+        address = find_address_in_segments(lieu_nom, segments_rag)
+        if address:
+            with self._lock:
+                self.stats["segment_hits"] += 1
+            self.remember(lieu_nom, address)
+            return address
+
+        with self._lock:
+            if self._is_known_miss(key):
+                self.stats["negative_hits"] += 1
+                return None
+            future = self._pending.get(key)
+            if future is None:
+                if len(self._pending) >= self.max_pending:
+                    self.stats["skipped"] += 1
+                    return None
+                self.stats["lookups"] += 1
+                future = self._executor.submit(self._lookup, lieu_nom, city)
+                self._pending[key] = future
+        if not wait:
+            return None
+        return future.result()
+
+    def drain(self, timeout: Optional[float] = None) -> None:
+        """Attend la fin des recherches en cours (tests, arrêt du serveur) puis écrit le cache."""
+        with self._lock:
+            pending = list(self._pending.values())
+        wait(pending, timeout=timeout)
+        self.flush()
+
+
+_address_service: Optional[AddressService] = None
+_address_service_lock = threading.Lock()
+
+
+def get_address_service() -> AddressService:
+    """Service partagé du processus (cache lieux_cache.json)."""
+    global _address_service
+    with _address_service_lock:
+        if _address_service is None:
+            _address_service = AddressService()
+            atexit.register(_address_service.flush)
+        return _address_service
+
+
 def get_address_for_lieu(
     lieu_nom: str,
     segments_rag: Optional[List[Any]] = None,
-    city: str = "Amiens"
+    city: str = "Amiens",
+    wait: bool = True,
 ) -> Optional[str]:
     """
     Récupère l'adresse d'un lieu : Site → OSM → Google Maps.
     Sauvegarde dans cache pour réutilisation.
+    wait=False (chemin des requêtes du serveur) : ne bloque jamais sur OSM.
     """
-    cache = load_cache()
-    
-    # Vérifier cache d'abord
-    if lieu_nom.lower() in cache:
-        return cache[lieu_nom.lower()]
-    
-    # 1. Chercher dans segments RAG
-    if segments_rag:
-        for seg in segments_rag:
-            content = getattr(seg, "content", "") or getattr(seg, "excerpt", "") or ""
-            if lieu_nom.lower() in content.lower():
-                address = extract_address_from_text(content)
-                if address:
-                    cache[lieu_nom.lower()] = address
-                    save_cache(cache)
-                    return address
-    
-    # 2. Si pas trouvé, chercher sur OSM
-    address = fetch_address_from_osm(lieu_nom, city)
-    if address:
-        cache[lieu_nom.lower()] = address
-        save_cache(cache)
-        return address
-    
-    # 3. Fallback Google Maps (si implémenté)
-    address = fetch_address_from_google_maps(lieu_nom, city)
-    if address:
-        cache[lieu_nom.lower()] = address
-        save_cache(cache)
-        return address
-    
-    return None
+    return get_address_service().get(lieu_nom, segments_rag=segments_rag, city=city, wait=wait)
 
 if __name__ == "__main__":
     # Test
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Compare le moteur BM25F NumPy (Backend/bm25_index.py) à l'index Whoosh du serveur.
+
+Pour chaque question du jeu de test (tests/rag_eval_results.csv et listes TEST_QUESTIONS
+des scripts de tests/), compare les top-k des deux moteurs :
+  - mêmes documents dans le même ordre, recouvrement des top-k,
+  - écart maximal des scores.
+Puis mesure la latence moyenne par requête (analyse de la question comprise).
+
+Usage :
+  python tools/benchmark_bm25.py
+  python tools/benchmark_bm25.py --metadata ML/data/corpus_metadata_generalized.json --top-k 20
+"""
+import argparse
+import ast
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from bm25_index import DEFAULT_B, DEFAULT_K1, BM25Index, build_bm25_columns
+from corpus_artifacts import compute_corpus_hash, open_or_build_whoosh_index, whoosh_index_dir
+from whoosh import scoring
+from whoosh.qparser import MultifieldParser, OrGroup
+
+METADATA_PATH = ROOT / "ML" / "data" / "corpus_metadata.json"
+QUESTION_FILES = (
+    "tests/test_40_questions_complet.py",
+    "tests/test_questions_ou_quand_comment.py",
+    "tests/test_rag_series.py",
+    "tests/test_rag_questions.py",
+)
+# Écart de score toléré : arrondi flottant (ordre des additions différent de Whoosh).
+# Un "?" collé à un mot ("cantine?") est un joker pour Whoosh mais pas pour le moteur
+# NumPy (voir BM25Index.query_terms) : ces questions apparaissent en classement différent.
+SCORE_TOLERANCE = 1e-6
+
+
+def load_questions() -> List[str]:
+    questions: List[str] = []
+    csv_path = ROOT / "tests" / "rag_eval_results.csv"
+    if csv_path.exists():
+        with csv_path.open(encoding="utf-8") as f:
+            questions.extend(row["question"] for row in csv.DictReader(f) if row.get("question"))
+    for name in QUESTION_FILES:
+        path = ROOT / name
+        if not path.exists():
+            continue
+        for node in ast.parse(path.read_text(encoding="utf-8")).body:
+            if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) in ("TEST_QUESTIONS", "QUESTIONS"):
+                for item in ast.literal_eval(node.value):
+                    questions.append(item["question"] if isinstance(item, dict) else item)
+    return list(dict.fromkeys(question for question in questions if question))
+
+
+def whoosh_search(index, question: str, limit: int) -> List[Tuple[int, float]]:
+    parser = MultifieldParser(["label", "content"], schema=index.schema, group=OrGroup)
+    query = parser.parse(question)
+    with index.searcher(weighting=scoring.BM25F(B=DEFAULT_B, K1=DEFAULT_K1)) as searcher:
+        return [(int(hit["id"]), float(hit.score or 0.0)) for hit in searcher.search(query, limit=limit)]
+
+
+def numpy_search(index: BM25Index, question: str, limit: int) -> List[Tuple[int, float]]:
+    indices, scores = index.search(question, limit)
+    return list(zip(indices.tolist(), scores.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison et benchmark BM25 NumPy / Whoosh")
+    parser.add_argument("--metadata", type=Path, default=METADATA_PATH, help="corpus_metadata.json")
+    parser.add_argument("--top-k", type=int, default=10, help="Résultats comparés (semantic_search : top_k * 2)")
+    parser.add_argument("--repeat", type=int, default=5, help="Passages sur le jeu de questions pour la latence")
+    args = parser.parse_args()
+
+    with args.metadata.open(encoding="utf-8") as f:
+        metadata = json.load(f)
+    corpus_hash = compute_corpus_hash(metadata)
+    whoosh_index, _ = open_or_build_whoosh_index(whoosh_index_dir(args.metadata), metadata, corpus_hash)
+    started = time.perf_counter()
+    engine = BM25Index(build_bm25_columns(metadata, corpus_hash))
+    build_s = time.perf_counter() - started
+    questions = load_questions()
+    print(f"📂 {len(metadata)} segments, {len(questions)} questions")
+    print(f"✅ Index NumPy construit en {build_s:.2f} s : {engine.stats()}")
+
+    same_order = 0
+    overlap_total = 0.0
+    max_score_gap = 0.0
+    for question in questions:
+        expected = whoosh_search(whoosh_index, question, args.top_k)
+        found = numpy_search(engine, question, args.top_k)
+        expected_ids = [doc for doc, _ in expected]
+        found_ids = [doc for doc, _ in found]
+        if expected_ids == found_ids:
+            same_order += 1
+            gap = max((abs(a - b) for (_, a), (_, b) in zip(expected, found)), default=0.0)
+            if gap > SCORE_TOLERANCE:
+                print(f"   ≈ scores différents ({gap:.4f}) : {question!r}")
+            max_score_gap = max(max_score_gap, gap)
+        else:
+            print(f"   ≠ classement différent : {question!r}")
+        overlap_total += len(set(expected_ids) & set(found_ids)) / len(expected_ids) if expected_ids else 1.0
+    status = "✅" if same_order == len(questions) else "⚠️"
+    print(
+        f"{status} Top-{args.top_k} identiques : {same_order}/{len(questions)} | "
+        f"recouvrement moyen {overlap_total / max(len(questions), 1):.4f} | écart de score max {max_score_gap:.2e}"
+    )
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for question in questions:
+            whoosh_search(whoosh_index, question, args.top_k)
+    whoosh_ms = (time.perf_counter() - started) * 1000 / (args.repeat * len(questions))
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for question in questions:
+            numpy_search(engine, question, args.top_k)
+    numpy_ms = (time.perf_counter() - started) * 1000 / (args.repeat * len(questions))
+    status = "✅" if whoosh_ms >= 10 * numpy_ms else "⚠️"
+    print(f"{status} Latence : Whoosh {whoosh_ms:.3f} ms | NumPy {numpy_ms:.3f} ms ({whoosh_ms / numpy_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Compare la fusion vectorisée (Backend/score_fusion.py) à l'ancienne fusion par
+dictionnaire de semantic_search.
+
+Les résultats des moteurs sont simulés sur le vrai corpus (indices de segments tirés au
+hasard, scores BM25 et cosinus plausibles) avec les vrais termes du lexique : on mesure
+la fusion seule, sans Whoosh ni modèle d'embeddings.
+
+Vérifie que le mode "legacy" donne exactement le même classement que l'ancien code,
+puis affiche la latence moyenne par requête de chaque mode.
+
+Usage :
+  python tools/benchmark_fusion.py
+  python tools/benchmark_fusion.py --candidates 200 --top-k 20 --queries 2000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from corpus_artifacts import (
+    build_normalized_columns,
+    compute_corpus_hash,
+    load_normalized_columns,
+    normalized_columns_path,
+)
+from score_fusion import FUSION_MODES, FUSION_WEIGHTS, LexiconBoostMatrix, RetrieverRun, fuse_scores
+from text_normalize import normalize_text
+
+METADATA_PATH = ROOT / "ML" / "data" / "corpus_metadata.json"
+LEXICON_PATH = ROOT / "Backend" / "I-AMIENS" / "data" / "lexique_enfance.json"
+
+
+def legacy_fusion(
+    bm25: List[Tuple[int, float]],
+    vector: List[Tuple[int, float]],
+    normalized_terms: Sequence[str],
+    corpus_normalized: Sequence[str],
+    top_k: int,
+) -> List[Tuple[int, float]]:
+    """Ancienne fusion de semantic_search (dictionnaire par identifiant texte + tri complet)."""
+    weights: Dict[str, float] = {}
+    for doc, score in bm25:
+        doc_id = str(doc)
+        bm25_weight = score * 1.0
+        if normalized_terms:
+            normalized_content = corpus_normalized[int(doc_id)]
+            term_hits = sum(1 for term in normalized_terms if term and term in normalized_content)
+            if term_hits:
+                bm25_weight += term_hits * 2.5
+        weights[doc_id] = weights.get(doc_id, 0.0) + bm25_weight
+    for doc, score in vector:
+        doc_id = str(doc)
+        weights[doc_id] = weights.get(doc_id, 0.0) + score * 0.6
+    ranked = sorted(weights.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [(int(doc_id), score) for doc_id, score in ranked]
+
+
+def load_corpus(metadata_path: Path) -> List[str]:
+    with metadata_path.open(encoding="utf-8") as f:
+        metadata = json.load(f)
+    corpus_hash = compute_corpus_hash(metadata)
+    columns = load_normalized_columns(normalized_columns_path(metadata_path), corpus_hash)
+    if columns is None:
+        columns = build_normalized_columns(metadata, corpus_hash)
+    return columns["content"]
+
+
+def load_terms(lexicon_path: Path) -> List[str]:
+    with lexicon_path.open(encoding="utf-8") as f:
+        data = json.load(f)
+    terms = []
+    for entry in data.get("lexique_enfance", []):
+        terms.extend(normalize_text(term) for term in entry.get("terme_admin") or [] if term)
+    return [term for term in terms if term]
+
+
+def make_queries(
+    n_docs: int,
+    terms: List[str],
+    n_queries: int,
+    candidates: int,
+    seed: int,
+) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        bm25_docs = rng.sample(range(n_docs), candidates)
+        # Recouvrement partiel des deux moteurs, comme en pratique
+        vector_docs = rng.sample(bm25_docs, candidates // 2) + rng.sample(range(n_docs), candidates - candidates // 2)
+        vector_docs = list(dict.fromkeys(vector_docs))
+        bm25 = sorted(((doc, round(rng.uniform(1.0, 40.0), 4)) for doc in bm25_docs), key=lambda hit: -hit[1])
+        vector = sorted(((doc, round(rng.uniform(0.2, 0.8), 4)) for doc in vector_docs), key=lambda hit: -hit[1])
+        query_terms = rng.sample(terms, rng.randint(0, min(3, len(terms)))) if terms else []
+        queries.append({"bm25": bm25, "vector": vector, "terms": query_terms})
+    return queries
+
+
+def runs_for(query: Dict[str, Any], mode: str) -> List[RetrieverRun]:
+    weights = FUSION_WEIGHTS[mode]
+    bm25_docs, bm25_scores = zip(*query["bm25"])
+    vector_docs, vector_scores = zip(*query["vector"])
+    return [
+        RetrieverRun(np.array(bm25_docs, dtype=np.int64), np.array(bm25_scores), weights["bm25"], lexicon_boost=True),
+        RetrieverRun(np.array(vector_docs, dtype=np.int64), np.array(vector_scores), weights["vector"]),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la fusion des scores de recherche")
+    parser.add_argument("--metadata", type=Path, default=METADATA_PATH, help="corpus_metadata.json")
+    parser.add_argument("--lexicon", type=Path, default=LEXICON_PATH, help="lexique_enfance.json")
+    parser.add_argument("--queries", type=int, default=1000, help="Nombre de requêtes simulées")
+    parser.add_argument("--candidates", type=int, default=10, help="Résultats par moteur (semantic_search : top_k * 2)")
+    parser.add_argument("--top-k", type=int, default=5, help="Nombre de résultats fusionnés")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus_normalized = load_corpus(args.metadata)
+    terms = load_terms(args.lexicon)
+    started = time.perf_counter()
+    matrix = LexiconBoostMatrix(corpus_normalized, terms)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"📂 {len(corpus_normalized)} segments, {len(terms)} termes du lexique")
+    print(f"✅ Matrice de bonus lexical : {matrix.stats()} en {build_ms:.1f} ms")
+
+    queries = make_queries(len(corpus_normalized), terms, args.queries, args.candidates, args.seed)
+
+    mismatches = 0
+    for query in queries:
+        expected = legacy_fusion(query["bm25"], query["vector"], query["terms"], corpus_normalized, args.top_k)
+        indices, scores = fuse_scores(runs_for(query, "legacy"), args.top_k, "legacy", matrix, query["terms"])
+        if [doc for doc, _ in expected] != indices.tolist() or not np.allclose([s for _, s in expected], scores):
+            mismatches += 1
+    status = "✅" if mismatches == 0 else "❌"
+    print(f"{status} Mode legacy : {mismatches}/{len(queries)} classement(s) différent(s) de l'ancien code")
+
+    started = time.perf_counter()
+    for query in queries:
+        legacy_fusion(query["bm25"], query["vector"], query["terms"], corpus_normalized, args.top_k)
+    reference_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    print(f"   - ancien code (dictionnaire)  : {reference_ms:.4f} ms/requête")
+    for mode in FUSION_MODES:
+        prepared = [(runs_for(query, mode), query["terms"]) for query in queries]
+        started = time.perf_counter()
+        for runs, query_terms in prepared:
+            fuse_scores(runs, args.top_k, mode, matrix, query_terms)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        print(f"   - fuse_scores {mode:<15} : {elapsed_ms:.4f} ms/requête ({reference_ms / elapsed_ms:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
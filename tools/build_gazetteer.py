@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Construit hors ligne le gazetteer des lieux (ML/data/gazetteer.json).
+
+Rassemble les lieux nommés de lieux_importants.json, ecoles_amiens.json,
+rpe_contacts.json et du corpus (corpus_metadata.json), puis complète adresses et
+coordonnées via Nominatim :
+  - coordonnées sans adresse → reverse geocoding (complete_school_addresses),
+  - pas de coordonnées → recherche par adresse ou par nom (address_fetcher).
+Une requête au plus toutes les --delay secondes (politesse Nominatim). Les entrées déjà
+résolues dans le gazetteer existant sont reprises sans appel réseau.
+
+Le serveur charge le fichier en lecture seule (Backend/place_index.py) : le géocodage
+au moment de la requête ne sert plus qu'aux lieux absents du gazetteer.
+
+Usage :
+  python tools/build_gazetteer.py
+  python tools/build_gazetteer.py --nominatim-url http://localhost:8080 --delay 0
+  python tools/build_gazetteer.py --offline   # aucune requête réseau
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+sys.path.insert(0, str(ROOT))
+
+from place_index import MIN_SCHOOL_KEY_CHARS, school_key
+from text_normalize import normalize_text
+from tools.address_fetcher import NOMINATIM_URL, search_osm
+from tools.complete_school_addresses import DELAY_BETWEEN_REQUESTS, fetch_address_from_coordinates
+
+DATA_DIR = ROOT / "ML" / "data"
+OUTPUT_PATH = DATA_DIR / "gazetteer.json"
+# Incrémenter si le format des entrées change
+GAZETTEER_VERSION = 1
+
+# Noms de lieux dans le corpus : mot déclencheur puis noms propres (majuscule initiale)
+CORPUS_PLACE_RE = re.compile(
+    r"\b(?i:espace|centre|salle|théâtre|médiathèque|bibliothèque|ludothèque|gymnase|stade|piscine|"
+    r"école|mairie|maison|crèche|halte-garderie|relais|parc)\s+"
+    r"(?:(?:de|du|des|d'|la|le|l')\s*)?[A-ZÉÈÊÀÂÔÙÛÇ][a-zéèêàâôùûçëïî]+"
+    r"(?:[\s-]+[A-ZÉÈÊÀÂÔÙÛÇ][a-zéèêàâôùûçëïî]+)*"
+)
+# Noms de services (et non de lieux) que le motif ci-dessus capture aussi
+CORPUS_GENERIC_NAMES = {"relais petite enfance", "centre d information", "centre accueil", "maison de la culture"}
+
+
+class RateLimiter:
+    """Espace les appels d'au moins min_interval secondes."""
+
+    def __init__(
+        self,
+        min_interval: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.min_interval = min_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._last: Optional[float] = None
+        self.calls = 0
+
+    def wait(self) -> None:
+        if self._last is not None:
+            remaining = self.min_interval - (self._clock() - self._last)
+            if remaining > 0:
+                self._sleep(remaining)
+        self._last = self._clock()
+        self.calls += 1
+
+
+def load_json(path: Path) -> Any:
+    if not path.exists():
+        print(f"⚠️ Fichier introuvable: {path}")
+        return None
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def name_keys(nom: str, kind: str) -> List[str]:
+    """Clés normalisées d'un nom : nom complet + forme courte (partie distinctive, RPE sans préfixe)."""
+    keys = [normalize_text(nom)]
+    if kind == "ecole":
+        short = school_key(nom)
+        if len(short) >= MIN_SCHOOL_KEY_CHARS:
+            keys.append(short)
+    elif kind == "rpe" and keys[0].startswith("rpe "):
+        keys.append(keys[0][4:])
+    return [key for i, key in enumerate(keys) if key and key not in keys[:i]]
+
+
+def make_entry(
+    nom: str,
+    kind: str,
+    source: str,
+    adresse: Optional[str] = None,
+    coordonnees: Optional[Dict[str, Any]] = None,
+    variantes: Optional[List[str]] = None,
+    ref: Optional[Any] = None,
+) -> Dict[str, Any]:
+    coords = coordonnees or {}
+    return {
+        "nom": nom,
+        "type": kind,
+        # Identifiant dans la source (osm_id des écoles) : distingue les homonymes
+        "ref": ref,
+        "variantes": variantes or [nom],
+        "cles": name_keys(nom, kind),
+        "adresse": adresse,
+        "lat": coords.get("lat"),
+        "lon": coords.get("lon"),
+        "source": source,
+    }
+
+
+def corpus_place_names(segments: List[Dict[str, Any]], min_count: int = 2) -> Dict[str, List[str]]:
+    """Noms de lieux du corpus (clé normalisée → variantes), vus au moins min_count fois."""
+    counts: Counter = Counter()
+    variants: Dict[str, List[str]] = {}
+    for segment in segments:
+        for match in CORPUS_PLACE_RE.findall(segment.get("content") or ""):
+            name = " ".join(match.split())
+            key = normalize_text(name)
+            if key in CORPUS_GENERIC_NAMES:
+                continue
+            counts[key] += 1
+            if name not in variants.setdefault(key, []):
+                variants[key].append(name)
+    return {key: variants[key] for key, count in counts.items() if count >= min_count}
+
+
+def collect_places(
+    lieux_data: Optional[Dict[str, Any]],
+    ecoles_data: Optional[Dict[str, Any]],
+    rpe_data: Optional[Dict[str, Any]],
+    corpus: Optional[List[Dict[str, Any]]],
+    min_corpus_count: int = 2,
+) -> List[Dict[str, Any]]:
+    entries: List[Dict[str, Any]] = []
+    for lieu in (lieux_data or {}).get("lieux", []):
+        if lieu.get("nom"):
+            entries.append(make_entry(lieu["nom"], "lieu", "lieux_importants", lieu.get("adresse"), lieu.get("coordonnees")))
+    for ecole in (ecoles_data or {}).get("ecoles", []):
+        if ecole.get("nom"):
+            entries.append(make_entry(
+                ecole["nom"], "ecole", "ecoles_amiens", ecole.get("adresse"), ecole.get("coordonnees"), ref=ecole.get("osm_id")
+            ))
+    for rpe in (rpe_data or {}).get("rpe_list", []):
+        if rpe.get("nom"):
+            entries.append(make_entry(rpe["nom"], "rpe", "rpe_contacts", rpe.get("adresse")))
+
+    known_keys = {key for entry in entries for key in entry["cles"]}
+    for key, names in corpus_place_names(corpus or [], min_corpus_count).items():
+        if key not in known_keys:
+            entries.append(make_entry(names[0], "corpus", "corpus", variantes=names))
+    return entries
+
+
+def _entry_id(entry: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    return entry["type"], entry["nom"], entry.get("source") or "", str(entry.get("ref"))
+
+
+def resolve_places(
+    entries: List[Dict[str, Any]],
+    previous: Optional[Dict[str, Any]] = None,
+    base_url: Optional[str] = None,
+    limiter: Optional[RateLimiter] = None,
+    offline: bool = False,
+    city: str = "Amiens",
+) -> Dict[str, int]:
+    """Complète adresse / coordonnées de chaque entrée. Retourne les compteurs du traitement."""
+    limiter = limiter or RateLimiter(DELAY_BETWEEN_REQUESTS)
+    resolved_before = {
+        _entry_id(entry): entry
+        for entry in (previous or {}).get("lieux", [])
+        if entry.get("adresse") and entry.get("lat") is not None
+    }
+    counts = {"reprises": 0, "reverse": 0, "recherches": 0, "echecs": 0}
+    for entry in entries:
+        if entry["adresse"] and entry["lat"] is not None:
+            continue
+        known = resolved_before.get(_entry_id(entry))
+        if known is not None:
+            entry["adresse"] = entry["adresse"] or known["adresse"]
+            entry["lat"], entry["lon"] = known["lat"], known["lon"]
+            counts["reprises"] += 1
+            continue
+        if offline:
+            continue
+
+        if entry["lat"] is not None and entry["lon"] is not None:
+            limiter.wait()
+            counts["reverse"] += 1
+            entry["adresse"] = fetch_address_from_coordinates(entry["lat"], entry["lon"], base_url=base_url)
+        else:
+            limiter.wait()
+            counts["recherches"] += 1
+            # Adresse connue (RPE) : plus précise que le nom pour obtenir les coordonnées
+            query, query_city = (entry["adresse"], "") if entry["adresse"] else (entry["nom"], city)
+            result = search_osm(query, query_city, base_url=base_url)
+            if result:
+                entry["adresse"] = entry["adresse"] or result["adresse"]
+                entry["lat"], entry["lon"] = result["lat"], result["lon"]
+        if not entry["adresse"]:
+            counts["echecs"] += 1
+    return counts
+
+
+def save_gazetteer(gazetteer: Dict[str, Any], path: Path) -> None:
+    """Écriture atomique, JSON compact (chargé à chaque démarrage du serveur)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(gazetteer, f, ensure_ascii=False, separators=(",", ":"))
+        # mkstemp crée le fichier en 0600 : rétablir les droits habituels d'un fichier de données
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def build_gazetteer(
+    data_dir: Path = DATA_DIR,
+    output_path: Path = OUTPUT_PATH,
+    base_url: Optional[str] = None,
+    delay: float = DELAY_BETWEEN_REQUESTS,
+    offline: bool = False,
+    min_corpus_count: int = 2,
+) -> Dict[str, Any]:
+    print(f"📂 Lecture des données depuis {data_dir}")
+    entries = collect_places(
+        load_json(data_dir / "lieux_importants.json"),
+        load_json(data_dir / "ecoles_amiens.json"),
+        load_json(data_dir / "rpe_contacts.json"),
+        load_json(data_dir / "corpus_metadata.json"),
+        min_corpus_count,
+    )
+    print(f"🔍 {len(entries)} lieu(x) à résoudre ({base_url or NOMINATIM_URL}, {delay:.1f} s entre requêtes)")
+    previous = load_json(output_path) if output_path.exists() else None
+    if previous and previous.get("version") != GAZETTEER_VERSION:
+        previous = None
+    counts = resolve_places(entries, previous, base_url, RateLimiter(delay), offline)
+
+    gazetteer = {
+        "version": GAZETTEER_VERSION,
+        "total": len(entries),
+        "lieux": entries,
+    }
+    save_gazetteer(gazetteer, output_path)
+    resolved = sum(1 for entry in entries if entry["adresse"])
+    print(f"✅ Gazetteer écrit: {output_path} ({resolved}/{len(entries)} avec adresse)")
+    print(f"   - Reprises du gazetteer existant: {counts['reprises']}")
+    print(f"   - Reverse geocoding: {counts['reverse']} | Recherches: {counts['recherches']} | Échecs: {counts['echecs']}")
+    return gazetteer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construit le gazetteer des lieux (ML/data/gazetteer.json)")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="Dossier des données structurées et du corpus")
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH, help="Fichier gazetteer produit")
+    parser.add_argument("--nominatim-url", default=None, help="Racine du serveur Nominatim (défaut : NOMINATIM_URL)")
+    parser.add_argument("--delay", type=float, default=DELAY_BETWEEN_REQUESTS, help="Délai minimal entre requêtes (secondes)")
+    parser.add_argument("--offline", action="store_true", help="Aucune requête réseau (reprend le gazetteer existant)")
+    parser.add_argument("--min-corpus-count", type=int, default=2, help="Occurrences minimales d'un nom de lieu du corpus")
+    args = parser.parse_args()
+    build_gazetteer(args.data_dir, args.output, args.nominatim_url, args.delay, args.offline, args.min_corpus_count)
+
+
+if __name__ == "__main__":
+    main()
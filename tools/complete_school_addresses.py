@@ -17,8 +17,11 @@ NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
 # Rate limiting : 1 requête par seconde (politesse Nominatim)
 DELAY_BETWEEN_REQUESTS = 1.1
 
-def fetch_address_from_coordinates(lat: float, lon: float) -> Optional[str]:
-    """Récupère l'adresse via reverse geocoding (coordonnées → adresse)."""
+def fetch_address_from_coordinates(lat: float, lon: float, base_url: Optional[str] = None) -> Optional[str]:
+    """
+    Récupère l'adresse via reverse geocoding (coordonnées → adresse).
+    base_url : racine d'un autre serveur Nominatim (ex. instance locale).
+    """
     try:
         params = {
             "lat": lat,
@@ -31,7 +34,8 @@ def fetch_address_from_coordinates(lat: float, lon: float) -> Optional[str]:
             "User-Agent": "Amiens-RAG-Assistant/1.0 (contact: amiens-rag@example.com)"
         }
         
-        response = requests.get(NOMINATIM_URL, params=params, headers=headers, timeout=10)
+        url = f"{base_url.rstrip('/')}/reverse" if base_url else NOMINATIM_URL
+        response = requests.get(url, params=params, headers=headers, timeout=10)
         if response.ok:
             data = response.json()
             address = data.get("address", {})
@@ -12,48 +12,25 @@ from __future__ import annotations
 
 import json
 import math
-import unicodedata
+import sys
 from collections import defaultdict
 from pathlib import Path
 from typing import Dict, List, Tuple
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "Backend"))
+
+from text_normalize import normalize_text_alnum
+
 LEXICON_PATH = ROOT / "chrome-extension-v2" / "data" / "lexique_enfance.json"
 METADATA_PATH = ROOT / "data" / "corpus_metadata.json"
 OUTPUT_JSON = ROOT / "data" / "curated_segments.json"
 OUTPUT_MD = ROOT / "data" / "curated_segments.md"
 
 
-def _strip_accents(text: str) -> str:
-  normalized = unicodedata.normalize("NFKD", text)
-  return "".join(char for char in normalized if not unicodedata.combining(char))
-
-
 def normalize(text: str) -> str:
-  if not text:
-    return ""
-  translation_table = str.maketrans(
-    {"0": "o", "1": "i", "2": "z", "3": "e", "4": "a", "5": "s", "6": "g", "7": "t", "8": "b", "9": "g"}
-  )
-  lowered = _strip_accents(text.lower()).translate(translation_table)
-  cleaned = []
-  last_char = ""
-  repeat_count = 0
-  for char in lowered:
-    if char.isalnum() or char.isspace():
-      if char == last_char:
-        repeat_count += 1
-        if repeat_count >= 3:
-          continue
-      else:
-        repeat_count = 1
-        last_char = char
-      cleaned.append(char)
-    else:
-      cleaned.append(" ")
-      last_char = ""
-      repeat_count = 0
-  return " ".join("".join(cleaned).split())
+  # Variante "isalnum" de la normalisation partagée (conserve les lettres non ASCII)
+  return normalize_text_alnum(text)
 
 
 def load_lexicon() -> List[Dict]: